@@ -83,7 +83,14 @@ app_license = "mit"
 # ------------
 
 # before_install = "microsaas.install.before_install"
-# after_install = "microsaas.install.after_install"
+after_install = "microsaas.microsaas.setup.indexes.ensure_indexes"
+
+# Migration
+# ------------
+
+# Composite indexes are not declared in the doctype JSON, so missing ones are
+# created after every migrate (patches are marked done on fresh installs)
+after_migrate = "microsaas.microsaas.setup.indexes.ensure_indexes"
 
 # Uninstallation
 # ------------
@@ -137,27 +144,93 @@ app_license = "mit"
 # ---------------
 # Hook on document methods and events
 
-# doc_events = {
-# 	"*": {
-# 		"on_update": "method",
-# 		"on_cancel": "method",
-# 		"on_trash": "method"
-# 	}
-# }
+doc_events = {
+	"CA Client": {
+		"on_update": "microsaas.microsaas.services.client_summary.on_dashboard_change"
+	},
+	"CA Invoice": {
+		"on_submit": [
+			"microsaas.microsaas.services.client_summary.on_financial_change",
+			"microsaas.microsaas.services.reminder_schedule.sync_reminder_schedule"
+		],
+		"on_cancel": [
+			"microsaas.microsaas.services.client_summary.on_financial_change",
+			"microsaas.microsaas.services.reminder_schedule.clear_reminder_schedule"
+		],
+		"on_update_after_submit": [
+			"microsaas.microsaas.services.client_summary.on_financial_change",
+			"microsaas.microsaas.services.reminder_schedule.sync_reminder_schedule"
+		]
+	},
+	"CA Payment": {
+		"on_submit": "microsaas.microsaas.services.client_summary.on_financial_change",
+		"on_cancel": "microsaas.microsaas.services.client_summary.on_financial_change",
+		"on_update_after_submit": "microsaas.microsaas.services.client_summary.on_financial_change"
+	},
+	"CA Appointment": {
+		"on_update": [
+			"microsaas.microsaas.services.client_summary.on_financial_change",
+			"microsaas.microsaas.services.reminder_schedule.sync_reminder_schedule"
+		],
+		"on_trash": [
+			"microsaas.microsaas.services.client_summary.on_financial_change",
+			"microsaas.microsaas.services.reminder_schedule.clear_reminder_schedule"
+		]
+	},
+	"CA Document": {
+		"on_update": [
+			"microsaas.microsaas.services.client_summary.on_dashboard_change",
+			"microsaas.microsaas.services.reminder_schedule.sync_reminder_schedule"
+		],
+		"on_trash": [
+			"microsaas.microsaas.services.client_summary.on_dashboard_change",
+			"microsaas.microsaas.services.reminder_schedule.clear_reminder_schedule"
+		]
+	},
+	"CA Firm": {
+		"on_update": [
+			"microsaas.microsaas.services.notification_service.clear_notification_cache",
+			"microsaas.microsaas.integrations.payment_gateway.registry.clear_gateway_cache"
+		],
+		"on_trash": [
+			"microsaas.microsaas.services.notification_service.clear_notification_cache",
+			"microsaas.microsaas.integrations.payment_gateway.registry.clear_gateway_cache"
+		]
+	},
+	"CA Settings": {
+		"on_update": "microsaas.microsaas.integrations.payment_gateway.registry.clear_gateway_cache"
+	},
+	"Notification Template": {
+		"on_update": "microsaas.microsaas.services.notification_service.clear_notification_cache",
+		"on_trash": "microsaas.microsaas.services.notification_service.clear_notification_cache"
+	}
+}
 
 # Scheduled Tasks
 # ---------------
 
 scheduler_events = {
+	"all": [
+		"microsaas.microsaas.services.message_queue.process_outbox",
+		"microsaas.microsaas.services.notification_service.flush_spooled_notification_logs",
+		"microsaas.microsaas.services.notification_digest.flush_digests",
+		"microsaas.microsaas.integrations.payment_gateway.webhook_inbox.process_pending_events"
+	],
 	"daily": [
-		"microsaas.microsaas.services.reminder_scheduler.send_invoice_reminders",
-		"microsaas.microsaas.services.reminder_scheduler.check_tax_deadlines",
-		"microsaas.microsaas.services.reminder_scheduler.check_document_expiry"
+		"microsaas.microsaas.services.reminder_schedule.sync_tax_deadline_schedule",
+		"microsaas.microsaas.services.notification_ledger.purge_expired_ledger_entries",
+		"microsaas.microsaas.services.client_summary.rebuild_client_summaries"
+	],
+	"weekly": [
+		"microsaas.microsaas.doctype.ca_invoice.ca_invoice.repair_invoice_balances"
 	],
 	"hourly": [
-		"microsaas.microsaas.services.reminder_scheduler.send_appointment_reminders"
+		"microsaas.microsaas.services.reminder_scheduler.resume_reminder_runs"
 	],
 	"cron": {
+		"* * * * *": [  # every minute, so reminders go out on time
+			"microsaas.microsaas.services.reminder_scheduler.dispatch_due_reminders"
+		],
 		"0 9 * * *": [  # 9 AM daily
 			"microsaas.microsaas.services.reminder_scheduler.generate_recurring_invoices"
 		]
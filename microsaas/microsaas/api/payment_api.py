@@ -8,6 +8,10 @@ Whitelisted methods for payment operations
 
 import frappe
 from frappe import _
+from frappe.utils import flt
+
+from microsaas.microsaas.doctype.ca_payment.ca_payment import PAID_PAYMENT_STATUSES
+from microsaas.microsaas.integrations.payment_gateway.registry import get_gateway, get_default_gateway
 
 
 @frappe.whitelist()
@@ -30,30 +34,12 @@ def create_payment_link(invoice_name, gateway=None):
 		if not frappe.has_permission("CA Invoice", "read", invoice):
 			frappe.throw(_("Insufficient permissions"))
 		
-		# Get firm settings
-		firm_settings = None
-		if invoice.firm:
-			firm_settings = frappe.get_doc("CA Firm", invoice.firm)
-			
-		# Fallback to defaults if no firm or firm settings incomplete
-		if not firm_settings:
-			firm_settings = frappe.get_single("CA Settings")
-
-		# Get gateway from settings if not specified
+		# Get gateway from firm settings (CA Settings if no firm) if not specified
 		if not gateway:
-			gateway = firm_settings.default_payment_gateway
-		
-		# Create payment link based on gateway
-		if gateway == "Razorpay":
-			from microsaas.microsaas.integrations.payment_gateway.razorpay_gateway import RazorpayGateway
-			gateway_instance = RazorpayGateway(firm_settings)
-			payment_link = gateway_instance.create_payment_link(invoice)
-		elif gateway == "Stripe":
-			from microsaas.microsaas.integrations.payment_gateway.stripe_gateway import StripeGateway
-			gateway_instance = StripeGateway(firm_settings)
-			payment_link = gateway_instance.create_payment_link(invoice)
-		else:
-			frappe.throw(_("Unsupported payment gateway: {0}").format(gateway))
+			gateway = get_default_gateway(invoice.firm)
+		
+		# Firm's cached gateway client
+		payment_link = get_gateway(gateway, invoice.firm).create_payment_link(invoice)
 		
 		return {
 			"success": True,
@@ -69,6 +55,32 @@ def create_payment_link(invoice_name, gateway=None):
 		}
 
 
+@frappe.whitelist()
+def create_payment_links(invoice_names, gateway=None):
+	"""
+	Create payment links for many invoices
+	
+	Small batches are handled in the request; larger ones run as a
+	background job that publishes a `payment_link_batch` realtime event.
+	
+	Args:
+		invoice_names: JSON list of CA Invoice names
+		gateway: Payment gateway (Razorpay/Stripe) - each firm's default if not specified
+	
+	Returns:
+		Dict with per-invoice results, or the number of invoices queued
+	"""
+	from microsaas.microsaas.services.payment_links import enqueue_payment_links
+	
+	invoice_names = frappe.parse_json(invoice_names)
+	
+	for invoice_name in invoice_names:
+		if not frappe.has_permission("CA Invoice", "read", invoice_name):
+			frappe.throw(_("Insufficient permissions for {0}").format(invoice_name))
+	
+	return enqueue_payment_links(invoice_names, gateway)
+
+
 @frappe.whitelist()
 def get_invoice_payment_status(invoice_name):
 	"""
@@ -81,7 +93,16 @@ def get_invoice_payment_status(invoice_name):
 		Payment status details
 	"""
 	try:
-		invoice = frappe.get_doc("CA Invoice", invoice_name)
+		# Balance columns are maintained on the invoice as payments post
+		invoice = frappe.db.get_value(
+			"CA Invoice",
+			invoice_name,
+			["total_amount", "paid_amount", "outstanding_amount", "status"],
+			as_dict=True
+		)
+		
+		if not invoice:
+			frappe.throw(_("Invoice {0} not found").format(invoice_name))
 		
 		# Get all payments for this invoice
 		payments = frappe.get_all(
@@ -90,13 +111,10 @@ def get_invoice_payment_status(invoice_name):
 			fields=["name", "amount", "status", "payment_date", "payment_gateway", "transaction_id"]
 		)
 		
-		# Calculate total paid
-		total_paid = sum([p.amount for p in payments if p.status == "Completed"])
-		
 		return {
 			"invoice_total": invoice.total_amount,
-			"total_paid": total_paid,
-			"balance": invoice.total_amount - total_paid,
+			"total_paid": invoice.paid_amount,
+			"balance": invoice.outstanding_amount,
 			"status": invoice.status,
 			"payments": payments
 		}
@@ -171,33 +189,21 @@ def refund_payment(payment_name, amount=None, reason=None):
 		payment = frappe.get_doc("CA Payment", payment_name)
 		
 		# Check if payment can be refunded
-		if payment.status != "Completed":
+		if payment.status not in PAID_PAYMENT_STATUSES:
 			frappe.throw(_("Only completed payments can be refunded"))
 		
-		# Get firm settings
-		firm_settings = None
-		if payment.firm:
-			firm_settings = frappe.get_doc("CA Firm", payment.firm)
-			
-		# Fallback
-		if not firm_settings:
-			firm_settings = frappe.get_single("CA Settings")
+		# Checked before the gateway moves any money
+		amount = flt(amount) or None
+		if amount and amount > payment.get_refundable_amount():
+			frappe.throw(_("Refund amount cannot exceed the amount not yet refunded"))
 
-		# Process refund based on gateway
-		if payment.payment_gateway == "Razorpay":
-			from microsaas.microsaas.integrations.payment_gateway.razorpay_gateway import RazorpayGateway
-			gateway = RazorpayGateway(firm_settings)
-			refund = gateway.refund_payment(payment, amount)
-		elif payment.payment_gateway == "Stripe":
-			from microsaas.microsaas.integrations.payment_gateway.stripe_gateway import StripeGateway
-			gateway = StripeGateway(firm_settings)
-			refund = gateway.refund_payment(payment, amount)
+		# Process refund with the firm's cached gateway client
+		if payment.payment_gateway in ("Razorpay", "Stripe"):
+			refund = get_gateway(payment.payment_gateway, payment.firm).refund_payment(payment, amount)
 		elif payment.payment_gateway == "Manual":
-			# Manual refund - just update status
-			payment.status = "Refunded"
-			payment.gateway_response = f"Manual refund: {reason}"
-			payment.save()
-			refund = {"status": "refunded"}
+			# Manual refund - just update status and invoice balance
+			refunded = payment.record_refund(amount, note=f"Manual refund: {reason}")
+			refund = {"status": "refunded", "amount": refunded}
 		else:
 			frappe.throw(_("Refund not supported for this payment gateway"))
 		
@@ -9,6 +9,12 @@ API methods for client portal functionality
 import frappe
 from frappe import _
 
+from microsaas.microsaas.services.client_summary import (
+	get_cached_dashboard,
+	get_client_summary,
+	set_cached_dashboard
+)
+
 
 @frappe.whitelist()
 def get_client_dashboard(client_name=None):
@@ -29,31 +35,24 @@ def get_client_dashboard(client_name=None):
 		if not client_name:
 			frappe.throw(_("No client found for current user"))
 		
-		client = frappe.get_doc("CA Client", client_name)
+		# Served from cache until an invoice, payment, appointment,
+		# document or client change invalidates it
+		dashboard = get_cached_dashboard(client_name)
+		if dashboard:
+			return dashboard
+		
+		client = frappe.db.get_value("CA Client", client_name, ["client_name", "email", "status"], as_dict=True)
+		summary = get_client_summary(client_name)
 		
 		# Get recent invoices
 		invoices = frappe.get_all(
 			"CA Invoice",
 			filters={"client": client_name, "docstatus": 1},
-			fields=["name", "invoice_date", "due_date", "total_amount", "status"],
+			fields=["name", "invoice_date", "due_date", "total_amount", "outstanding_amount", "status"],
 			order_by="invoice_date desc",
 			limit=5
 		)
 		
-		# Get payment summary
-		total_paid = frappe.db.sql("""
-			SELECT SUM(amount) as total
-			FROM `tabCA Payment`
-			WHERE client = %s AND status = 'Completed'
-		""", client_name)[0][0] or 0
-		
-		total_outstanding = frappe.db.sql("""
-			SELECT SUM(total_amount) as total
-			FROM `tabCA Invoice`
-			WHERE client = %s AND status IN ('Unpaid', 'Partially Paid', 'Overdue')
-			AND docstatus = 1
-		""", client_name)[0][0] or 0
-		
 		# Get upcoming appointments
 		appointments = frappe.get_all(
 			"CA Appointment",
@@ -76,23 +75,32 @@ def get_client_dashboard(client_name=None):
 			limit=5
 		)
 		
-		return {
+		dashboard = {
 			"client": {
 				"name": client.client_name,
 				"email": client.email,
 				"status": client.status
 			},
 			"summary": {
-				"total_paid": total_paid,
-				"total_outstanding": total_outstanding,
+				"total_paid": summary.total_paid,
+				"total_outstanding": summary.total_outstanding,
 				"invoice_count": len(invoices),
-				"upcoming_appointments": len(appointments)
+				"open_invoice_count": summary.open_invoice_count,
+				"upcoming_appointments": len(appointments),
+				"next_appointment": {
+					"name": summary.next_appointment,
+					"appointment_date": summary.next_appointment_date,
+					"appointment_time": summary.next_appointment_time
+				} if summary.next_appointment else None
 			},
 			"recent_invoices": invoices,
 			"upcoming_appointments": appointments,
 			"recent_documents": documents
 		}
 		
+		set_cached_dashboard(client_name, dashboard)
+		return dashboard
+		
 	except Exception as e:
 		frappe.log_error(f"Error getting client dashboard: {str(e)}")
 		return {"error": str(e)}
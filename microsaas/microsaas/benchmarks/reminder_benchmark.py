@@ -0,0 +1,107 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Invoice Reminder Benchmark
+Measures how reminder selection scales with the number of open invoices,
+reading due rows from the Reminder Schedule table
+
+Run with:
+	bench --site <site> execute microsaas.microsaas.benchmarks.reminder_benchmark.run
+"""
+
+import time
+
+import frappe
+from frappe.utils import today, add_days, getdate, now, get_datetime
+
+from microsaas.microsaas.services.reminder_schedule import rebuild_reminder_schedule, get_due_schedule_rows
+
+
+DEFAULT_SIZES = (1000, 10000, 50000)
+
+
+def run(sizes=DEFAULT_SIZES, include_legacy=True):
+	"""
+	Time reminder selection against synthetic open invoices
+
+	Args:
+		sizes: Invoice counts to benchmark
+		include_legacy: Also time the old per-invoice get_doc scan
+
+	Returns:
+		List of result rows (one per size)
+	"""
+	results = []
+
+	for size in sizes:
+		try:
+			insert_open_invoices(size)
+
+			started = time.perf_counter()
+			rebuild_reminder_schedule(commit=False)
+			build_seconds = round(time.perf_counter() - started, 4)
+
+			started = time.perf_counter()
+			matched = get_due_schedule_rows(until=get_datetime(f"{today()} 23:59:59"), limit=None)
+			row = {
+				"invoices": size,
+				"matched": len(matched),
+				"schedule_build_seconds": build_seconds,
+				"engine_seconds": round(time.perf_counter() - started, 4)
+			}
+
+			if include_legacy:
+				started = time.perf_counter()
+				legacy_scan()
+				row["legacy_seconds"] = round(time.perf_counter() - started, 4)
+
+			results.append(row)
+			print(row)
+
+		finally:
+			# Synthetic rows never outlive the benchmark
+			frappe.db.rollback()
+
+	return results
+
+
+def insert_open_invoices(count):
+	"""Bulk insert open invoices with due dates spread over +/- 60 days"""
+	timestamp = now()
+	base_date = getdate(today())
+
+	values = []
+	for i in range(count):
+		due_date = add_days(base_date, (i % 121) - 60)
+		values.append((
+			f"BENCH-INV-{i:07d}", timestamp, timestamp, "Administrator", "Administrator", 1,
+			f"BENCH-CLI-{i % 500:05d}", "Bench Client", "BENCH-FIRM",
+			add_days(due_date, -30), due_date, "Unpaid", 1000, "INR"
+		))
+
+	frappe.db.bulk_insert(
+		"CA Invoice",
+		fields=[
+			"name", "creation", "modified", "owner", "modified_by", "docstatus",
+			"client", "client_name", "firm",
+			"invoice_date", "due_date", "status", "total_amount", "currency"
+		],
+		values=values
+	)
+
+
+def legacy_scan():
+	"""Previous selection strategy: load every open invoice document"""
+	invoices = frappe.get_all(
+		"CA Invoice",
+		filters={
+			"status": ["in", ["Unpaid", "Partially Paid", "Overdue"]],
+			"docstatus": 1
+		},
+		fields=["name"]
+	)
+
+	for invoice_data in invoices:
+		invoice = frappe.get_doc("CA Invoice", invoice_data.name)
+		(getdate(invoice.due_date) - getdate(today())).days
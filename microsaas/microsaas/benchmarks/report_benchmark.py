@@ -0,0 +1,104 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Client Analytics Report Benchmark
+Loads the Client Analytics report against a synthetic dataset
+
+Run with:
+	bench --site <site> execute microsaas.microsaas.benchmarks.report_benchmark.run
+"""
+
+import random
+import time
+
+import frappe
+from frappe.utils import today, add_days, now
+
+from microsaas.microsaas.report.client_analytics.client_analytics import execute
+
+
+BENCH_FIRM = "BENCH-FIRM"
+
+# Target load time for the report at 100k invoices
+TARGET_SECONDS = 1.0
+
+
+def run(invoices=100000, clients=5000, payment_ratio=0.6, seed=42):
+	"""
+	Time the Client Analytics report on a generated dataset
+
+	Args:
+		invoices: Number of submitted invoices to generate
+		clients: Number of clients the invoices are spread over
+		payment_ratio: Share of invoices with a completed payment
+		seed: Random seed so runs are comparable
+
+	Returns:
+		Dict with dataset size, row count and load time
+	"""
+	try:
+		insert_fixture(invoices, clients, payment_ratio, seed)
+
+		started = time.perf_counter()
+		columns, data = execute({"company": BENCH_FIRM})
+		seconds = time.perf_counter() - started
+
+		result = {
+			"invoices": invoices,
+			"clients": clients,
+			"rows": len(data),
+			"seconds": round(seconds, 4),
+			"within_target": seconds < TARGET_SECONDS
+		}
+		print(result)
+		return result
+
+	finally:
+		# Fixture rows never outlive the benchmark
+		frappe.db.rollback()
+
+
+def insert_fixture(invoices, clients, payment_ratio, seed):
+	"""Bulk insert invoices and completed payments for one synthetic firm"""
+	rng = random.Random(seed)
+	timestamp = now()
+	base_date = today()
+
+	invoice_values = []
+	payment_values = []
+
+	for i in range(invoices):
+		name = f"BENCH-INV-{i:07d}"
+		client = f"BENCH-CLI-{i % clients:05d}"
+		invoice_date = add_days(base_date, -rng.randint(0, 720))
+		amount = rng.choice((2500, 3000, 5000, 25000, 75000))
+
+		invoice_values.append((
+			name, timestamp, timestamp, "Administrator", "Administrator", 1,
+			client, BENCH_FIRM, invoice_date, add_days(invoice_date, 30), "Unpaid", amount, "INR"
+		))
+
+		if rng.random() < payment_ratio:
+			payment_values.append((
+				f"BENCH-PAY-{i:07d}", timestamp, timestamp, "Administrator", "Administrator", 1,
+				name, client, BENCH_FIRM, add_days(invoice_date, 5), amount, "INR", "Manual", "Completed"
+			))
+
+	frappe.db.bulk_insert(
+		"CA Invoice",
+		fields=[
+			"name", "creation", "modified", "owner", "modified_by", "docstatus",
+			"client", "firm", "invoice_date", "due_date", "status", "total_amount", "currency"
+		],
+		values=invoice_values
+	)
+
+	frappe.db.bulk_insert(
+		"CA Payment",
+		fields=[
+			"name", "creation", "modified", "owner", "modified_by", "docstatus",
+			"invoice", "client", "firm", "payment_date", "amount", "currency", "payment_gateway", "status"
+		],
+		values=payment_values
+	)
@@ -0,0 +1,358 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Benchmark Suite
+Runs scheduler jobs, portal APIs, script reports and gateway webhooks
+against generated datasets at several scales and records wall time, query
+count, rows read and peak Python memory for each case.
+
+Run with background workers stopped, so webhook processing is measured
+in-process rather than picked up by a worker:
+	bench --site <site> execute microsaas.microsaas.benchmarks.suite.run --kwargs "{'scales': ['small', 'medium']}"
+
+Compare two result files with:
+	bench --site <site> execute microsaas.microsaas.benchmarks.suite.compare --kwargs "{'baseline': '...', 'current': '...'}"
+
+Generated firms have no WhatsApp instance, so scheduler cases select and
+render notifications without sending anything.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import time
+import tracemalloc
+
+import frappe
+from frappe.utils import now, today, get_datetime
+
+from microsaas.microsaas.integrations.payment_gateway.registry import clear_gateway_cache
+from microsaas.microsaas.setup.demo_data import BULK_PREFIX, generate_bulk, clear_bulk_data
+
+
+SCALES = {
+	"small": {"firms": 2, "clients_per_firm": 100, "invoices_per_client": 12},
+	"medium": {"firms": 5, "clients_per_firm": 1000, "invoices_per_client": 24},
+	"large": {"firms": 10, "clients_per_firm": 5000, "invoices_per_client": 24}
+}
+
+DASHBOARD_SAMPLE = 200
+WEBHOOK_SAMPLE = 200
+
+WEBHOOK_SECRET = "bench_webhook_secret"
+
+# Relative slowdown that compare() reports as a regression
+REGRESSION_TOLERANCE = 0.2
+
+
+def run(scales=("small",), output=None, seed=42):
+	"""
+	Run every benchmark case at each scale
+
+	Args:
+		scales: Names from SCALES to run
+		output: Path of the JSON results file (defaults to the site's benchmarks folder)
+		seed: Seed for the data generator
+
+	Returns:
+		Path of the results file
+	"""
+	results = {
+		"started_at": now(),
+		"db_type": frappe.db.db_type,
+		"seed": seed,
+		"runs": []
+	}
+
+	try:
+		for scale in scales:
+			print(f"Generating {scale} dataset...")
+			dataset = generate_bulk(seed=seed, **SCALES[scale])
+			firm = f"{BULK_PREFIX} Firm 0001"
+
+			cases = []
+			cases += run_scheduler_cases()
+			cases += run_portal_cases()
+			cases += run_report_cases(firm)
+			cases += run_webhook_cases(firm)
+
+			results["runs"].append({
+				"scale": scale,
+				"params": SCALES[scale],
+				"dataset": dataset,
+				"cases": cases
+			})
+
+	finally:
+		clear_bulk_data()
+
+	output = output or frappe.get_site_path("benchmarks", f"results-{time.strftime('%Y%m%d-%H%M%S')}.json")
+	os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+	with open(output, "w") as f:
+		json.dump(results, f, indent=1, default=str)
+
+	print(f"Results written to {output}")
+	return output
+
+
+def measure(case, fn, *args, **kwargs):
+	"""
+	Run one case and collect its metrics
+
+	Query count and rows read come from MariaDB session status counters and
+	cover this connection only. Wall time includes tracemalloc overhead.
+
+	Returns:
+		Dict with case name, seconds, queries, rows_read and peak_memory_kb
+	"""
+	before = get_session_counters()
+	tracemalloc.start()
+	started = time.perf_counter()
+
+	try:
+		fn(*args, **kwargs)
+	finally:
+		seconds = time.perf_counter() - started
+		peak = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+
+	after = get_session_counters()
+
+	result = {
+		"case": case,
+		"seconds": round(seconds, 4),
+		"queries": after["queries"] - before["queries"] - 1 if after else None,
+		"rows_read": after["rows_read"] - before["rows_read"] if after else None,
+		"peak_memory_kb": peak // 1024
+	}
+	print(result)
+	return result
+
+
+def get_session_counters():
+	"""Read statement and handler-read counters for this connection (MariaDB only)"""
+	if frappe.db.db_type != "mariadb":
+		return None
+
+	status = dict(frappe.db.sql("""
+		SHOW SESSION STATUS
+		WHERE Variable_name = 'Questions' OR Variable_name LIKE 'Handler_read%%'
+	"""))
+
+	return {
+		"queries": int(status.pop("Questions")),
+		"rows_read": sum(int(value) for value in status.values())
+	}
+
+
+def run_scheduler_cases():
+	from microsaas.microsaas.services.reminder_schedule import rebuild_reminder_schedule
+	from microsaas.microsaas.services.reminder_scheduler import dispatch_due_reminders, generate_recurring_invoices_for_firm
+
+	firms = frappe.get_all("CA Firm", filters={"name": ["like", f"{BULK_PREFIX}%"]}, pluck="name")
+
+	def generate_recurring_invoices():
+		# The cron entry only fans out per-firm jobs; run those jobs in-process
+		for firm in firms:
+			generate_recurring_invoices_for_firm(firm)
+
+	return [
+		measure("scheduler.rebuild_reminder_schedule", rebuild_reminder_schedule),
+		# Everything due by the end of today, whatever time the suite runs
+		measure("scheduler.dispatch_due_reminders", dispatch_due_reminders, get_datetime(f"{today()} 23:59:59")),
+		measure("scheduler.generate_recurring_invoices", generate_recurring_invoices)
+	]
+
+
+def run_portal_cases():
+	from microsaas.microsaas.api.portal_api import get_client_dashboard
+	from microsaas.microsaas.services.client_summary import DASHBOARD_CACHE_PREFIX
+
+	clients = frappe.get_all(
+		"CA Client",
+		filters={"name": ["like", f"{BULK_PREFIX}%"]},
+		pluck="name",
+		order_by="name",
+		limit=DASHBOARD_SAMPLE
+	)
+
+	def load_dashboards():
+		for client in clients:
+			get_client_dashboard(client)
+
+	frappe.cache().delete_keys(DASHBOARD_CACHE_PREFIX)
+
+	return [
+		measure(f"portal.get_client_dashboard.cold x{len(clients)}", load_dashboards),
+		measure(f"portal.get_client_dashboard.warm x{len(clients)}", load_dashboards)
+	]
+
+
+def run_report_cases(firm):
+	from microsaas.microsaas.report.client_analytics import client_analytics
+	from microsaas.microsaas.report.outstanding_invoices import outstanding_invoices
+	from microsaas.microsaas.report.revenue_analysis import revenue_analysis
+
+	cases = []
+	for name, report in (
+		("client_analytics", client_analytics),
+		("outstanding_invoices", outstanding_invoices),
+		("revenue_analysis", revenue_analysis)
+	):
+		cases.append(measure(f"report.{name}.all_firms", report.execute, {}))
+		cases.append(measure(f"report.{name}.one_firm", report.execute, {"company": firm}))
+
+	return cases
+
+
+def run_webhook_cases(firm):
+	"""Post signed Razorpay and Stripe payment events for open invoices, then process them"""
+	from microsaas.microsaas.integrations.payment_gateway import razorpay_gateway, stripe_gateway
+	from microsaas.microsaas.integrations.payment_gateway.webhook_inbox import process_events
+
+	configure_gateway_secrets(firm)
+
+	invoices = frappe.get_all(
+		"CA Invoice",
+		filters={"firm": firm, "docstatus": 1, "status": ["in", ["Unpaid", "Overdue"]]},
+		fields=["name", "client", "outstanding_amount"],
+		order_by="name",
+		limit=WEBHOOK_SAMPLE
+	)
+	half = len(invoices) // 2
+
+	razorpay_requests = [razorpay_request(firm, invoice) for invoice in invoices[:half]]
+	stripe_requests = [stripe_request(firm, invoice) for invoice in invoices[half:]]
+
+	def post(handler, requests):
+		try:
+			for payload, headers in requests:
+				set_request(payload, headers)
+				handler()
+		finally:
+			frappe.local.request = None
+
+	def process():
+		for invoice in invoices:
+			process_events(invoice=invoice.name)
+
+	return [
+		measure(f"webhook.razorpay.ingest x{len(razorpay_requests)}", post, razorpay_gateway.webhook, razorpay_requests),
+		measure(f"webhook.stripe.ingest x{len(stripe_requests)}", post, stripe_gateway.webhook, stripe_requests),
+		measure(f"webhook.process x{len(invoices)}", process)
+	]
+
+
+def configure_gateway_secrets(firm):
+	"""Give the benchmark firm gateway credentials so webhook signatures can be checked"""
+	from frappe.utils.password import set_encrypted_password
+
+	frappe.db.set_value("CA Firm", firm, {"razorpay_key_id": "rzp_bench", "enable_razorpay": 1, "enable_stripe": 1})
+	for fieldname, value in (
+		("razorpay_key_secret", "bench_key_secret"),
+		("razorpay_webhook_secret", WEBHOOK_SECRET),
+		("stripe_api_key", "sk_test_bench"),
+		("stripe_webhook_secret", WEBHOOK_SECRET)
+	):
+		set_encrypted_password("CA Firm", firm, value, fieldname)
+
+	frappe.db.commit()
+
+	# set_value skips doc_events, so drop clients built with the old credentials
+	clear_gateway_cache()
+
+
+def razorpay_request(firm, invoice):
+	payment_id = f"pay_bench_{invoice.name}"
+	payload = json.dumps({
+		"event": "payment.captured",
+		"payload": {
+			"payment": {
+				"entity": {
+					"id": payment_id,
+					"amount": int(invoice.outstanding_amount * 100),
+					"method": "upi",
+					"notes": {"invoice_id": invoice.name, "client_id": invoice.client, "firm_id": firm}
+				}
+			}
+		}
+	}).encode()
+
+	return payload, {
+		"X-Razorpay-Signature": hmac.new(WEBHOOK_SECRET.encode(), payload, hashlib.sha256).hexdigest(),
+		"X-Razorpay-Event-Id": f"evt_bench_{invoice.name}"
+	}
+
+
+def stripe_request(firm, invoice):
+	payload = json.dumps({
+		"id": f"evt_bench_{invoice.name}",
+		"object": "event",
+		"type": "payment_intent.succeeded",
+		"data": {
+			"object": {
+				"id": f"pi_bench_{invoice.name}",
+				"object": "payment_intent",
+				"amount": int(invoice.outstanding_amount * 100),
+				"payment_method_types": ["card"],
+				"metadata": {"invoice_id": invoice.name, "client_id": invoice.client, "firm_id": firm}
+			}
+		}
+	}).encode()
+
+	timestamp = int(time.time())
+	signature = hmac.new(WEBHOOK_SECRET.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+
+	return payload, {"Stripe-Signature": f"t={timestamp},v1={signature}"}
+
+
+def set_request(payload, headers):
+	from werkzeug.test import EnvironBuilder
+	from werkzeug.wrappers import Request
+
+	builder = EnvironBuilder(method="POST", data=payload, headers=headers, content_type="application/json")
+	frappe.local.request = Request(builder.get_environ())
+
+
+def compare(baseline, current, tolerance=REGRESSION_TOLERANCE):
+	"""
+	Report cases that got slower or ran more queries between two result files
+
+	Args:
+		baseline: Path of the earlier results file
+		current: Path of the newer results file
+		tolerance: Relative increase allowed before a case is reported
+
+	Returns:
+		List of regressions
+	"""
+	def load(path):
+		with open(path) as f:
+			data = json.load(f)
+		return {(run["scale"], case["case"]): case for run in data["runs"] for case in run["cases"]}
+
+	before = load(baseline)
+	after = load(current)
+	regressions = []
+
+	for key, case in after.items():
+		if key not in before:
+			continue
+
+		for metric in ("seconds", "queries", "rows_read"):
+			old, new = before[key].get(metric), case.get(metric)
+			if old and new and new > old * (1 + tolerance):
+				regressions.append({
+					"scale": key[0],
+					"case": key[1],
+					"metric": metric,
+					"baseline": old,
+					"current": new
+				})
+
+	for regression in regressions:
+		print(regression)
+
+	return regressions
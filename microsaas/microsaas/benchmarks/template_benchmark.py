@@ -0,0 +1,66 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Notification Template Render Benchmark
+Compares cold (compile every render) and warm (cached compile) throughput.
+Both modes use the production SandboxedEnvironment; cold compiles with
+from_string, which skips the compiled template cache.
+
+Run with:
+	bench --site <site> execute microsaas.microsaas.benchmarks.template_benchmark.run
+"""
+
+import time
+
+from microsaas.microsaas.doctype.notification_template.notification_template import get_compiled_template, jinja_env
+
+
+SAMPLE_TEMPLATE = """Dear {{ client_name }},
+
+This is a reminder that invoice {{ invoice_number }} for {{ amount }} is due on {{ due_date }}.
+{% if days_overdue %}It is now {{ days_overdue }} days overdue.{% endif %}
+
+Pay online: {{ portal_link }}"""
+
+SAMPLE_DATA = {
+	"client_name": "TechFlow Solutions",
+	"invoice_number": "INV-00042",
+	"amount": 29500,
+	"due_date": "2026-07-31",
+	"days_overdue": 7,
+	"portal_link": "https://example.com/portal/invoice/INV-00042"
+}
+
+
+def run(renders=10000):
+	"""
+	Render the sample template cold and warm
+
+	Args:
+		renders: Number of renders per mode
+
+	Returns:
+		Dict with timings and renders per second for each mode
+	"""
+	started = time.perf_counter()
+	for _ in range(renders):
+		jinja_env.from_string(SAMPLE_TEMPLATE).render(**SAMPLE_DATA)
+	cold_seconds = time.perf_counter() - started
+
+	started = time.perf_counter()
+	for _ in range(renders):
+		get_compiled_template("Benchmark Template", "2026-01-01 00:00:00", SAMPLE_TEMPLATE).render(**SAMPLE_DATA)
+	warm_seconds = time.perf_counter() - started
+
+	result = {
+		"renders": renders,
+		"cold_seconds": round(cold_seconds, 4),
+		"warm_seconds": round(warm_seconds, 4),
+		"cold_per_second": round(renders / cold_seconds),
+		"warm_per_second": round(renders / warm_seconds),
+		"speedup": round(cold_seconds / warm_seconds, 1)
+	}
+	print(result)
+
+	return result
@@ -55,7 +55,9 @@ class CAAppointment(Document):
 			send_notification(
 				client=self.client,
 				template_type="appointment_cancelled",
-				data=notification_data
+				data=notification_data,
+				reference=f"CA Appointment:{self.name}",
+				offset=f"{self.appointment_date} {self.appointment_time}"
 			)
 		except Exception as e:
 			frappe.log_error(f"Error sending cancellation notification: {str(e)}")
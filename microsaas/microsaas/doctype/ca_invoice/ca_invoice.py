@@ -3,7 +3,7 @@
 
 import frappe
 from frappe.model.document import Document
-from frappe.utils import today, add_days, add_months, getdate
+from frappe.utils import today, add_days, add_months, getdate, flt
 
 
 class CAInvoice(Document):
@@ -32,6 +32,9 @@ class CAInvoice(Document):
 		# Calculate tax
 		self.tax_amount = (self.subtotal * self.tax_rate) / 100
 		self.total_amount = self.subtotal + self.tax_amount
+		
+		# Running balance, kept up to date by CA Payment after submit
+		self.outstanding_amount = self.total_amount - flt(self.paid_amount)
 	
 	def check_overdue_status(self):
 		"""Check if invoice is overdue and update status"""
@@ -40,9 +43,18 @@ class CAInvoice(Document):
 	
 	def on_submit(self):
 		"""Actions to perform when invoice is submitted"""
-		# Send invoice notification if auto-send is enabled
-		if self.auto_send_on_creation:
-			self.send_invoice_notification()
+		# Send invoice notification if auto-send is enabled; batch jobs set
+		# defer_notification and send once their batch has committed
+		if self.auto_send_on_creation and not self.flags.defer_notification:
+			# Rendered and sent in the background so submit never waits on wkhtmltopdf
+			frappe.enqueue(
+				"microsaas.microsaas.doctype.ca_invoice.ca_invoice.send_invoice_notification",
+				queue="default",
+				job_id=f"invoice_notification::{self.name}",
+				deduplicate=True,
+				enqueue_after_commit=True,
+				invoice_name=self.name
+			)
 		
 		# Schedule recurring invoice if applicable
 		if self.is_recurring and not self.next_generation_date:
@@ -53,6 +65,7 @@ class CAInvoice(Document):
 		try:
 			# Import notification service
 			from microsaas.microsaas.services.notification_service import send_notification, send_whatsapp_with_file
+			from microsaas.microsaas.services.invoice_pdf import get_invoice_pdf
 			
 			# Prepare notification data
 			notification_data = {
@@ -63,20 +76,9 @@ class CAInvoice(Document):
 				"portal_link": self.portal_link
 			}
 			
-			# Generate PDF
-			pdf_content = frappe.get_print("CA Invoice", self.name, as_pdf=True)
-			
-			# Save PDF as File
-			file_name = f"Invoice-{self.name}.pdf"
-			file_doc = frappe.get_doc({
-				"doctype": "File",
-				"file_name": file_name,
-				"is_private": 0,
-				"content": pdf_content,
-				"attached_to_doctype": "CA Invoice",
-				"attached_to_name": self.name
-			})
-			file_doc.save(ignore_permissions=True)
+			# Reuses the stored PDF when the invoice content is unchanged
+			file_doc = get_invoice_pdf(self.name)
+			file_name = file_doc.file_name
 			
 			# Get full URL (assuming public file)
 			file_url = frappe.utils.get_url(file_doc.file_url)
@@ -87,19 +89,21 @@ class CAInvoice(Document):
 				template_type="invoice_sent",
 				data=notification_data,
 				file_url=file_url,
-				file_name=file_name
+				file_name=file_name,
+				reference=f"CA Invoice:{self.name}"
 			)
 			
 			if pdf_response:
-				frappe.msgprint(f"Invoice PDF sent to {self.client_name} via WhatsApp")
+				frappe.msgprint(f"Invoice PDF queued for {self.client_name} via WhatsApp")
 			else:
 				# Fallback to text notification if PDF fails or not enabled
 				send_notification(
 					client=self.client,
 					template_type="invoice_sent",
-					data=notification_data
+					data=notification_data,
+					reference=f"CA Invoice:{self.name}"
 				)
-				frappe.msgprint(f"Invoice notification sent to {self.client_name}")
+				frappe.msgprint(f"Invoice notification queued for {self.client_name}")
 				
 		except Exception as e:
 			frappe.log_error(f"Error sending invoice notification: {str(e)}")
@@ -125,33 +129,114 @@ class CAInvoice(Document):
 	def create_payment_link(self, gateway=None):
 		"""Create payment link for the invoice"""
 		try:
-			# Get firm settings
-			firm_settings = None
-			if self.firm:
-				firm_settings = frappe.get_doc("CA Firm", self.firm)
-				
-			if not firm_settings:
-				firm_settings = frappe.get_single("CA Settings") # Fallback
+			from microsaas.microsaas.integrations.payment_gateway.registry import get_gateway, get_default_gateway
 			
-			# Get gateway from settings if not specified
+			# Get gateway from firm settings (CA Settings if no firm) if not specified
 			if not gateway:
-				gateway = firm_settings.default_payment_gateway
+				gateway = get_default_gateway(self.firm)
 			
-			# Import and use appropriate gateway
-			if gateway == "Razorpay":
-				from microsaas.microsaas.integrations.payment_gateway.razorpay_gateway import RazorpayGateway
-				gateway_instance = RazorpayGateway(firm_settings)
-				payment_link = gateway_instance.create_payment_link(self)
-			elif gateway == "Stripe":
-				from microsaas.microsaas.integrations.payment_gateway.stripe_gateway import StripeGateway
-				gateway_instance = StripeGateway(firm_settings)
-				payment_link = gateway_instance.create_payment_link(self)
-			else:
-				frappe.throw(f"Unsupported payment gateway: {gateway}")
-			
-			# Return just the link string as before, or dict? Original returned create_payment_link(self) which returned URL string.
-			return payment_link
+			# Firm's cached gateway client; returns the link URL
+			return get_gateway(gateway, self.firm).create_payment_link(self)
 			
 		except Exception as e:
 			frappe.log_error(f"Error creating payment link: {str(e)}")
 			frappe.throw(f"Failed to create payment link: {str(e)}")
+
+
+def send_invoice_notification(invoice_name):
+	"""Send the invoice notification for a submitted invoice (background job)"""
+	frappe.get_doc("CA Invoice", invoice_name).send_invoice_notification()
+
+
+def update_invoice_balance(invoice_name, amount):
+	"""
+	Apply a payment delta to an invoice's running balance
+	
+	The invoice row is locked for the rest of the transaction so concurrent
+	payments on the same invoice are applied one after the other.
+	
+	Args:
+		invoice_name: CA Invoice name
+		amount: Amount paid (negative to reverse a payment)
+	"""
+	invoice = frappe.db.get_value(
+		"CA Invoice",
+		invoice_name,
+		["total_amount", "paid_amount", "due_date", "status"],
+		as_dict=True,
+		for_update=True
+	)
+	
+	paid_amount = flt(invoice.paid_amount) + flt(amount)
+	values = {
+		"paid_amount": paid_amount,
+		"outstanding_amount": flt(invoice.total_amount) - paid_amount
+	}
+	
+	if invoice.status != "Cancelled":
+		values["status"] = get_balance_status(invoice.total_amount, paid_amount, invoice.due_date)
+	
+	frappe.db.set_value("CA Invoice", invoice_name, values, update_modified=False)
+
+
+def get_balance_status(total_amount, paid_amount, due_date):
+	"""Derive invoice payment status from its balance"""
+	if paid_amount > 0 and paid_amount >= flt(total_amount):
+		return "Paid"
+	elif paid_amount > 0:
+		return "Partially Paid"
+	elif due_date and getdate(due_date) < getdate(today()):
+		return "Overdue"
+	
+	return "Unpaid"
+
+
+def repair_invoice_balances(firm=None):
+	"""
+	Recompute paid and outstanding amounts from completed payments, less
+	their refunds, in bulk
+	
+	Runs one set-based UPDATE per firm and commits after each firm.
+	
+	Args:
+		firm: Limit the repair to one CA Firm (all firms if not given)
+	"""
+	firms = [firm] if firm else frappe.get_all("CA Invoice", filters={"docstatus": 1}, pluck="firm", distinct=True)
+	
+	for firm_name in firms:
+		frappe.db.sql("""
+			UPDATE `tabCA Invoice` inv
+			LEFT JOIN (
+				SELECT invoice, SUM(amount - refunded_amount) as paid
+				FROM `tabCA Payment`
+				WHERE status IN ('Completed', 'Partially Refunded') AND docstatus = 1 AND firm = %(firm)s
+				GROUP BY invoice
+			) pay ON pay.invoice = inv.name
+			SET
+				inv.paid_amount = IFNULL(pay.paid, 0),
+				inv.outstanding_amount = inv.total_amount - IFNULL(pay.paid, 0),
+				inv.status = CASE
+					WHEN inv.status = 'Cancelled' THEN inv.status
+					WHEN IFNULL(pay.paid, 0) > 0 AND IFNULL(pay.paid, 0) >= inv.total_amount THEN 'Paid'
+					WHEN IFNULL(pay.paid, 0) > 0 THEN 'Partially Paid'
+					WHEN inv.due_date < CURDATE() THEN 'Overdue'
+					ELSE 'Unpaid'
+				END
+			WHERE inv.docstatus = 1 AND inv.firm = %(firm)s
+		""", {"firm": firm_name})
+		
+		frappe.db.commit()
+
+
+@frappe.whitelist()
+def enqueue_repair_invoice_balances(firm=None):
+	"""Queue a bulk balance repair"""
+	frappe.only_for("System Manager")
+	
+	frappe.enqueue(
+		"microsaas.microsaas.doctype.ca_invoice.ca_invoice.repair_invoice_balances",
+		queue="long",
+		job_id=f"repair_invoice_balances::{firm or 'all'}",
+		deduplicate=True,
+		firm=firm
+	)
@@ -3,7 +3,13 @@
 
 import frappe
 from frappe.model.document import Document
-from frappe.utils import today
+from frappe.utils import today, flt
+
+from microsaas.microsaas.doctype.ca_invoice.ca_invoice import update_invoice_balance
+
+
+# Statuses of payments whose amount less refunded_amount counts as paid
+PAID_PAYMENT_STATUSES = ("Completed", "Partially Refunded")
 
 
 class CAPayment(Document):
@@ -11,8 +17,8 @@ class CAPayment(Document):
 		"""Validate payment data"""
 		# Ensure amount doesn't exceed invoice total
 		if self.invoice:
-			invoice = frappe.get_doc("CA Invoice", self.invoice)
-			if self.amount > invoice.total_amount:
+			total_amount = frappe.db.get_value("CA Invoice", self.invoice, "total_amount")
+			if self.amount > total_amount:
 				frappe.throw("Payment amount cannot exceed invoice total")
 				
 		# Auto-set firm
@@ -28,30 +34,67 @@ class CAPayment(Document):
 			self.reconcile_with_invoice()
 			self.send_payment_confirmation()
 	
+	def on_cancel(self):
+		"""Reverse the part of the payment still counted on the invoice balance"""
+		if self.status in PAID_PAYMENT_STATUSES and self.reconciled:
+			update_invoice_balance(self.invoice, -self.get_refundable_amount())
+	
+	def get_refundable_amount(self):
+		"""Amount of the payment not refunded yet"""
+		return flt(self.amount) - flt(self.refunded_amount)
+	
+	def record_refund(self, amount=None, note=None):
+		"""
+		Record a refund and reverse it on the invoice
+		
+		Refunds accumulate in refunded_amount. The payment stays Partially
+		Refunded, still counting its remaining amount as paid, until the whole
+		amount is refunded. Values are written with db_set since they cannot
+		change through save() once the payment is submitted, so the client
+		summary is refreshed here rather than by the doc_events hook.
+		
+		Args:
+			amount: Amount refunded (None for everything not refunded yet)
+			note: Optional text stored as the gateway response
+		
+		Returns:
+			Amount reversed on the invoice
+		"""
+		from microsaas.microsaas.services.client_summary import refresh_client_summary
+		
+		refundable = self.get_refundable_amount()
+		refunded = flt(amount) or refundable
+		if refunded > refundable:
+			frappe.throw("Refund amount cannot exceed the amount not yet refunded")
+		
+		refunded_amount = flt(self.refunded_amount) + refunded
+		values = {
+			"refunded_amount": refunded_amount,
+			"status": "Refunded" if refunded_amount >= flt(self.amount) else "Partially Refunded"
+		}
+		if note:
+			values["gateway_response"] = note
+		self.db_set(values)
+		
+		if self.reconciled:
+			update_invoice_balance(self.invoice, -refunded)
+		
+		if self.client:
+			refresh_client_summary(self.client)
+		
+		return refunded
+
 	def reconcile_with_invoice(self):
 		"""Update invoice payment status"""
 		try:
-			invoice = frappe.get_doc("CA Invoice", self.invoice)
-			
-			# Calculate total payments for this invoice
-			total_payments = frappe.db.sql("""
-				SELECT SUM(amount) as total
-				FROM `tabCA Payment`
-				WHERE invoice = %s AND status = 'Completed'
-			""", self.invoice)[0][0] or 0
-			
-			# Update invoice status
-			if total_payments >= invoice.total_amount:
-				invoice.status = "Paid"
-			elif total_payments > 0:
-				invoice.status = "Partially Paid"
-			
-			invoice.save(ignore_permissions=True)
+			# Adjust the invoice's running balance under a row lock
+			update_invoice_balance(self.invoice, self.amount)
 			
 			# Mark as reconciled
-			self.reconciled = 1
-			self.reconciliation_date = today()
-			self.save()
+			self.db_set({
+				"reconciled": 1,
+				"reconciliation_date": today()
+			})
 			
 		except Exception as e:
 			frappe.log_error(f"Error reconciling payment: {str(e)}")
@@ -72,7 +115,8 @@ class CAPayment(Document):
 			send_notification(
 				client=self.client,
 				template_type="payment_received",
-				data=notification_data
+				data=notification_data,
+				reference=f"CA Payment:{self.name}"
 			)
 		except Exception as e:
 			frappe.log_error(f"Error sending payment confirmation: {str(e)}")
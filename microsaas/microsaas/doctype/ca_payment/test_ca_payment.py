@@ -1,9 +1,129 @@
 # Copyright (c) 2026, India100x pvt. ltd. and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, flt, today
 
+from microsaas.microsaas.api.payment_api import refund_payment
+from microsaas.microsaas.doctype.ca_invoice.ca_invoice import repair_invoice_balances
 
-# class TestCAPayment(FrappeTestCase):
-# 	pass
+
+def make_paid_invoice(total):
+	"""Submitted invoice with one submitted, reconciled Manual payment for the full amount"""
+	firm_name = f"_Test Refund Firm {frappe.generate_hash(length=6)}"
+	frappe.get_doc({"doctype": "CA Firm", "firm_name": firm_name}).insert(ignore_permissions=True)
+
+	client = frappe.get_doc({
+		"doctype": "CA Client",
+		"firm": firm_name,
+		"client_name": "_Test Refund Client",
+		"email": f"refund.client.{frappe.generate_hash(length=6)}@example.com",
+		"status": "Active"
+	}).insert(ignore_permissions=True)
+
+	invoice = frappe.get_doc({
+		"doctype": "CA Invoice",
+		"firm": firm_name,
+		"client": client.name,
+		"invoice_date": today(),
+		"due_date": add_days(today(), 30),
+		"items": [{"description": "Audit", "quantity": 1, "rate": total}],
+		"auto_send_on_creation": 0
+	}).insert(ignore_permissions=True)
+	invoice.submit()
+
+	payment = frappe.get_doc({
+		"doctype": "CA Payment",
+		"invoice": invoice.name,
+		"client": client.name,
+		"amount": total,
+		"payment_date": today(),
+		"payment_gateway": "Manual",
+		"transaction_id": frappe.generate_hash(length=10),
+		"status": "Completed"
+	}).insert(ignore_permissions=True)
+	payment.submit()
+
+	return invoice.name, payment.name
+
+
+class TestCAPaymentRefund(FrappeTestCase):
+	def get_invoice(self, invoice_name):
+		return frappe.db.get_value(
+			"CA Invoice", invoice_name, ["paid_amount", "outstanding_amount", "status"], as_dict=True
+		)
+
+	def test_full_refund_reverses_invoice_balance(self):
+		invoice_name, payment_name = make_paid_invoice(1000)
+		self.assertEqual(self.get_invoice(invoice_name).status, "Paid")
+
+		response = refund_payment(payment_name, reason="Duplicate")
+
+		self.assertTrue(response["success"], response)
+		self.assertEqual(frappe.db.get_value("CA Payment", payment_name, "status"), "Refunded")
+
+		invoice = self.get_invoice(invoice_name)
+		self.assertEqual(flt(invoice.paid_amount), 0)
+		self.assertEqual(flt(invoice.outstanding_amount), 1000)
+		self.assertEqual(invoice.status, "Unpaid")
+
+	def test_partial_refund_reverses_only_refunded_amount(self):
+		invoice_name, payment_name = make_paid_invoice(1000)
+
+		response = refund_payment(payment_name, amount=250, reason="Discount")
+
+		self.assertTrue(response["success"], response)
+		self.assertEqual(response["refund"]["amount"], 250)
+
+		payment = frappe.db.get_value("CA Payment", payment_name, ["status", "refunded_amount"], as_dict=True)
+		self.assertEqual(payment.status, "Partially Refunded")
+		self.assertEqual(flt(payment.refunded_amount), 250)
+
+		invoice = self.get_invoice(invoice_name)
+		self.assertEqual(flt(invoice.paid_amount), 750)
+		self.assertEqual(flt(invoice.outstanding_amount), 250)
+		self.assertEqual(invoice.status, "Partially Paid")
+
+	def test_balance_repair_keeps_unrefunded_part(self):
+		invoice_name, payment_name = make_paid_invoice(1000)
+		refund_payment(payment_name, amount=250, reason="Discount")
+
+		repair_invoice_balances(frappe.db.get_value("CA Invoice", invoice_name, "firm"))
+
+		invoice = self.get_invoice(invoice_name)
+		self.assertEqual(flt(invoice.paid_amount), 750)
+		self.assertEqual(invoice.status, "Partially Paid")
+
+	def test_remaining_amount_can_be_refunded_later(self):
+		invoice_name, payment_name = make_paid_invoice(1000)
+		refund_payment(payment_name, amount=250, reason="Discount")
+
+		# More than what is left is rejected, the rest is accepted
+		self.assertFalse(refund_payment(payment_name, amount=800)["success"])
+		response = refund_payment(payment_name, reason="Cancelled engagement")
+
+		self.assertTrue(response["success"], response)
+		self.assertEqual(response["refund"]["amount"], 750)
+
+		payment = frappe.db.get_value("CA Payment", payment_name, ["status", "refunded_amount"], as_dict=True)
+		self.assertEqual(payment.status, "Refunded")
+		self.assertEqual(flt(payment.refunded_amount), 1000)
+		self.assertEqual(flt(self.get_invoice(invoice_name).paid_amount), 0)
+
+	def test_refund_refreshes_client_summary(self):
+		invoice_name, payment_name = make_paid_invoice(1000)
+		client = frappe.db.get_value("CA Invoice", invoice_name, "client")
+
+		refund_payment(payment_name, amount=400, reason="Discount")
+
+		self.assertEqual(flt(frappe.db.get_value("CA Client Summary", client, "total_paid")), 600)
+
+	def test_refund_above_payment_amount_is_rejected(self):
+		invoice_name, payment_name = make_paid_invoice(1000)
+
+		response = refund_payment(payment_name, amount=1500)
+
+		self.assertFalse(response["success"])
+		self.assertEqual(frappe.db.get_value("CA Payment", payment_name, "status"), "Completed")
+		self.assertEqual(flt(self.get_invoice(invoice_name).paid_amount), 1000)
@@ -11,6 +11,28 @@ class CASettings(Document):
 		# Check WhatsApp instance status if enabled
 		if self.enable_whatsapp_notifications and self.whatsapp_instance:
 			self.update_whatsapp_instance_status()
+		
+		self.validate_document_expiry_reminder_days()
+	
+	def on_update(self):
+		"""Move pending document expiry reminders to the new milestones"""
+		if self.has_value_changed("document_expiry_reminder_days"):
+			frappe.enqueue(
+				"microsaas.microsaas.services.reminder_schedule.reschedule_document_reminders",
+				queue="long",
+				job_id="reschedule_document_reminders",
+				deduplicate=True,
+				enqueue_after_commit=True
+			)
+	
+	def validate_document_expiry_reminder_days(self):
+		"""Check document expiry reminder days is a list of day counts"""
+		from microsaas.microsaas.services.reminder_schedule import parse_reminder_days
+		
+		try:
+			parse_reminder_days(self.document_expiry_reminder_days)
+		except ValueError as e:
+			frappe.throw(f"Document Expiry Reminder Days must be comma separated whole days, not '{e}'")
 	
 	def update_whatsapp_instance_status(self):
 		"""Update WhatsApp instance status"""
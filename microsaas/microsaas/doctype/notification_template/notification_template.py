@@ -4,7 +4,18 @@
 import frappe
 from frappe.model.document import Document
 import json
-from jinja2 import Template
+import threading
+from collections import OrderedDict
+from jinja2.sandbox import SandboxedEnvironment
+
+
+# Shared sandboxed environment, template content is user editable
+jinja_env = SandboxedEnvironment()
+
+# Compiled templates keyed by (template name, modified)
+COMPILED_TEMPLATE_CACHE_SIZE = 512
+_compiled_templates = OrderedDict()
+_compiled_templates_lock = threading.Lock()
 
 
 class NotificationTemplate(Document):
@@ -14,15 +25,46 @@ class NotificationTemplate(Document):
 		if self.preview_data:
 			try:
 				preview_dict = json.loads(self.preview_data)
-				self.preview_output = self.render(preview_dict)
+				# Content is being edited, so compile it fresh
+				self.preview_output = jinja_env.from_string(self.template_content).render(**preview_dict)
 			except Exception as e:
 				frappe.msgprint(f"Error rendering template: {str(e)}")
-	
+
 	def render(self, data):
 		"""Render template with provided data"""
 		try:
-			template = Template(self.template_content)
+			if self.is_new():
+				template = jinja_env.from_string(self.template_content)
+			else:
+				template = get_compiled_template(self.name, self.modified, self.template_content)
 			return template.render(**data)
 		except Exception as e:
 			frappe.log_error(f"Template rendering error: {str(e)}")
 			return None
+
+
+def get_compiled_template(name, modified, content):
+	"""
+	Return compiled template from the LRU cache, compiling on a miss
+
+	Args:
+		name: Notification Template name
+		modified: Template modified timestamp (a new save gets a new key)
+		content: Template source used on a cache miss
+	"""
+	key = (frappe.local.site, name, str(modified))
+
+	with _compiled_templates_lock:
+		template = _compiled_templates.get(key)
+		if template is not None:
+			_compiled_templates.move_to_end(key)
+			return template
+
+	template = jinja_env.from_string(content)
+
+	with _compiled_templates_lock:
+		_compiled_templates[key] = template
+		while len(_compiled_templates) > COMPILED_TEMPLATE_CACHE_SIZE:
+			_compiled_templates.popitem(last=False)
+
+	return template
@@ -0,0 +1,9 @@
+# Copyright (c) 2026, India100x pvt. ltd. and Contributors
+# See license.txt
+
+# import frappe
+from frappe.tests.utils import FrappeTestCase
+
+
+# class TestPaymentWebhookEvent(FrappeTestCase):
+# 	pass
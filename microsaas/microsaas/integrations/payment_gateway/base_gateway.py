@@ -8,11 +8,15 @@ Abstract base class for all payment gateway integrations
 
 from abc import ABC, abstractmethod
 import frappe
+from frappe import _
 
 
 class BasePaymentGateway(ABC):
 	"""Abstract base class for payment gateways"""
 	
+	# Gateway name as stored on CA Invoice and CA Payment
+	gateway_name = None
+	
 	def __init__(self, settings=None):
 		if settings:
 			self.settings = settings
@@ -21,10 +25,13 @@ class BasePaymentGateway(ABC):
 			# In multi-tenant mode, this should ideally be avoided
 			self.settings = frappe.get_single("CA Settings")
 	
-	@abstractmethod
 	def create_payment_link(self, invoice):
 		"""
-		Create a payment link for an invoice
+		Get a payment link for an invoice, reusing its current one while valid
+		
+		A new link is created only when the invoice has none from this
+		gateway, or its outstanding amount or currency changed, or it is about
+		to expire. The replaced link is deactivated at the gateway.
 		
 		Args:
 			invoice: CA Invoice document
@@ -32,8 +39,79 @@ class BasePaymentGateway(ABC):
 		Returns:
 			Payment link URL
 		"""
+		from microsaas.microsaas.services.payment_links import (
+			get_reusable_link, get_link_amount, get_link_expiry, get_link_values, get_replaced_reference
+		)
+		
+		reusable = get_reusable_link(invoice, self.gateway_name)
+		if reusable:
+			return reusable
+		
+		try:
+			expires_at = get_link_expiry()
+			payment_link = self.send_payment_link(
+				self.payment_link_params(invoice, get_link_amount(invoice), expires_at)
+			)
+			replaced = get_replaced_reference(invoice, self.gateway_name)
+			
+			# The invoice is submitted, so the link fields are written directly
+			# instead of saving the whole document
+			invoice.db_set(get_link_values(invoice, self.gateway_name, payment_link, expires_at))
+			
+		except Exception as e:
+			self.log_error(f"Error creating {self.gateway_name} payment link: {str(e)}")
+			frappe.throw(_("Failed to create payment link"))
+		
+		if replaced:
+			try:
+				self.deactivate_payment_link(replaced)
+			except Exception as e:
+				# The old link may already be paid or expired; the new one stands
+				self.log_error(f"Error deactivating {self.gateway_name} payment link {replaced}: {str(e)}")
+		
+		return payment_link.url
+	
+	@abstractmethod
+	def payment_link_params(self, invoice, amount, expires_at):
+		"""
+		Build the gateway request for an invoice's payment link
+		
+		Args:
+			invoice: CA Invoice document or dict
+			amount: Amount the link charges
+			expires_at: Datetime after which the link is no longer reused
+		
+		Returns:
+			Request parameters for send_payment_link
+		"""
+		pass
+
+	@abstractmethod
+	def send_payment_link(self, params):
+		"""
+		Create a payment link at the gateway
+		
+		Makes only the HTTP call, without database access, so it can run
+		from a thread pool.
+		
+		Args:
+			params: Parameters from payment_link_params
+		
+		Returns:
+			Dict with reference (gateway link id) and url
+		"""
 		pass
 	
+	@abstractmethod
+	def deactivate_payment_link(self, reference):
+		"""
+		Deactivate a payment link that has been replaced (HTTP only)
+		
+		Args:
+			reference: Gateway link id
+		"""
+		pass
+
 	@abstractmethod
 	def create_payment_intent(self, invoice):
 		"""
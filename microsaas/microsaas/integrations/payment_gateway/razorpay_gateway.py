@@ -6,74 +6,82 @@ Razorpay Payment Gateway Integration
 India-focused payment gateway with UPI, cards, netbanking support
 """
 
+import time
 import frappe
 from frappe import _
+from frappe.utils import get_datetime, now_datetime
 import json
 from .base_gateway import BasePaymentGateway
+from .registry import get_gateway
+from .webhook_inbox import receive_event
 
 
 class RazorpayGateway(BasePaymentGateway):
 	"""Razorpay payment gateway implementation"""
 	
-	def __init__(self, settings=None):
+	gateway_name = "Razorpay"
+	
+	def __init__(self, settings=None, session=None):
 		super().__init__(settings)
 		self.key_id = self.settings.razorpay_key_id
 		self.key_secret = self.settings.get_password("razorpay_key_secret")
 		self.webhook_secret = self.settings.get_password("razorpay_webhook_secret")
 		
-		# Initialize Razorpay client
+		# Initialize Razorpay client (on a shared keep-alive session when given)
 		try:
 			import razorpay
-			self.client = razorpay.Client(auth=(self.key_id, self.key_secret))
+			self.client = razorpay.Client(session=session, auth=(self.key_id, self.key_secret))
 		except ImportError:
 			frappe.throw(_("Razorpay library not installed. Run: pip install razorpay"))
 	
-	def create_payment_link(self, invoice):
+	def payment_link_params(self, invoice, amount, expires_at):
 		"""
-		Create Razorpay payment link
+		Build the Razorpay payment link request
 		
 		Args:
-			invoice: CA Invoice document
+			invoice: CA Invoice document or dict (client_phone saves a lookup)
+			amount: Amount the link charges
+			expires_at: Datetime the link expires at
 		
 		Returns:
-			Payment link URL
+			Request body dict
 		"""
-		try:
-			# Create payment link
-			payment_link = self.client.payment_link.create({
-				"amount": int(invoice.total_amount * 100),  # Amount in paise
-				"currency": invoice.currency,
-				"description": f"Invoice {invoice.name}",
-				"customer": {
-					"name": invoice.client_name,
-					"email": invoice.client_email,
-					"contact": frappe.db.get_value("CA Client", invoice.client, "phone")
-				},
-				"notify": {
-					"sms": True,
-					"email": True
-				},
-				"reminder_enable": True,
-				"notes": {
-					"invoice_id": invoice.name,
-					"client_id": invoice.client,
-					"firm_id": invoice.firm
-				},
-				"callback_url": f"{frappe.utils.get_url()}/api/method/microsaas.microsaas.integrations.payment_gateway.razorpay_gateway.payment_callback",
-				"callback_method": "get"
-			})
-			
-			# Update invoice with payment link
-			invoice.payment_gateway_reference = payment_link["id"]
-			invoice.portal_link = payment_link["short_url"]
-			invoice.save(ignore_permissions=True)
-			
-			return payment_link["short_url"]
-			
-		except Exception as e:
-			self.log_error(f"Error creating Razorpay payment link: {str(e)}")
-			frappe.throw(_("Failed to create payment link"))
+		contact = invoice.get("client_phone") or frappe.db.get_value("CA Client", invoice.client, "phone")
+		
+		return {
+			"amount": int(round(amount * 100)),  # Amount in paise
+			# Unix time; counted from now so the server timezone does not matter
+			"expire_by": int(time.time() + (get_datetime(expires_at) - now_datetime()).total_seconds()),
+			"currency": invoice.currency,
+			"description": f"Invoice {invoice.name}",
+			"customer": {
+				"name": invoice.client_name,
+				"email": invoice.client_email,
+				"contact": contact
+			},
+			"notify": {
+				"sms": True,
+				"email": True
+			},
+			"reminder_enable": True,
+			"notes": {
+				"invoice_id": invoice.name,
+				"client_id": invoice.client,
+				"firm_id": invoice.firm
+			},
+			"callback_url": f"{frappe.utils.get_url()}/api/method/microsaas.microsaas.integrations.payment_gateway.razorpay_gateway.payment_callback",
+			"callback_method": "get"
+		}
+	
+	def send_payment_link(self, params):
+		"""Create the payment link at Razorpay (HTTP only, safe to call from any thread)"""
+		payment_link = self.client.payment_link.create(params)
+		return frappe._dict(reference=payment_link["id"], url=payment_link["short_url"])
 	
+	def deactivate_payment_link(self, reference):
+		"""Cancel a replaced Razorpay payment link"""
+		self.client.payment_link.cancel(reference)
+
 	def create_payment_intent(self, invoice):
 		"""
 		Create Razorpay order
@@ -170,6 +178,9 @@ class RazorpayGateway(BasePaymentGateway):
 			
 			if payment:
 				payment_doc = frappe.get_doc("CA Payment", payment)
+				if payment_doc.docstatus == 1:
+					# Already recorded by an earlier delivery of this event
+					return
 				payment_doc.status = "Completed"
 				payment_doc.gateway_response = json.dumps(payment_entity)
 				payment_doc.save(ignore_permissions=True)
@@ -191,6 +202,7 @@ class RazorpayGateway(BasePaymentGateway):
 			
 		except Exception as e:
 			self.log_error(f"Error handling payment success: {str(e)}")
+			raise
 	
 	def handle_payment_failure(self, payment_entity):
 		"""Handle failed payment"""
@@ -198,7 +210,7 @@ class RazorpayGateway(BasePaymentGateway):
 			notes = payment_entity.get("notes", {})
 			invoice_id = notes.get("invoice_id")
 			
-			if invoice_id:
+			if invoice_id and not frappe.db.exists("CA Payment", {"transaction_id": payment_entity["id"]}):
 				# Create failed payment record
 				invoice = frappe.get_doc("CA Invoice", invoice_id)
 				payment_doc = self.create_payment_record(
@@ -213,6 +225,7 @@ class RazorpayGateway(BasePaymentGateway):
 				
 		except Exception as e:
 			self.log_error(f"Error handling payment failure: {str(e)}")
+			raise
 	
 	def refund_payment(self, payment, amount=None):
 		"""
@@ -226,7 +239,7 @@ class RazorpayGateway(BasePaymentGateway):
 			Refund object
 		"""
 		try:
-			refund_amount = int((amount or payment.amount) * 100)  # Convert to paise
+			refund_amount = int(round((amount or payment.get_refundable_amount()) * 100))  # Convert to paise
 			
 			refund = self.client.payment.refund(
 				payment.transaction_id,
@@ -239,10 +252,9 @@ class RazorpayGateway(BasePaymentGateway):
 				}
 			)
 			
-			# Update payment status
-			payment.status = "Refunded"
-			payment.save(ignore_permissions=True)
-			
+			# Update payment status and invoice balance
+			payment.record_refund(amount)
+
 			return refund
 			
 		except Exception as e:
@@ -264,23 +276,23 @@ def webhook():
 		notes = payment_entity.get("notes", {})
 		firm_id = notes.get("firm_id")
 		
-		# Get settings
-		settings = None
-		if firm_id:
-			settings = frappe.get_doc("CA Firm", firm_id)
-		
-		if not settings:
-			settings = frappe.get_single("CA Settings") # Fallback
-			
-		# Verify signature
-		gateway = RazorpayGateway(settings)
+		# Verify signature with the firm's cached client (CA Settings if no firm)
+		gateway = get_gateway("Razorpay", firm_id)
 		if not gateway.verify_webhook(payload, signature):
 			frappe.throw(_("Invalid webhook signature"))
 		
-		# Process webhook
-		result = gateway.process_webhook(payload_dict)
+		# Store the event and acknowledge; a background job processes it
+		event_id = frappe.request.headers.get("X-Razorpay-Event-Id") or \
+			f"{payload_dict.get('event')}:{payment_entity.get('id')}"
 		
-		return result
+		return receive_event(
+			gateway="Razorpay",
+			event_id=event_id,
+			event_type=payload_dict.get("event"),
+			payload=payload,
+			firm=firm_id,
+			invoice=notes.get("invoice_id")
+		)
 		
 	except Exception as e:
 		frappe.log_error(f"Razorpay webhook error: {str(e)}", "Razorpay Webhook Error")
@@ -312,5 +324,5 @@ def payment_callback():
 
 def create_payment_link(invoice):
 	"""Helper function to create payment link"""
-	gateway = RazorpayGateway()
+	gateway = get_gateway("Razorpay", invoice.firm)
 	return gateway.create_payment_link(invoice)
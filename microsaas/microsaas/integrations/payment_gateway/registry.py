@@ -0,0 +1,90 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Payment Gateway Registry
+Holds one gateway client per CA Firm and gateway in each worker process, so
+payment links and webhooks reuse the decrypted credentials, the SDK client
+and its keep-alive HTTP connections instead of rebuilding them per request.
+Clients carry their own credentials, so threads may share them.
+
+Saving a CA Firm or CA Settings clears the registry in every process.
+"""
+
+import threading
+
+import frappe
+from frappe import _
+
+from microsaas.microsaas.services.process_cache import ProcessCache
+
+
+GATEWAYS = ("Razorpay", "Stripe")
+
+# Keep-alive connections held per gateway host in each process
+HTTP_POOL_SIZE = 20
+
+gateway_cache = ProcessCache("payment_gateway")
+
+_http_sessions = {}
+_http_sessions_lock = threading.Lock()
+
+
+def get_gateway(gateway, firm=None):
+	"""
+	Get the cached gateway client for a firm
+
+	Args:
+		gateway: Gateway name (Razorpay/Stripe)
+		firm: CA Firm name (CA Settings is used when not set)
+
+	Returns:
+		RazorpayGateway or StripeGateway instance
+	"""
+	if gateway not in GATEWAYS:
+		frappe.throw(_("Unsupported payment gateway: {0}").format(gateway))
+
+	gateway_cache.sync()
+	return gateway_cache.get((gateway, firm or None), lambda: build_gateway(gateway, firm))
+
+
+def get_default_gateway(firm=None):
+	"""Default payment gateway configured for a firm (or CA Settings)"""
+	gateway_cache.sync()
+	return gateway_cache.get(("default", firm or None), lambda: get_settings(firm).default_payment_gateway)
+
+
+def build_gateway(gateway, firm=None):
+	settings = get_settings(firm)
+
+	if gateway == "Razorpay":
+		from microsaas.microsaas.integrations.payment_gateway.razorpay_gateway import RazorpayGateway
+		return RazorpayGateway(settings, session=get_http_session("Razorpay"))
+
+	from microsaas.microsaas.integrations.payment_gateway.stripe_gateway import StripeGateway
+	return StripeGateway(settings, session=get_http_session("Stripe"))
+
+
+def get_settings(firm=None):
+	return frappe.get_doc("CA Firm", firm) if firm else frappe.get_single("CA Settings")
+
+
+def get_http_session(gateway):
+	"""Shared requests session with a connection pool, one per gateway per process"""
+	with _http_sessions_lock:
+		if gateway not in _http_sessions:
+			import requests
+			from requests.adapters import HTTPAdapter
+
+			session = requests.Session()
+			adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+			session.mount("https://", adapter)
+			session.mount("http://", adapter)
+			_http_sessions[gateway] = session
+
+		return _http_sessions[gateway]
+
+
+def clear_gateway_cache(doc=None, method=None):
+	"""Drop cached gateway clients after credentials change (doc_events hook)"""
+	gateway_cache.clear()
@@ -4,78 +4,99 @@
 """
 Stripe Payment Gateway Integration
 International payment gateway with card payments and subscriptions
+
+Each gateway calls Stripe through its own StripeClient carrying the firm's
+API key, so calls for different firms can run concurrently in one process.
+The module-level stripe.api_key is never set.
 """
 
 import frappe
 from frappe import _
 import json
 from .base_gateway import BasePaymentGateway
+from .registry import get_gateway
+from .webhook_inbox import receive_event
 
 
 class StripeGateway(BasePaymentGateway):
 	"""Stripe payment gateway implementation"""
 	
-	def __init__(self, settings=None):
+	gateway_name = "Stripe"
+	
+	def __init__(self, settings=None, session=None, api_base=None):
 		super().__init__(settings)
 		self.api_key = self.settings.get_password("stripe_api_key")
 		self.webhook_secret = self.settings.get_password("stripe_webhook_secret")
 		
-		# Initialize Stripe
+		# Initialize a Stripe client bound to this firm's key
 		try:
 			import stripe
-			stripe.api_key = self.api_key
-			self.stripe = stripe
+			if not hasattr(stripe, "StripeClient"):
+				raise ImportError
 		except ImportError:
-			frappe.throw(_("Stripe library not installed. Run: pip install stripe"))
+			frappe.throw(_("Stripe library not installed. Run: pip install 'stripe>=8'"))
+		
+		# Site config `microsaas_stripe_api_base` points the client at a local Stripe stand-in
+		api_base = api_base or frappe.conf.get("microsaas_stripe_api_base")
+		
+		self.client = stripe.StripeClient(
+			self.api_key,
+			base_addresses={"api": api_base} if api_base else {},
+			# Reuse the shared keep-alive session when given
+			http_client=stripe.RequestsClient(session=session) if session else None
+		)
+		# stripe>=12 serves the API resources under client.v1
+		self.api = getattr(self.client, "v1", self.client)
 	
-	def create_payment_link(self, invoice):
+	def payment_link_params(self, invoice, amount, expires_at):
 		"""
-		Create Stripe payment link
+		Build the Stripe payment link request
+		
+		Stripe payment links do not expire; the expiry is only tracked on the
+		invoice, and replaced links are deactivated.
 		
 		Args:
-			invoice: CA Invoice document
+			invoice: CA Invoice document or dict
+			amount: Amount the link charges
+			expires_at: Unused
 		
 		Returns:
-			Payment link URL
+			PaymentLink create params
 		"""
-		try:
-			# Create payment link
-			payment_link = self.stripe.PaymentLink.create(
-				line_items=[{
-					"price_data": {
-						"currency": invoice.currency.lower(),
-						"product_data": {
-							"name": f"Invoice {invoice.name}",
-							"description": f"Payment for {invoice.client_name}"
-						},
-						"unit_amount": int(invoice.total_amount * 100)  # Amount in cents
+		return {
+			"line_items": [{
+				"price_data": {
+					"currency": invoice.currency.lower(),
+					"product_data": {
+						"name": f"Invoice {invoice.name}",
+						"description": f"Payment for {invoice.client_name}"
 					},
-					"quantity": 1
-				}],
-				metadata={
-					"invoice_id": invoice.name,
-					"client_id": invoice.client,
-					"firm_id": invoice.firm
+					"unit_amount": int(round(amount * 100))  # Amount in cents
 				},
-				after_completion={
-					"type": "redirect",
-					"redirect": {
-						"url": f"{frappe.utils.get_url()}/payment-success?invoice={invoice.name}"
-					}
+				"quantity": 1
+			}],
+			"metadata": {
+				"invoice_id": invoice.name,
+				"client_id": invoice.client,
+				"firm_id": invoice.firm
+			},
+			"after_completion": {
+				"type": "redirect",
+				"redirect": {
+					"url": f"{frappe.utils.get_url()}/payment-success?invoice={invoice.name}"
 				}
-			)
-			
-			# Update invoice
-			invoice.payment_gateway_reference = payment_link.id
-			invoice.portal_link = payment_link.url
-			invoice.save(ignore_permissions=True)
-			
-			return payment_link.url
-			
-		except Exception as e:
-			self.log_error(f"Error creating Stripe payment link: {str(e)}")
-			frappe.throw(_("Failed to create payment link"))
+			}
+		}
 	
+	def send_payment_link(self, params):
+		"""Create the payment link at Stripe (HTTP only, safe to call from any thread)"""
+		payment_link = self.api.payment_links.create(params=params)
+		return frappe._dict(reference=payment_link.id, url=payment_link.url)
+	
+	def deactivate_payment_link(self, reference):
+		"""Deactivate a replaced Stripe payment link"""
+		self.api.payment_links.update(reference, params={"active": False})
+
 	def create_payment_intent(self, invoice):
 		"""
 		Create Stripe payment intent
@@ -87,16 +108,16 @@ class StripeGateway(BasePaymentGateway):
 			Payment intent object
 		"""
 		try:
-			intent = self.stripe.PaymentIntent.create(
-				amount=int(invoice.total_amount * 100),  # Amount in cents
-				currency=invoice.currency.lower(),
-				metadata={
+			intent = self.api.payment_intents.create(params={
+				"amount": int(invoice.total_amount * 100),  # Amount in cents
+				"currency": invoice.currency.lower(),
+				"metadata": {
 					"invoice_id": invoice.name,
 					"client_id": invoice.client,
 					"firm_id": invoice.firm
 				},
-				description=f"Invoice {invoice.name}"
-			)
+				"description": f"Invoice {invoice.name}"
+			})
 			
 			return intent
 			
@@ -116,7 +137,7 @@ class StripeGateway(BasePaymentGateway):
 			Event object or None
 		"""
 		try:
-			event = self.stripe.Webhook.construct_event(
+			event = self.client.construct_event(
 				payload,
 				signature,
 				self.webhook_secret
@@ -171,6 +192,9 @@ class StripeGateway(BasePaymentGateway):
 			
 			if payment:
 				payment_doc = frappe.get_doc("CA Payment", payment)
+				if payment_doc.docstatus == 1:
+					# Already recorded by an earlier delivery of this event
+					return
 				payment_doc.status = "Completed"
 				payment_doc.gateway_response = json.dumps(payment_intent)
 				payment_doc.save(ignore_permissions=True)
@@ -192,6 +216,7 @@ class StripeGateway(BasePaymentGateway):
 			
 		except Exception as e:
 			self.log_error(f"Error handling payment success: {str(e)}")
+			raise
 	
 	def handle_payment_failure(self, payment_intent):
 		"""Handle failed payment intent"""
@@ -199,7 +224,7 @@ class StripeGateway(BasePaymentGateway):
 			metadata = payment_intent.get("metadata", {})
 			invoice_id = metadata.get("invoice_id")
 			
-			if invoice_id:
+			if invoice_id and not frappe.db.exists("CA Payment", {"transaction_id": payment_intent["id"]}):
 				invoice = frappe.get_doc("CA Invoice", invoice_id)
 				payment_doc = self.create_payment_record(
 					invoice=invoice,
@@ -213,6 +238,7 @@ class StripeGateway(BasePaymentGateway):
 				
 		except Exception as e:
 			self.log_error(f"Error handling payment failure: {str(e)}")
+			raise
 	
 	def handle_checkout_completed(self, session):
 		"""Handle completed checkout session"""
@@ -224,11 +250,12 @@ class StripeGateway(BasePaymentGateway):
 				# Retrieve payment intent
 				payment_intent_id = session.get("payment_intent")
 				if payment_intent_id:
-					payment_intent = self.stripe.PaymentIntent.retrieve(payment_intent_id)
+					payment_intent = self.api.payment_intents.retrieve(payment_intent_id)
 					self.handle_payment_success(payment_intent)
 					
 		except Exception as e:
 			self.log_error(f"Error handling checkout completion: {str(e)}")
+			raise
 	
 	def refund_payment(self, payment, amount=None):
 		"""
@@ -242,17 +269,16 @@ class StripeGateway(BasePaymentGateway):
 			Refund object
 		"""
 		try:
-			refund_amount = int((amount or payment.amount) * 100)  # Convert to cents
-			
-			refund = self.stripe.Refund.create(
-				payment_intent=payment.transaction_id,
-				amount=refund_amount
-			)
+			refund_amount = int(round((amount or payment.get_refundable_amount()) * 100))  # Convert to cents
 			
-			# Update payment status
-			payment.status = "Refunded"
-			payment.save(ignore_permissions=True)
+			refund = self.api.refunds.create(params={
+				"payment_intent": payment.transaction_id,
+				"amount": refund_amount
+			})
 			
+			# Update payment status and invoice balance
+			payment.record_refund(amount)
+
 			return refund
 			
 		except Exception as e:
@@ -270,26 +296,28 @@ def webhook():
 		# Parse payload to get firm_id
 		try:
 			data = json.loads(payload)
-			firm_id = data.get("data", {}).get("object", {}).get("metadata", {}).get("firm_id")
+			metadata = data.get("data", {}).get("object", {}).get("metadata", {})
+			firm_id = metadata.get("firm_id")
 		except:
+			metadata = {}
 			firm_id = None
 			
-		# Get settings
-		settings = None
-		if firm_id:
-			settings = frappe.get_doc("CA Firm", firm_id)
-			
-		if not settings:
-			settings = frappe.get_single("CA Settings") # Fallback
-		
-		gateway = StripeGateway(settings)
+		# Firm's cached client (CA Settings if no firm)
+		gateway = get_gateway("Stripe", firm_id)
 		event = gateway.verify_webhook(payload, signature)
 		
 		if not event:
 			frappe.throw(_("Invalid webhook signature"))
 		
-		result = gateway.process_webhook(event)
-		return result
+		# Store the event and acknowledge; a background job processes it
+		return receive_event(
+			gateway="Stripe",
+			event_id=event["id"],
+			event_type=event["type"],
+			payload=payload,
+			firm=firm_id,
+			invoice=metadata.get("invoice_id")
+		)
 		
 	except Exception as e:
 		frappe.log_error(f"Stripe webhook error: {str(e)}", "Stripe Webhook Error")
@@ -298,5 +326,5 @@ def webhook():
 
 def create_payment_link(invoice):
 	"""Helper function to create payment link"""
-	gateway = StripeGateway()
+	gateway = get_gateway("Stripe", invoice.firm)
 	return gateway.create_payment_link(invoice)
@@ -0,0 +1,103 @@
+# Copyright (c) 2026, India100x pvt. ltd. and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, flt, today
+
+from microsaas.microsaas.integrations.payment_gateway.base_gateway import BasePaymentGateway
+
+
+class RecordingGateway(BasePaymentGateway):
+	"""Gateway that hands out numbered links without any HTTP calls"""
+
+	gateway_name = "Stripe"
+
+	def __init__(self):
+		super().__init__(settings=frappe._dict())
+		self.created = []
+		self.deactivated = []
+
+	def payment_link_params(self, invoice, amount, expires_at):
+		return {"invoice": invoice.name, "amount": amount}
+
+	def send_payment_link(self, params):
+		self.created.append(params)
+		number = len(self.created)
+		return frappe._dict(reference=f"plink_{number}", url=f"https://pay.example.com/{number}")
+
+	def deactivate_payment_link(self, reference):
+		self.deactivated.append(reference)
+
+	def create_payment_intent(self, invoice):
+		pass
+
+	def verify_webhook(self, payload, signature):
+		return True
+
+	def process_webhook(self, payload):
+		pass
+
+	def refund_payment(self, payment, amount=None):
+		pass
+
+
+def make_submitted_invoice(total):
+	firm_name = f"_Test Link Firm {frappe.generate_hash(length=6)}"
+	frappe.get_doc({"doctype": "CA Firm", "firm_name": firm_name}).insert(ignore_permissions=True)
+
+	client = frappe.get_doc({
+		"doctype": "CA Client",
+		"firm": firm_name,
+		"client_name": "_Test Link Client",
+		"email": f"link.client.{frappe.generate_hash(length=6)}@example.com",
+		"status": "Active"
+	}).insert(ignore_permissions=True)
+
+	invoice = frappe.get_doc({
+		"doctype": "CA Invoice",
+		"firm": firm_name,
+		"client": client.name,
+		"invoice_date": today(),
+		"due_date": add_days(today(), 30),
+		"items": [{"description": "Audit", "quantity": 1, "rate": total}],
+		"auto_send_on_creation": 0
+	}).insert(ignore_permissions=True)
+	invoice.submit()
+
+	return invoice
+
+
+class TestCreatePaymentLink(FrappeTestCase):
+	def test_link_is_stored_on_submitted_invoice(self):
+		invoice = make_submitted_invoice(1000)
+		gateway = RecordingGateway()
+
+		url = gateway.create_payment_link(invoice)
+
+		stored = frappe.db.get_value(
+			"CA Invoice", invoice.name,
+			["portal_link", "payment_gateway_reference", "payment_link_gateway", "payment_link_amount", "docstatus"],
+			as_dict=True
+		)
+		self.assertEqual(url, "https://pay.example.com/1")
+		self.assertEqual(stored.portal_link, url)
+		self.assertEqual(stored.payment_gateway_reference, "plink_1")
+		self.assertEqual(stored.payment_link_gateway, "Stripe")
+		self.assertEqual(flt(stored.payment_link_amount), 1000)
+		self.assertEqual(stored.docstatus, 1)
+
+	def test_link_is_reused_until_amount_changes(self):
+		invoice = make_submitted_invoice(1000)
+		gateway = RecordingGateway()
+
+		first = gateway.create_payment_link(invoice)
+		self.assertEqual(gateway.create_payment_link(frappe.get_doc("CA Invoice", invoice.name)), first)
+		self.assertEqual(len(gateway.created), 1)
+
+		frappe.db.set_value("CA Invoice", invoice.name, "outstanding_amount", 600)
+		second = gateway.create_payment_link(frappe.get_doc("CA Invoice", invoice.name))
+
+		self.assertNotEqual(second, first)
+		self.assertEqual(gateway.created[-1]["amount"], 600)
+		self.assertEqual(gateway.deactivated, ["plink_1"])
@@ -0,0 +1,137 @@
+# Copyright (c) 2026, India100x pvt. ltd. and Contributors
+# See license.txt
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from microsaas.microsaas.integrations.payment_gateway.registry import get_http_session
+from microsaas.microsaas.integrations.payment_gateway.stripe_gateway import StripeGateway
+
+
+class StripeStandInHandler(BaseHTTPRequestHandler):
+	"""Answers POST /v1/payment_links the way Stripe does, echoing the key it was called with"""
+
+	def do_POST(self):
+		api_key = self.headers.get("Authorization", "").removeprefix("Bearer ")
+		body = parse_qs(self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode())
+		firm = body.get("metadata[firm_id]", [None])[0]
+
+		# Hold the request briefly so calls from different firms overlap
+		time.sleep(random.uniform(0, 0.005))
+
+		with self.server.lock:
+			self.server.calls.append({"api_key": api_key, "firm": firm})
+			number = len(self.server.calls)
+
+		response = json.dumps({
+			"id": f"plink_{number}",
+			"object": "payment_link",
+			"url": f"https://buy.stripe.test/{api_key}/{number}",
+			"metadata": {"firm_id": firm}
+		}).encode()
+
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(response)))
+		self.end_headers()
+		self.wfile.write(response)
+
+	def log_message(self, *args):
+		pass
+
+
+class StripeStandIn(ThreadingHTTPServer):
+	"""Local Stripe API on a free port, run in a background thread"""
+
+	daemon_threads = True
+	# Room for every pool thread to connect at once without being reset
+	request_queue_size = 64
+
+	def __init__(self):
+		super().__init__(("127.0.0.1", 0), StripeStandInHandler)
+		self.calls = []
+		self.lock = threading.Lock()
+		threading.Thread(target=self.serve_forever, daemon=True).start()
+
+	@property
+	def api_base(self):
+		return f"http://127.0.0.1:{self.server_address[1]}"
+
+	def stop(self):
+		self.shutdown()
+		self.server_close()
+
+
+class FirmSettings:
+	"""Stripe credentials of one firm, as read from CA Firm"""
+
+	def __init__(self, firm):
+		self.name = firm
+		self.api_key = f"sk_test_{firm}"
+
+	def get_password(self, fieldname, raise_exception=True):
+		return self.api_key if fieldname == "stripe_api_key" else f"whsec_{self.name}"
+
+
+def make_invoice(firm, number):
+	return frappe._dict(
+		name=f"INV-{firm}-{number}",
+		client=f"CLI-{firm}",
+		client_name=f"Client of {firm}",
+		firm=firm,
+		currency="INR",
+		total_amount=100 + number
+	)
+
+
+class TestStripeGateway(FrappeTestCase):
+	def setUp(self):
+		self.stand_in = StripeStandIn()
+		self.session = get_http_session("Stripe")
+		self.gateways = {
+			firm: StripeGateway(FirmSettings(firm), session=self.session, api_base=self.stand_in.api_base)
+			for firm in (f"FIRM{number}" for number in range(8))
+		}
+
+	def tearDown(self):
+		self.stand_in.stop()
+
+	def test_concurrent_payment_links_keep_firm_keys(self):
+		invoices = [make_invoice(firm, number) for number in range(25) for firm in self.gateways]
+		requests = [
+			(invoice.firm, self.gateways[invoice.firm].payment_link_params(invoice, invoice.total_amount, None))
+			for invoice in invoices
+		]
+
+		def send(request):
+			firm, params = request
+			return firm, self.gateways[firm].send_payment_link(params)
+
+		with ThreadPoolExecutor(max_workers=16) as pool:
+			results = list(pool.map(send, requests))
+
+		self.assertEqual(len(self.stand_in.calls), len(invoices))
+
+		# Every request reached Stripe with the key of the firm it was made for
+		for call in self.stand_in.calls:
+			self.assertEqual(call["api_key"], f"sk_test_{call['firm']}")
+
+		for firm, link in results:
+			self.assertIn(f"/sk_test_{firm}/", link.url)
+
+	def test_module_api_key_is_not_set(self):
+		import stripe
+
+		gateway = self.gateways["FIRM0"]
+		gateway.send_payment_link(gateway.payment_link_params(make_invoice("FIRM0", 1), 100, None))
+
+		self.assertIsNone(stripe.api_key)
+		self.assertEqual(self.stand_in.calls[0]["api_key"], "sk_test_FIRM0")
@@ -0,0 +1,191 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Payment Webhook Inbox
+Verified gateway events are stored as Payment Webhook Event records and
+acknowledged straight away. Background jobs then process them one invoice
+at a time, in the order they were received.
+
+Gateways retry deliveries, so each event is stored under a unique
+gateway:event_id key and a repeated delivery is acknowledged without
+being queued again.
+"""
+
+import json
+
+import frappe
+from frappe.utils import now, add_to_date
+
+from microsaas.microsaas.integrations.payment_gateway.registry import get_gateway
+
+
+MAX_ATTEMPTS = 5
+
+# Events left in Processing longer than this are assumed to belong to a dead worker
+STALE_PROCESSING_MINUTES = 10
+
+
+def receive_event(gateway, event_id, event_type, payload, firm=None, invoice=None):
+	"""
+	Store a verified webhook event and queue it for processing
+
+	Args:
+		gateway: Gateway name (Razorpay/Stripe)
+		event_id: Gateway event id, unique per gateway
+		event_type: Gateway event type (e.g. payment.captured)
+		payload: Raw request body
+		firm: CA Firm the event belongs to
+		invoice: CA Invoice the event belongs to
+
+	Returns:
+		Dict with status "queued" or "duplicate"
+	"""
+	event_key = f"{gateway}:{event_id}"
+
+	if frappe.db.exists("Payment Webhook Event", event_key):
+		return {"status": "duplicate", "event": event_key}
+
+	if invoice and not frappe.db.exists("CA Invoice", invoice):
+		invoice = None
+
+	try:
+		frappe.get_doc({
+			"doctype": "Payment Webhook Event",
+			"event_key": event_key,
+			"gateway": gateway,
+			"event_id": event_id,
+			"event_type": event_type,
+			"firm": firm,
+			"invoice": invoice,
+			"payload": payload.decode() if isinstance(payload, bytes) else payload,
+			"status": "Queued",
+			"received_at": now()
+		}).insert(ignore_permissions=True)
+	except frappe.DuplicateEntryError:
+		# A concurrent retry of the same delivery got there first
+		frappe.db.rollback()
+		return {"status": "duplicate", "event": event_key}
+
+	frappe.db.commit()
+	enqueue_event_processing(invoice=invoice, event=event_key)
+
+	return {"status": "queued", "event": event_key}
+
+
+def enqueue_event_processing(invoice=None, event=None):
+	"""Start the processing job for an invoice (or a single event without one)"""
+	frappe.enqueue(
+		"microsaas.microsaas.integrations.payment_gateway.webhook_inbox.process_events",
+		queue="short",
+		job_id=f"webhook_events::{invoice or event}",
+		deduplicate=True,
+		invoice=invoice,
+		event=None if invoice else event
+	)
+
+
+def process_events(invoice=None, event=None):
+	"""
+	Process pending events for one invoice, oldest first
+
+	Stops at the first failure so later events never overtake an earlier one;
+	the failed event is picked up again by the scheduler sweep.
+
+	Args:
+		invoice: CA Invoice whose events should be processed
+		event: Single event name, for events not tied to an invoice
+	"""
+	filters = {"invoice": invoice} if invoice else {"name": event}
+
+	while True:
+		pending = frappe.get_all(
+			"Payment Webhook Event",
+			filters=dict(filters, status=["in", ["Queued", "Failed"]], attempts=["<", MAX_ATTEMPTS]),
+			pluck="name",
+			order_by="received_at asc, creation asc",
+			limit=20
+		)
+
+		if not pending:
+			break
+
+		for name in pending:
+			if not process_event(name):
+				return
+
+
+def process_event(name):
+	"""
+	Process one stored event
+
+	Args:
+		name: Payment Webhook Event name
+
+	Returns:
+		False if processing failed, True otherwise
+	"""
+	# Row lock so a sweep-started job never handles the same event twice
+	event = frappe.db.get_value(
+		"Payment Webhook Event",
+		name,
+		["name", "gateway", "firm", "payload", "status", "attempts"],
+		as_dict=True,
+		for_update=True
+	)
+
+	if not event or event.status not in ("Queued", "Failed"):
+		frappe.db.commit()
+		return True
+
+	frappe.db.set_value("Payment Webhook Event", name, "status", "Processing")
+	frappe.db.commit()
+
+	try:
+		gateway = get_gateway(event.gateway, event.firm)
+		result = gateway.process_webhook(json.loads(event.payload))
+
+		if result.get("status") == "error":
+			raise Exception(result.get("message"))
+
+		frappe.db.set_value("Payment Webhook Event", name, {
+			"status": "Processed",
+			"processed_at": now(),
+			"attempts": event.attempts + 1,
+			"error": None
+		}, update_modified=False)
+		frappe.db.commit()
+		return True
+
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.db.set_value("Payment Webhook Event", name, {
+			"status": "Failed",
+			"attempts": event.attempts + 1,
+			"error": str(e)
+		}, update_modified=False)
+		frappe.db.commit()
+		frappe.log_error(f"Error processing webhook event {name}: {str(e)}", "Payment Webhook Error")
+		return False
+
+
+def process_pending_events():
+	"""Re-queue events that are waiting, due a retry or stuck in Processing (scheduler)"""
+	stale = add_to_date(now(), minutes=-STALE_PROCESSING_MINUTES)
+
+	frappe.db.sql("""
+		UPDATE `tabPayment Webhook Event`
+		SET status = 'Queued'
+		WHERE status = 'Processing' AND modified < %s
+	""", stale)
+	frappe.db.commit()
+
+	pending = frappe.db.sql("""
+		SELECT invoice, MIN(name) as event
+		FROM `tabPayment Webhook Event`
+		WHERE status IN ('Queued', 'Failed') AND attempts < %s
+		GROUP BY IFNULL(invoice, name)
+	""", MAX_ATTEMPTS, as_dict=True)
+
+	for row in pending:
+		enqueue_event_processing(invoice=row.invoice, event=row.event)
@@ -54,42 +54,52 @@ def get_columns():
 def get_data(filters):
 	conditions = get_conditions(filters)
 	
-	# Fetch aggregated data
+	# Invoice and payment totals are each aggregated once per client and
+	# joined, so the report costs a single query however many clients there are
 	data = frappe.db.sql(f"""
 		SELECT
-			client,
-			SUM(total_amount) as total_invoiced,
-			MAX(invoice_date) as last_invoice_date,
-			firm,
-			currency
-		FROM
-			`tabCA Invoice`
-		WHERE
-			docstatus = 1 {conditions}
-		GROUP BY
-			client
+			inv.client,
+			inv.total_invoiced,
+			inv.last_invoice_date,
+			inv.firm,
+			inv.currency,
+			IFNULL(pay.total_paid, 0) as total_paid
+		FROM (
+			SELECT
+				client,
+				SUM(total_amount) as total_invoiced,
+				MAX(invoice_date) as last_invoice_date,
+				firm,
+				currency
+			FROM
+				`tabCA Invoice`
+			WHERE
+				docstatus = 1 {conditions}
+			GROUP BY
+				client
+		) inv
+		LEFT JOIN (
+			SELECT
+				client,
+				SUM(amount - refunded_amount) as total_paid
+			FROM
+				`tabCA Payment`
+			WHERE
+				status IN ('Completed', 'Partially Refunded') AND docstatus = 1 {conditions}
+			GROUP BY
+				client
+		) pay ON pay.client = inv.client
 	""", filters, as_dict=1)
 	
-	result = []
 	for row in data:
-		# Calculate paid amount
-		paid_amount = frappe.db.sql("""
-			SELECT SUM(amount) 
-			FROM `tabCA Payment` 
-			WHERE client = %s AND status = 'Completed' AND docstatus = 1
-		""", row.client)[0][0] or 0
-		
-		row["total_paid"] = paid_amount
-		row["outstanding"] = row["total_invoiced"] - paid_amount
+		row["outstanding"] = row["total_invoiced"] - row["total_paid"]
 		
 		if row["outstanding"] > 0:
 			row["status"] = "Pending"
 		else:
 			row["status"] = "Clear"
-			
-		result.append(row)
 		
-	return result
+	return data
 
 def get_conditions(filters):
 	conditions = ""
@@ -49,6 +49,13 @@ def get_columns():
 			"options": "currency",
 			"width": 120
 		},
+		{
+			"fieldname": "outstanding_amount",
+			"label": _("Outstanding"),
+			"fieldtype": "Currency",
+			"options": "currency",
+			"width": 120
+		},
 		{
 			"fieldname": "status",
 			"label": _("Status"),
@@ -67,6 +74,7 @@ def get_data(filters):
 			invoice_date,
 			due_date,
 			total_amount,
+			outstanding_amount,
 			status,
 			currency
 		FROM
@@ -0,0 +1,203 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Client Summary Service
+Maintains the per-client CA Client Summary record and the cached portal
+dashboard built from it
+"""
+
+import frappe
+from frappe.utils import today, now
+
+
+DASHBOARD_CACHE_PREFIX = "microsaas:client_dashboard:"
+DASHBOARD_CACHE_TTL = 6 * 60 * 60  # seconds
+
+SUMMARY_FIELDS = [
+	"total_paid",
+	"total_outstanding",
+	"open_invoice_count",
+	"next_appointment",
+	"next_appointment_date",
+	"next_appointment_time"
+]
+
+
+def refresh_client_summary(client):
+	"""
+	Recompute the summary record for one client
+
+	Args:
+		client: CA Client name
+
+	Returns:
+		Summary values as a dict
+	"""
+	total_outstanding, open_invoice_count = frappe.db.sql("""
+		SELECT IFNULL(SUM(outstanding_amount), 0), COUNT(*)
+		FROM `tabCA Invoice`
+		WHERE client = %s AND docstatus = 1
+		AND status IN ('Unpaid', 'Partially Paid', 'Overdue')
+	""", client)[0]
+
+	total_paid = frappe.db.sql("""
+		SELECT IFNULL(SUM(amount - refunded_amount), 0)
+		FROM `tabCA Payment`
+		WHERE client = %s AND status IN ('Completed', 'Partially Refunded') AND docstatus = 1
+	""", client)[0][0]
+
+	next_appointment = frappe.get_all(
+		"CA Appointment",
+		filters={
+			"client": client,
+			"status": "Scheduled",
+			"appointment_date": [">=", today()]
+		},
+		fields=["name", "appointment_date", "appointment_time"],
+		order_by="appointment_date asc, appointment_time asc",
+		limit=1
+	)
+	next_appointment = next_appointment[0] if next_appointment else frappe._dict()
+
+	summary = {
+		"total_paid": total_paid,
+		"total_outstanding": total_outstanding,
+		"open_invoice_count": open_invoice_count,
+		"next_appointment": next_appointment.get("name"),
+		"next_appointment_date": next_appointment.get("appointment_date"),
+		"next_appointment_time": next_appointment.get("appointment_time"),
+		"last_refreshed": now()
+	}
+
+	# One upsert, so concurrent refreshes of a new client cannot both insert
+	frappe.db.sql("""
+		INSERT INTO `tabCA Client Summary` (
+			name, client, client_name, firm, creation, modified, owner, modified_by, docstatus,
+			total_paid, total_outstanding, open_invoice_count,
+			next_appointment, next_appointment_date, next_appointment_time, last_refreshed
+		)
+		SELECT
+			c.name, c.name, c.client_name, c.firm, %(now)s, %(now)s, %(user)s, %(user)s, 0,
+			%(total_paid)s, %(total_outstanding)s, %(open_invoice_count)s,
+			%(next_appointment)s, %(next_appointment_date)s, %(next_appointment_time)s, %(last_refreshed)s
+		FROM `tabCA Client` c
+		WHERE c.name = %(client)s
+		ON DUPLICATE KEY UPDATE
+			total_paid = VALUES(total_paid),
+			total_outstanding = VALUES(total_outstanding),
+			open_invoice_count = VALUES(open_invoice_count),
+			next_appointment = VALUES(next_appointment),
+			next_appointment_date = VALUES(next_appointment_date),
+			next_appointment_time = VALUES(next_appointment_time),
+			last_refreshed = VALUES(last_refreshed)
+	""", dict(summary, client=client, now=summary["last_refreshed"], user=frappe.session.user))
+
+	invalidate_client_dashboard(client)
+
+	return frappe._dict(summary)
+
+
+def get_client_summary(client):
+	"""Return the stored summary for a client, building it on first use"""
+	summary = frappe.db.get_value("CA Client Summary", client, SUMMARY_FIELDS, as_dict=True)
+	return summary or refresh_client_summary(client)
+
+
+def on_financial_change(doc, method=None):
+	"""Refresh the client's summary after an invoice, payment or appointment change (doc_events hook)"""
+	if doc.get("client"):
+		refresh_client_summary(doc.client)
+
+
+def on_dashboard_change(doc, method=None):
+	"""Drop the cached dashboard after a change to the client or its documents (doc_events hook)"""
+	client = doc.name if doc.doctype == "CA Client" else doc.get("client")
+	if client:
+		invalidate_client_dashboard(client)
+
+
+def get_cached_dashboard(client):
+	return frappe.cache().get_value(DASHBOARD_CACHE_PREFIX + client)
+
+
+def set_cached_dashboard(client, dashboard):
+	frappe.cache().set_value(DASHBOARD_CACHE_PREFIX + client, dashboard, expires_in_sec=DASHBOARD_CACHE_TTL)
+
+
+def invalidate_client_dashboard(client):
+	"""Delete the cached dashboard now and again once the transaction commits"""
+	def delete():
+		frappe.cache().delete_value(DASHBOARD_CACHE_PREFIX + client)
+
+	delete()
+	frappe.db.after_commit.add(delete)
+
+
+def rebuild_client_summaries(firm=None):
+	"""
+	Rebuild summary records for every client with set-based queries
+
+	Run with:
+		bench --site <site> execute microsaas.microsaas.services.client_summary.rebuild_client_summaries
+
+	Args:
+		firm: Limit the rebuild to one CA Firm
+	"""
+	conditions = "WHERE c.firm = %(firm)s" if firm else ""
+	values = {"firm": firm, "today": today(), "now": now(), "user": frappe.session.user}
+
+	frappe.db.sql(f"""
+		INSERT INTO `tabCA Client Summary` (
+			name, client, client_name, firm, creation, modified, owner, modified_by, docstatus,
+			total_paid, total_outstanding, open_invoice_count, next_appointment, last_refreshed
+		)
+		SELECT
+			c.name, c.name, c.client_name, c.firm, %(now)s, %(now)s, %(user)s, %(user)s, 0,
+			IFNULL(pay.total_paid, 0),
+			IFNULL(inv.total_outstanding, 0),
+			IFNULL(inv.open_invoice_count, 0),
+			(
+				SELECT apt.name
+				FROM `tabCA Appointment` apt
+				WHERE apt.client = c.name AND apt.status = 'Scheduled'
+				AND apt.appointment_date >= %(today)s
+				ORDER BY apt.appointment_date, apt.appointment_time
+				LIMIT 1
+			),
+			%(now)s
+		FROM `tabCA Client` c
+		LEFT JOIN (
+			SELECT client, SUM(outstanding_amount) as total_outstanding, COUNT(*) as open_invoice_count
+			FROM `tabCA Invoice`
+			WHERE docstatus = 1 AND status IN ('Unpaid', 'Partially Paid', 'Overdue')
+			GROUP BY client
+		) inv ON inv.client = c.name
+		LEFT JOIN (
+			SELECT client, SUM(amount - refunded_amount) as total_paid
+			FROM `tabCA Payment`
+			WHERE status IN ('Completed', 'Partially Refunded') AND docstatus = 1
+			GROUP BY client
+		) pay ON pay.client = c.name
+		{conditions}
+		ON DUPLICATE KEY UPDATE
+			total_paid = VALUES(total_paid),
+			total_outstanding = VALUES(total_outstanding),
+			open_invoice_count = VALUES(open_invoice_count),
+			next_appointment = VALUES(next_appointment),
+			last_refreshed = VALUES(last_refreshed)
+	""", values)
+
+	# Copy date and time of the chosen appointment
+	frappe.db.sql(f"""
+		UPDATE `tabCA Client Summary` s
+		INNER JOIN `tabCA Client` c ON c.name = s.client
+		LEFT JOIN `tabCA Appointment` apt ON apt.name = s.next_appointment
+		SET
+			s.next_appointment_date = apt.appointment_date,
+			s.next_appointment_time = apt.appointment_time
+		{conditions}
+	""", values)
+
+	frappe.db.commit()
+	frappe.cache().delete_keys(DASHBOARD_CACHE_PREFIX)
@@ -0,0 +1,195 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Invoice PDF Service
+Renders invoice PDFs once per distinct content. Each PDF is stored as a File
+named after a hash of the invoice content and print format, so an unchanged
+invoice reuses its existing File instead of rendering again.
+
+Batches render HTML in the calling process and convert it to PDF in a
+process pool, so wkhtmltopdf runs for several invoices at once.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import frappe
+from frappe.utils import cint
+
+
+# Fields that change without changing what the PDF shows
+VOLATILE_FIELDS = ("modified", "modified_by", "creation", "owner", "_user_tags", "_comments", "_assign", "_liked_by")
+
+
+def get_invoice_pdf(invoice_name, print_format=None):
+	"""
+	Get the PDF File for an invoice, rendering it only if its content changed
+
+	Args:
+		invoice_name: CA Invoice name
+		print_format: Print Format name (default format if not set)
+
+	Returns:
+		File document
+	"""
+	content_hash = get_content_hash(invoice_name, print_format)
+	file_doc = get_cached_file(invoice_name, content_hash)
+	if file_doc:
+		return file_doc
+
+	pdf = frappe.get_print("CA Invoice", invoice_name, print_format, as_pdf=True)
+	return save_pdf(invoice_name, content_hash, pdf)
+
+
+def render_invoice_pdfs(invoice_names, print_format=None, workers=None):
+	"""
+	Render PDFs for a batch of invoices in parallel
+
+	Args:
+		invoice_names: CA Invoice names
+		print_format: Print Format name (default format if not set)
+		workers: Number of render processes (site config `microsaas_pdf_workers` or CPU count)
+
+	Returns:
+		List of dicts with invoice, status (Cached/Rendered/Failed), file_url and error
+	"""
+	results = {}
+	pending = {}
+
+	for invoice_name in invoice_names:
+		try:
+			content_hash = get_content_hash(invoice_name, print_format)
+			file_doc = get_cached_file(invoice_name, content_hash)
+
+			if file_doc:
+				results[invoice_name] = {"invoice": invoice_name, "status": "Cached", "file_url": file_doc.file_url}
+			else:
+				html = frappe.get_print("CA Invoice", invoice_name, print_format)
+				pending[invoice_name] = (content_hash, html)
+
+		except Exception as e:
+			results[invoice_name] = {"invoice": invoice_name, "status": "Failed", "error": str(e)}
+
+	if pending:
+		workers = cint(workers) or cint(frappe.conf.get("microsaas_pdf_workers")) or os.cpu_count()
+
+		with ProcessPoolExecutor(
+			max_workers=min(workers, len(pending)),
+			mp_context=multiprocessing.get_context("spawn"),
+			initializer=init_render_worker,
+			initargs=(frappe.local.site, frappe.local.sites_path)
+		) as pool:
+			futures = {
+				invoice_name: pool.submit(render_pdf, html)
+				for invoice_name, (content_hash, html) in pending.items()
+			}
+
+			for invoice_name, future in futures.items():
+				try:
+					file_doc = save_pdf(invoice_name, pending[invoice_name][0], future.result())
+					results[invoice_name] = {"invoice": invoice_name, "status": "Rendered", "file_url": file_doc.file_url}
+				except Exception as e:
+					frappe.log_error(f"Error rendering PDF for {invoice_name}: {str(e)}", "Invoice PDF Error")
+					results[invoice_name] = {"invoice": invoice_name, "status": "Failed", "error": str(e)}
+
+		frappe.db.commit()
+
+	return [results[invoice_name] for invoice_name in invoice_names]
+
+
+@frappe.whitelist()
+def enqueue_invoice_pdfs(invoice_names, print_format=None):
+	"""
+	Render PDFs for a batch of invoices in the background
+
+	Per-invoice results are published to the requesting user as the
+	`invoice_pdf_batch` realtime event when the batch finishes.
+
+	Args:
+		invoice_names: JSON list of CA Invoice names
+		print_format: Print Format name (default format if not set)
+	"""
+	invoice_names = frappe.parse_json(invoice_names)
+
+	for invoice_name in invoice_names:
+		frappe.has_permission("CA Invoice", "read", invoice_name, throw=True)
+
+	frappe.enqueue(
+		"microsaas.microsaas.services.invoice_pdf.render_invoice_pdf_batch",
+		queue="long",
+		timeout=3600,
+		invoice_names=invoice_names,
+		print_format=print_format,
+		user=frappe.session.user
+	)
+
+	return {"queued": len(invoice_names)}
+
+
+def render_invoice_pdf_batch(invoice_names, print_format=None, user=None):
+	"""Render a batch and publish the per-invoice results (background job)"""
+	results = render_invoice_pdfs(invoice_names, print_format)
+
+	frappe.publish_realtime("invoice_pdf_batch", {"results": results}, user=user)
+	return results
+
+
+def get_content_hash(invoice_name, print_format=None):
+	"""Hash the invoice content together with the print format it is rendered with"""
+	invoice = frappe.get_doc("CA Invoice", invoice_name).as_dict(convert_dates_to_str=True)
+	for fieldname in VOLATILE_FIELDS:
+		invoice.pop(fieldname, None)
+
+	for item in invoice.get("items") or []:
+		for fieldname in VOLATILE_FIELDS:
+			item.pop(fieldname, None)
+
+	print_format = print_format or frappe.get_meta("CA Invoice").default_print_format
+	format_modified = frappe.db.get_value("Print Format", print_format, "modified") if print_format else None
+
+	key = json.dumps([invoice, print_format, str(format_modified)], sort_keys=True, default=str)
+	return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_file_name(invoice_name, content_hash):
+	return f"Invoice-{invoice_name}-{content_hash[:12]}.pdf"
+
+
+def get_cached_file(invoice_name, content_hash):
+	"""Return the File already rendered for this content, if any"""
+	name = frappe.db.get_value("File", {
+		"attached_to_doctype": "CA Invoice",
+		"attached_to_name": invoice_name,
+		"file_name": get_file_name(invoice_name, content_hash)
+	})
+
+	return frappe.get_doc("File", name) if name else None
+
+
+def save_pdf(invoice_name, content_hash, pdf):
+	file_doc = frappe.get_doc({
+		"doctype": "File",
+		"file_name": get_file_name(invoice_name, content_hash),
+		"is_private": 0,
+		"content": pdf,
+		"attached_to_doctype": "CA Invoice",
+		"attached_to_name": invoice_name
+	})
+	file_doc.save(ignore_permissions=True)
+	return file_doc
+
+
+def init_render_worker(site, sites_path):
+	"""Connect a pool process to the site so get_pdf can read print settings"""
+	frappe.init(site=site, sites_path=sites_path)
+	frappe.connect()
+
+
+def render_pdf(html):
+	from frappe.utils.pdf import get_pdf
+
+	return get_pdf(html)
@@ -0,0 +1,438 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Outbound Message Queue
+Rendered messages are pushed onto a Redis list per lane (one lane per
+WhatsApp instance, one per CA Firm for email) and delivered by background
+drain jobs, so a slow instance or mail relay never blocks invoice
+submission or a scheduler run.
+
+Each lane gets at most `concurrency` drain jobs and `rate_limit` sends per
+minute. Failed sends are retried with exponential backoff.
+
+A drain job moves each message onto its slot's processing list while it is
+sent. Once the outcome is recorded, its CA Notification Log row is added to
+the slot's log journal in the same MULTI that removes the message, so a
+worker that dies mid-send leaves the message to be recovered and one that
+dies before committing leaves its log rows to be spooled. Jobs commit after
+every batch, then clear the journal, and stop after DRAIN_TIME_BUDGET
+seconds, well inside their timeout; process_outbox starts them again if
+messages remain.
+"""
+
+import json
+import random
+import time
+from functools import partial
+
+import frappe
+from frappe.utils import cint
+
+from microsaas.microsaas.services.rate_limiter import acquire_slot
+
+
+DEFAULT_CONCURRENCY = 2
+DEFAULT_RATE_LIMIT = 60  # messages per minute per lane
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+
+# Messages delivered per committed batch
+DRAIN_BATCH_SIZE = 50
+
+# Seconds a drain job keeps taking messages, and its RQ timeout
+DRAIN_TIME_BUDGET = 1200
+DRAIN_JOB_TIMEOUT = 1500
+
+LANES_KEY = "microsaas:outbox_lanes"
+
+# CA Notification Log channel for each queue channel
+CHANNEL_LABELS = {"whatsapp": "WhatsApp", "email": "Email"}
+
+
+def enqueue_message(channel, lane, payload, client=None, template=None, log_message=None,
+		concurrency=None, rate_limit=None, max_attempts=None, retry_delay=None):
+	"""
+	Queue a rendered message for background delivery
+
+	The message is pushed once the current transaction commits, so a rolled
+	back invoice never sends anything.
+
+	Args:
+		channel: Delivery channel ("whatsapp" or "email")
+		lane: Lane the message is throttled under (WhatsApp instance or CA Firm)
+		payload: Keyword arguments for the channel transport
+		client: CA Client name, used for the CA Notification Log
+		template: Notification Template name, used for the CA Notification Log
+		log_message: Message text recorded in the CA Notification Log
+		concurrency: Maximum parallel drain jobs for the lane
+		rate_limit: Maximum sends per minute for the lane
+		max_attempts: Attempts before the message is given up (default MAX_ATTEMPTS)
+		retry_delay: Seconds before the first retry, doubled on each attempt (default RETRY_BASE_SECONDS)
+
+	Returns:
+		Queued message id
+	"""
+	message = {
+		"id": frappe.generate_hash(length=12),
+		"channel": channel,
+		"lane": lane,
+		"payload": payload,
+		"client": client,
+		"template": template,
+		"log_message": log_message,
+		"attempts": 0,
+		"max_attempts": cint(max_attempts) or MAX_ATTEMPTS,
+		"retry_delay": cint(retry_delay) or RETRY_BASE_SECONDS,
+		"enqueued_at": time.time()
+	}
+
+	frappe.db.after_commit.add(partial(
+		push_message, message,
+		concurrency=concurrency, rate_limit=rate_limit
+	))
+
+	return message["id"]
+
+
+def push_message(message, concurrency=None, rate_limit=None):
+	"""Push a message onto its lane and make sure drain jobs are running"""
+	cache = frappe.cache()
+	cache.rpush(pending_key(message["channel"], message["lane"]), json.dumps(message, default=str))
+	cache.sadd(LANES_KEY, json.dumps([message["channel"], message["lane"]]))
+
+	start_drain_jobs(message["channel"], message["lane"], concurrency, rate_limit)
+
+
+def start_drain_jobs(channel, lane, concurrency=None, rate_limit=None):
+	"""Enqueue one drain job per concurrency slot (already running slots are skipped)"""
+	concurrency = cint(concurrency) or DEFAULT_CONCURRENCY
+	rate_limit = DEFAULT_RATE_LIMIT if rate_limit is None else cint(rate_limit)
+
+	for slot in range(concurrency):
+		frappe.enqueue(
+			"microsaas.microsaas.services.message_queue.drain_lane",
+			queue="long",
+			timeout=DRAIN_JOB_TIMEOUT,
+			job_id=drain_job_id(channel, lane, slot),
+			deduplicate=True,
+			channel=channel,
+			lane=lane,
+			rate_limit=rate_limit,
+			slot=slot
+		)
+
+
+def drain_lane(channel, lane, rate_limit=DEFAULT_RATE_LIMIT, slot=0):
+	"""
+	Deliver pending messages for one lane in committed batches
+
+	Stops when the lane is empty or DRAIN_TIME_BUDGET has passed.
+
+	Args:
+		channel: Delivery channel
+		lane: Lane to drain
+		rate_limit: Maximum sends per minute for the lane
+		slot: Concurrency slot this job runs in
+	"""
+	deadline = time.monotonic() + DRAIN_TIME_BUDGET
+
+	frappe.cache().sadd(slots_key(channel, lane), slot)
+
+	# Only one job runs per slot, so anything left on its processing list was
+	# held by a job that died
+	recover_processing(channel, lane, slot)
+
+	while time.monotonic() < deadline:
+		if not drain_batch(channel, lane, slot, rate_limit, deadline):
+			break
+
+
+def drain_batch(channel, lane, slot, rate_limit, deadline):
+	"""
+	Deliver up to DRAIN_BATCH_SIZE messages, then commit their log rows
+
+	Returns:
+		Number of messages delivered
+	"""
+	from microsaas.microsaas.services.notification_service import buffered_notification_logs
+
+	cache = frappe.cache()
+	pending = cache.make_key(pending_key(channel, lane))
+	processing = cache.make_key(processing_key(channel, lane, slot))
+	journal = cache.make_key(log_journal_key(channel, lane, slot))
+	delivered = 0
+
+	with buffered_notification_logs():
+		promote_due_retries(channel, lane)
+
+		while delivered < DRAIN_BATCH_SIZE and time.monotonic() < deadline:
+			raw = cache.lmove(pending, processing, "LEFT", "RIGHT")
+			if raw is None:
+				break
+
+			acquire_slot(f"{channel}:{lane}", rate_limit)
+			log_row = deliver(json.loads(raw))
+
+			# Sent, failed or parked for retry: the message is no longer in
+			# flight, and its log row is kept until the batch commits
+			pipe = cache.pipeline()
+			if log_row:
+				pipe.rpush(journal, json.dumps(log_row, default=str))
+			pipe.lrem(processing, 1, raw)
+			pipe.execute()
+			delivered += 1
+
+	frappe.db.commit()
+	cache.delete(journal)
+	return delivered
+
+
+def recover_processing(channel, lane, slot):
+	"""
+	Recover what a dead drain job left in a slot
+
+	Messages still on the processing list go back to the front of the
+	pending list. Journaled log rows go to the CA Notification Log spool;
+	rows that were committed after all are skipped when the spool is written.
+	"""
+	from microsaas.microsaas.services.notification_service import NOTIFICATION_LOG_SPOOL_KEY
+
+	cache = frappe.cache()
+	processing = cache.make_key(processing_key(channel, lane, slot))
+	pending = cache.make_key(pending_key(channel, lane))
+	journal = cache.make_key(log_journal_key(channel, lane, slot))
+	spool = cache.make_key(NOTIFICATION_LOG_SPOOL_KEY)
+
+	while cache.lmove(processing, pending, "RIGHT", "LEFT") is not None:
+		pass
+
+	while cache.lmove(journal, spool, "LEFT", "RIGHT") is not None:
+		pass
+
+
+def recover_stalled_slots(channel, lane):
+	"""Recover messages held by drain jobs that are no longer queued or running"""
+	from frappe.utils.background_jobs import is_job_enqueued
+
+	for slot in frappe.cache().smembers(slots_key(channel, lane)):
+		slot = int(slot)
+		if not is_job_enqueued(drain_job_id(channel, lane, slot)):
+			recover_processing(channel, lane, slot)
+
+
+def deliver(message):
+	"""
+	Send one message, scheduling a retry or recording the final outcome
+
+	Returns:
+		CA Notification Log row for a final outcome, None otherwise
+	"""
+	response = None
+	error = None
+
+	try:
+		response = get_transport(message["channel"])(message)
+	except Exception as e:
+		error = str(e)
+
+	message["attempts"] += 1
+
+	if response:
+		return record_outcome(message, "Sent", response)
+	elif message["attempts"] >= message.get("max_attempts", MAX_ATTEMPTS):
+		return record_outcome(message, "Failed", error)
+
+	schedule_retry(message)
+
+
+def schedule_retry(message):
+	"""Park a failed message until its backoff delay has passed"""
+	delay = message.get("retry_delay", RETRY_BASE_SECONDS) * 2 ** (message["attempts"] - 1)
+	delay += random.uniform(0, delay / 10)
+
+	cache = frappe.cache()
+	cache.zadd(
+		cache.make_key(retry_key(message["channel"], message["lane"])),
+		{json.dumps(message, default=str): time.time() + delay}
+	)
+	increment_metrics(message, retried=1)
+
+
+def promote_due_retries(channel, lane):
+	"""Move retries whose backoff has expired back onto the pending list"""
+	cache = frappe.cache()
+	key = cache.make_key(retry_key(channel, lane))
+
+	for raw in cache.zrangebyscore(key, 0, time.time()):
+		# Only the drainer that removes the entry re-queues it
+		if cache.zrem(key, raw):
+			cache.rpush(pending_key(channel, lane), raw)
+
+
+def record_outcome(message, status, response):
+	"""Log the final delivery status and update lane metrics, returning the log row"""
+	from microsaas.microsaas.services.notification_service import log_notification
+
+	latency_ms = int((time.time() - message["enqueued_at"]) * 1000)
+	increment_metrics(
+		message,
+		sent=1 if status == "Sent" else 0,
+		failed=1 if status == "Failed" else 0,
+		latency_ms=latency_ms if status == "Sent" else 0
+	)
+
+	if message.get("client"):
+		return log_notification(
+			client=message["client"],
+			template=message.get("template"),
+			channel=CHANNEL_LABELS[message["channel"]],
+			status=status,
+			message=message.get("log_message"),
+			response=response
+		)
+
+
+def increment_metrics(message, **counters):
+	cache = frappe.cache()
+	key = cache.make_key(metrics_key(message["channel"], message["lane"]))
+	for field, value in counters.items():
+		if value:
+			cache.hincrby(key, field, value)
+
+
+@frappe.whitelist()
+def get_queue_metrics():
+	"""
+	Get depth and latency metrics for every lane
+
+	Returns:
+		List of dicts with pending, retrying, sent, failed, retried and avg_latency_ms
+	"""
+	frappe.only_for("System Manager")
+
+	cache = frappe.cache()
+	metrics = []
+
+	for channel, lane in get_lanes():
+		sent, failed, retried, latency_ms = [
+			cint(value) for value in cache.hmget(
+				cache.make_key(metrics_key(channel, lane)),
+				["sent", "failed", "retried", "latency_ms"]
+			)
+		]
+
+		metrics.append({
+			"channel": channel,
+			"lane": lane,
+			"pending": cache.llen(pending_key(channel, lane)),
+			"retrying": cache.zcard(cache.make_key(retry_key(channel, lane))),
+			"sent": sent,
+			"failed": failed,
+			"retried": retried,
+			"avg_latency_ms": int(latency_ms / sent) if sent else 0
+		})
+
+	return metrics
+
+
+def process_outbox():
+	"""
+	Restart drain jobs for lanes with pending, due retry or stalled messages
+	(scheduler)
+	"""
+	cache = frappe.cache()
+
+	for channel, lane in get_lanes():
+		promote_due_retries(channel, lane)
+		recover_stalled_slots(channel, lane)
+		if not cache.llen(pending_key(channel, lane)):
+			continue
+
+		limits = get_lane_limits(channel, lane)
+		start_drain_jobs(channel, lane, limits.get("concurrency"), limits.get("rate_limit"))
+
+
+def get_lanes():
+	return [tuple(json.loads(lane)) for lane in frappe.cache().smembers(LANES_KEY)]
+
+
+def get_lane_limits(channel, lane):
+	"""Read concurrency and rate limit for a lane from the owning CA Firm"""
+	if channel == "whatsapp":
+		limits = frappe.db.get_value(
+			"CA Firm",
+			{"whatsapp_instance": lane},
+			["whatsapp_concurrency", "whatsapp_rate_limit"],
+			as_dict=True
+		) or {}
+		return {
+			"concurrency": limits.get("whatsapp_concurrency"),
+			"rate_limit": limits.get("whatsapp_rate_limit")
+		}
+
+	if channel == "email":
+		limits = frappe.db.get_value("CA Firm", lane, ["email_concurrency", "email_rate_limit"], as_dict=True) or {}
+		return {
+			"concurrency": limits.get("email_concurrency"),
+			"rate_limit": limits.get("email_rate_limit")
+		}
+
+	return {}
+
+
+def get_transport(channel):
+	"""
+	Resolve the send function for a channel
+
+	Set `microsaas_<channel>_transport` in site config to a dotted path to
+	override it (e.g. the stub transport below for local testing).
+	"""
+	path = frappe.conf.get(f"microsaas_{channel}_transport")
+	if path:
+		return frappe.get_attr(path)
+
+	from microsaas.microsaas.services.notification_service import deliver_queued_whatsapp, deliver_queued_email
+	return {"whatsapp": deliver_queued_whatsapp, "email": deliver_queued_email}[channel]
+
+
+def stub_transport(message):
+	"""
+	Local stand-in endpoint that records deliveries in Redis
+
+	Fails the first `microsaas_stub_transport_failures` attempts of every
+	message (site config) so retries can be exercised.
+	"""
+	if message["attempts"] < cint(frappe.conf.get("microsaas_stub_transport_failures")):
+		raise Exception("Stub transport failure")
+
+	frappe.cache().rpush(f"microsaas:outbox_stub:{message['channel']}:{message['lane']}", json.dumps(message, default=str))
+	return {"status": "sent", "id": message["id"]}
+
+
+def drain_job_id(channel, lane, slot):
+	return f"outbox::{channel}::{lane}::{slot}"
+
+
+def pending_key(channel, lane):
+	return f"microsaas:outbox:{channel}:{lane}"
+
+
+def processing_key(channel, lane, slot):
+	return f"microsaas:outbox_processing:{channel}:{lane}:{slot}"
+
+
+def log_journal_key(channel, lane, slot):
+	return f"microsaas:outbox_log_journal:{channel}:{lane}:{slot}"
+
+
+def slots_key(channel, lane):
+	return f"microsaas:outbox_slots:{channel}:{lane}"
+
+
+def retry_key(channel, lane):
+	return f"microsaas:outbox_retry:{channel}:{lane}"
+
+
+def metrics_key(channel, lane):
+	return f"microsaas:outbox_metrics:{channel}:{lane}"
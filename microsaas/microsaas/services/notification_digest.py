@@ -0,0 +1,315 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Notification Digest
+For firms with digest mode on, reminders produced by scheduler jobs are not
+queued one by one. Each rendered message is buffered in Redis under its
+client, and once the client's buffer is DIGEST_WINDOW_MINUTES old the
+messages are merged into a single WhatsApp message through the firm's
+daily_digest Notification Template.
+
+A client with several reminders due on the same morning gets one message
+instead of one per reminder, which saves API calls and lane rate-limit
+budget. Sends saved are counted per firm and day.
+
+A flush moves the client's buffer to a processing key and deletes it only
+once the digest's queued message has committed. Entries a dead flusher left
+behind are put back in the buffer by a later flush.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from functools import partial
+
+import frappe
+from frappe.utils import today, cint
+
+from microsaas.microsaas.services.message_queue import enqueue_message
+
+
+# Reminder types that may wait for a digest; time-critical ones are always sent straight away
+DIGEST_TEMPLATE_TYPES = ("payment_reminder", "payment_overdue", "document_expiry", "tax_deadline")
+
+DIGEST_TEMPLATE_TYPE = "daily_digest"
+
+# Minutes a client's buffer collects messages before it is merged and sent
+DIGEST_WINDOW_MINUTES = 15
+
+DIGEST_CLIENTS_KEY = "microsaas:digest_clients"
+DIGEST_PROCESSING_KEY = "microsaas:digest_processing"
+DIGEST_STATS_KEY = "microsaas:digest_stats"
+
+# Days digest statistics are kept
+DIGEST_STATS_TTL_DAYS = 35
+
+# Seconds after which entries still being processed are taken to belong to a dead flusher
+DIGEST_PROCESSING_TIMEOUT = 10 * 60
+
+
+@contextmanager
+def digest_window():
+	"""Let reminders sent inside the block be buffered for a digest"""
+	if getattr(frappe.local, "notification_digest_window", False):
+		yield
+		return
+
+	frappe.local.notification_digest_window = True
+	try:
+		yield
+	finally:
+		frappe.local.notification_digest_window = False
+
+
+def should_buffer(firm_settings, template_type):
+	return (
+		getattr(frappe.local, "notification_digest_window", False)
+		and firm_settings.get("notification_digest")
+		and template_type in DIGEST_TEMPLATE_TYPES
+	)
+
+
+def buffer_notification(client_doc, firm_settings, template, template_type, message):
+	"""
+	Hold a rendered reminder for the client's next digest
+
+	The entry is written once the current transaction commits, like a queued
+	message, so a rolled back run never leaves anything behind.
+
+	Returns:
+		Buffered entry id
+	"""
+	entry = {
+		"id": frappe.generate_hash(length=12),
+		"client": client_doc.name,
+		"client_name": client_doc.client_name,
+		"firm": client_doc.firm,
+		"number": client_doc.whatsapp_number,
+		"instance": firm_settings.whatsapp_instance,
+		"template": template.name,
+		"template_type": template_type,
+		"message": message
+	}
+
+	frappe.db.after_commit.add(partial(push_entry, entry))
+	return entry["id"]
+
+
+def push_entry(entry):
+	cache = frappe.cache()
+	cache.rpush(buffer_key(entry["client"]), json.dumps(entry, default=str))
+	# Only the first entry of a window sets the time the window closes
+	cache.zadd(cache.make_key(DIGEST_CLIENTS_KEY), {entry["client"]: time.time()}, nx=True)
+
+
+def flush_digests(force=False):
+	"""
+	Send the digests of clients whose window has closed (scheduler)
+
+	Args:
+		force: Flush every buffered client regardless of window
+
+	Returns:
+		Dict with notifications, messages and saved counts
+	"""
+	cache = frappe.cache()
+	clients_key = cache.make_key(DIGEST_CLIENTS_KEY)
+	cutoff = "+inf" if force else time.time() - DIGEST_WINDOW_MINUTES * 60
+	totals = {"notifications": 0, "messages": 0, "saved": 0}
+
+	recover_stalled_entries()
+
+	for client in cache.zrangebyscore(clients_key, 0, cutoff):
+		client = frappe.safe_decode(client)
+
+		# Only the flusher that removes the client sends its digest
+		if not cache.zrem(clients_key, client):
+			continue
+
+		entries = pop_entries(client)
+		if not entries:
+			release_entries(client)
+			continue
+
+		try:
+			messages = send_digest(entries)
+			frappe.db.commit()
+		except Exception as e:
+			frappe.db.rollback()
+			frappe.log_error(f"Error sending digest for {client}: {str(e)}", "Notification Digest Error")
+			restore_entries(client)
+			continue
+
+		release_entries(client)
+
+		record_stats(entries[0]["firm"], len(entries), messages)
+		totals["notifications"] += len(entries)
+		totals["messages"] += messages
+		totals["saved"] += len(entries) - messages
+
+	return totals
+
+
+def pop_entries(client):
+	"""
+	Move a client's buffered entries to its processing key and return them
+
+	The read and the trim run in one MULTI transaction, watched so an entry
+	pushed in between is left for the next window rather than trimmed away.
+	Entries already on the processing key are returned with the new ones.
+	"""
+	cache = frappe.cache()
+	key = cache.make_key(buffer_key(client))
+	processing = cache.make_key(processing_key(client))
+
+	# Keys are already prefixed, so the raw pipeline commands are used
+	# rather than the wrapped list methods, which would prefix them again
+	def move(pipe):
+		held = pipe.lrange(processing, 0, -1)
+		raw = pipe.lrange(key, 0, -1)
+		pipe.multi()
+		if raw:
+			pipe.rpush(processing, *raw)
+		pipe.ltrim(key, len(raw), -1)
+		return held + raw
+
+	cache.zadd(cache.make_key(DIGEST_PROCESSING_KEY), {client: time.time()})
+	entries = cache.transaction(move, key, processing, value_from_callable=True)
+
+	return [json.loads(raw) for raw in entries]
+
+
+def release_entries(client):
+	"""Drop a client's processing entries once their digest has committed"""
+	cache = frappe.cache()
+	cache.delete(cache.make_key(processing_key(client)))
+	cache.zrem(cache.make_key(DIGEST_PROCESSING_KEY), client)
+
+
+def restore_entries(client):
+	"""Put a client's processing entries back at the front of its buffer for the next flush"""
+	cache = frappe.cache()
+	key = cache.make_key(buffer_key(client))
+	processing = cache.make_key(processing_key(client))
+
+	while cache.lmove(processing, key, "RIGHT", "LEFT") is not None:
+		pass
+
+	cache.zadd(cache.make_key(DIGEST_CLIENTS_KEY), {client: time.time()}, nx=True)
+	cache.zrem(cache.make_key(DIGEST_PROCESSING_KEY), client)
+
+
+def recover_stalled_entries():
+	"""Restore entries held longer than DIGEST_PROCESSING_TIMEOUT by a flusher that died"""
+	cache = frappe.cache()
+	processing_clients = cache.make_key(DIGEST_PROCESSING_KEY)
+
+	for client in cache.zrangebyscore(processing_clients, 0, time.time() - DIGEST_PROCESSING_TIMEOUT):
+		restore_entries(frappe.safe_decode(client))
+
+
+def send_digest(entries):
+	"""
+	Queue one message for a client's buffered reminders
+
+	A single reminder is sent as it was rendered. Several are merged through
+	the firm's daily_digest template, which gets client_name, count,
+	notifications (template_type and message of each) and messages (all
+	messages joined by blank lines). Without a digest template each
+	reminder is sent on its own.
+
+	Returns:
+		Number of messages queued
+	"""
+	from microsaas.microsaas.services.notification_service import get_firm, get_template
+
+	first = entries[0]
+	firm_settings = get_firm(first["firm"])
+	template = get_template(first["firm"], DIGEST_TEMPLATE_TYPE, "WhatsApp") if len(entries) > 1 else None
+
+	if not template:
+		for entry in entries:
+			queue_digest_message(entry, firm_settings, entry["template"], entry["message"])
+		return len(entries)
+
+	message = template.render({
+		"client_name": first["client_name"],
+		"count": len(entries),
+		"notifications": [
+			{"template_type": entry["template_type"], "message": entry["message"]}
+			for entry in entries
+		],
+		"messages": "\n\n".join(entry["message"] for entry in entries)
+	})
+
+	if not message:
+		raise Exception(f"Failed to render digest template {template.name}")
+
+	queue_digest_message(first, firm_settings, template.name, message)
+	return 1
+
+
+def queue_digest_message(entry, firm_settings, template, message):
+	enqueue_message(
+		"whatsapp",
+		entry["instance"],
+		payload={
+			"instance_id": entry["instance"],
+			"number": entry["number"],
+			"message": message
+		},
+		client=entry["client"],
+		template=template,
+		log_message=message,
+		concurrency=firm_settings.whatsapp_concurrency,
+		rate_limit=firm_settings.whatsapp_rate_limit
+	)
+
+
+def record_stats(firm, notifications, messages):
+	cache = frappe.cache()
+	key = cache.make_key(f"{DIGEST_STATS_KEY}:{today()}")
+
+	cache.hincrby(key, f"{firm}:notifications", notifications)
+	cache.hincrby(key, f"{firm}:messages", messages)
+	cache.expire(key, DIGEST_STATS_TTL_DAYS * 86400)
+
+
+@frappe.whitelist()
+def get_digest_stats(date=None, firm=None):
+	"""
+	Get how many sends digest mode saved on a day
+
+	Args:
+		date: Day to report (defaults to today)
+		firm: Only report this CA Firm
+
+	Returns:
+		List of dicts with firm, notifications, messages and saved
+	"""
+	frappe.only_for("System Manager")
+
+	cache = frappe.cache()
+	# Raw scan: the wrapped hgetall expects pickled values, counters are plain integers
+	counters = cache.hscan_iter(cache.make_key(f"{DIGEST_STATS_KEY}:{date or today()}"))
+
+	stats = {}
+	for field, value in counters:
+		row_firm, counter = frappe.safe_decode(field).rsplit(":", 1)
+		if firm and row_firm != firm:
+			continue
+		stats.setdefault(row_firm, {"firm": row_firm, "notifications": 0, "messages": 0})[counter] = cint(value)
+
+	for row in stats.values():
+		row["saved"] = row["notifications"] - row["messages"]
+
+	return sorted(stats.values(), key=lambda row: row["firm"])
+
+
+def buffer_key(client):
+	return f"microsaas:digest:{client}"
+
+
+def processing_key(client):
+	return f"microsaas:digest_processing:{client}"
@@ -0,0 +1,137 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Notification Ledger
+Records which notifications have been sent, keyed by client, template type,
+the entity they are about and the offset or date they are for. Senders claim
+a ledger row in the same transaction that queues the message, so a retried,
+overlapping or manually repeated send finds the row and is dropped.
+
+Rows expire after a TTL and are purged daily, so the table only holds the
+window in which a repeat could realistically happen.
+"""
+
+import hashlib
+
+import frappe
+from frappe.utils import add_days, cint, now, today
+
+
+# Days a ledger row is kept (site config `microsaas_notification_ledger_ttl_days` overrides)
+DEFAULT_LEDGER_TTL_DAYS = 90
+
+# Expired rows deleted per statement by the purge job
+LEDGER_PURGE_BATCH_SIZE = 10000
+
+LEDGER_INSERT_FIELDS = [
+	"name", "creation", "modified", "owner", "modified_by", "docstatus",
+	"ledger_key", "client", "template_type", "reference", "offset",
+	"sent_at", "expires_on", "claim_token"
+]
+
+
+def get_ledger_key(client, template_type, reference, offset=None):
+	"""Stable key for one notification, e.g. ("CLI-1", "payment_reminder", "CA Invoice:INV-1", -3)"""
+	key = "|".join(str(part) for part in (client, template_type, reference, "" if offset is None else offset))
+	return hashlib.sha1(key.encode()).hexdigest()
+
+
+def claim_notifications(entries, ttl_days=None):
+	"""
+	Claim ledger rows for notifications about to be queued
+
+	Keys that already exist are dropped with one primary key lookup. The rest
+	are inserted ignoring duplicates and tagged with a token for this call,
+	so a concurrent sender that inserted the same key first keeps it.
+	The claim commits (or rolls back) with the caller's transaction.
+
+	Args:
+		entries: Iterable of (client, template_type, reference, offset) tuples
+		ttl_days: Days to keep the rows
+
+	Returns:
+		Set of ledger keys claimed by this call
+	"""
+	wanted = {get_ledger_key(*entry): entry for entry in entries}
+	if not wanted:
+		return set()
+
+	existing = set(frappe.get_all(
+		"Notification Ledger",
+		filters={"name": ["in", list(wanted)]},
+		pluck="name"
+	))
+
+	new = [key for key in wanted if key not in existing]
+	if not new:
+		return set()
+
+	timestamp = now()
+	user = frappe.session.user
+	token = frappe.generate_hash(length=10)
+	expires_on = add_days(today(), cint(ttl_days) or get_ledger_ttl_days())
+
+	frappe.db.bulk_insert(
+		"Notification Ledger",
+		fields=LEDGER_INSERT_FIELDS,
+		values=[
+			(
+				key, timestamp, timestamp, user, user, 0,
+				key, wanted[key][0], wanted[key][1], wanted[key][2],
+				None if wanted[key][3] is None else str(wanted[key][3]),
+				timestamp, expires_on, token
+			)
+			for key in new
+		],
+		ignore_duplicates=True
+	)
+
+	return set(frappe.get_all(
+		"Notification Ledger",
+		filters={"name": ["in", new], "claim_token": token},
+		pluck="name"
+	))
+
+
+def claim_notification(client, template_type, reference, offset=None):
+	"""
+	Claim a single notification
+
+	Returns:
+		Ledger key if this call claimed it, None if it was already sent
+	"""
+	key = get_ledger_key(client, template_type, reference, offset)
+	return key if key in claim_notifications([(client, template_type, reference, offset)]) else None
+
+
+def release_notifications(keys):
+	"""Drop claims for notifications that ended up not being queued, so a later send can retry"""
+	keys = [key for key in keys if key]
+	if keys:
+		frappe.db.delete("Notification Ledger", {"name": ["in", keys]})
+
+
+def get_ledger_ttl_days():
+	return cint(frappe.conf.get("microsaas_notification_ledger_ttl_days")) or DEFAULT_LEDGER_TTL_DAYS
+
+
+def purge_expired_ledger_entries():
+	"""Delete ledger rows past their TTL (scheduler)"""
+	try:
+		while True:
+			names = frappe.get_all(
+				"Notification Ledger",
+				filters={"expires_on": ["<", today()]},
+				pluck="name",
+				limit=LEDGER_PURGE_BATCH_SIZE
+			)
+			if not names:
+				break
+
+			frappe.db.delete("Notification Ledger", {"name": ["in", names]})
+			frappe.db.commit()
+
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.log_error(f"Error purging notification ledger: {str(e)}", "Notification Ledger Error")
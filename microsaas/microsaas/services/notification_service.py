@@ -8,10 +8,35 @@ Integrates with existing whatsapp_saas app to send notifications
 
 import frappe
 from frappe import _
+from frappe.utils import create_batch, now
+from contextlib import contextmanager
 import json
 
+from microsaas.microsaas.services.message_queue import enqueue_message
+from microsaas.microsaas.services.notification_ledger import (
+	get_ledger_key,
+	claim_notification,
+	claim_notifications,
+	release_notifications
+)
+from microsaas.microsaas.services.process_cache import ProcessCache
 
-def send_notification(client, template_type, data):
+
+# Firms and templates change rarely, so workers keep them between calls
+firm_cache = ProcessCache("ca_firm")
+template_cache = ProcessCache("notification_template")
+
+# Clients resolved per query when a batch is expanded
+CLIENT_FETCH_CHUNK_SIZE = 1000
+
+# Buffered CA Notification Log rows are written once this many are pending
+NOTIFICATION_LOG_FLUSH_SIZE = 200
+NOTIFICATION_LOG_FIELDS = ["client", "template", "channel", "status", "message", "response"]
+NOTIFICATION_LOG_SPOOL_KEY = "microsaas:notification_log_spool"
+NOTIFICATION_LOG_SPOOL_PROCESSING_KEY = "microsaas:notification_log_spool_processing"
+
+
+def send_notification(client, template_type, data, reference=None, offset=None):
 	"""
 	Send notification to client using specified template
 	
@@ -19,82 +44,229 @@ def send_notification(client, template_type, data):
 		client: CA Client document name or object
 		template_type: Type of template (invoice_sent, payment_reminder, etc.)
 		data: Dictionary of variables for template rendering
+		reference: Entity the notification is about (e.g. "CA Invoice:INV-0001"); when
+			set, the notification is sent at most once per reference and offset
+		offset: Reminder offset or date distinguishing repeated notices for the reference
 	
 	Returns:
-		Response from whatsapp_saas API
+		Queued message id, or None if nothing was queued
 	"""
+	ledger_key = None
+	
 	try:
 		# Get client details
 		if isinstance(client, str):
 			client_doc = frappe.get_doc("CA Client", client)
 		else:
 			client_doc = client
-			
-		# Get Firm Settings
-		if not client_doc.firm:
-			frappe.log_error(f"Client {client_doc.client_name} is not linked to any CA Firm")
-			return None
-			
-		firm_settings = frappe.get_doc("CA Firm", client_doc.firm)
 		
-		# Check if WhatsApp notifications are enabled
-		if not firm_settings.enable_whatsapp_notifications:
-			return None
+		if reference:
+			ledger_key = claim_notification(client_doc.name, template_type, reference, offset)
+			if not ledger_key:
+				return None
 		
-		# Get WhatsApp instance
-		if not firm_settings.whatsapp_instance:
-			frappe.log_error(f"WhatsApp instance not configured for Firm: {firm_settings.firm_name}")
-			return None
+		sync_notification_cache()
+		response = deliver_whatsapp_notification(client_doc, template_type, data)
 		
-		# Check if client has WhatsApp number
-		if not client_doc.whatsapp_number:
-			frappe.log_error(f"Client {client_doc.client_name} does not have WhatsApp number")
-			return None
+		if not response:
+			release_notifications([ledger_key])
 		
-		# Get notification template for this Firm
-		template = frappe.get_doc("Notification Template", {
-			"firm": client_doc.firm,
-			"template_type": template_type,
-			"channel": "WhatsApp",
-			"is_active": 1
-		})
-		
-		if not template:
-			frappe.log_error(f"No active WhatsApp template found for type: {template_type} in Firm: {firm_settings.firm_name}")
-			return None
-		
-		# Render template with data
-		message = template.render(data)
-		
-		if not message:
-			frappe.log_error("Failed to render notification template")
-			return None
-		
-		# Send via whatsapp_saas
-		response = send_whatsapp_message(
-			instance_id=firm_settings.whatsapp_instance,
-			number=client_doc.whatsapp_number,
-			message=message
-		)
-		
-		# Log notification
-		log_notification(
-			client=client_doc.name,
-			template=template.name,
-			channel="WhatsApp",
-			status="Sent" if response else "Failed",
-			message=message,
-			response=response
-		)
-		
-
 		return response
 		
 	except Exception as e:
+		release_notifications([ledger_key])
 		frappe.log_error(f"Error sending WhatsApp notification: {str(e)}", "WhatsApp Notification Error")
 		return None
 
-def send_whatsapp_with_file(client, template_type, data, file_url, file_name=None):
+
+def send_bulk_notifications(items):
+	"""
+	Send many WhatsApp notifications in one batch
+	
+	Clients are fetched with one query per chunk and firms/templates come
+	from the process cache, so a batch costs a handful of queries instead
+	of three document loads per message.
+	
+	Items carrying a reference are checked against the Notification Ledger
+	with one lookup for the whole batch, and repeats are skipped.
+	
+	Args:
+		items: Iterable of (client, template_type, data) tuples, optionally
+			followed by reference and offset as in send_notification
+	
+	Returns:
+		List of queued message ids (None where nothing was queued) in item order
+	"""
+	items = [tuple(item) + (None,) * (5 - len(item)) for item in items]
+	if not items:
+		return []
+	
+	sync_notification_cache()
+	clients = get_clients([item[0] for item in items])
+	
+	def get_client_name(client):
+		return client if isinstance(client, str) else client.name
+	
+	claimed = claim_notifications(
+		(get_client_name(client), template_type, reference, offset)
+		for client, template_type, data, reference, offset in items
+		if reference
+	)
+	
+	responses = []
+	unsent = []
+	for client, template_type, data, reference, offset in items:
+		ledger_key = None
+		
+		try:
+			if reference:
+				ledger_key = get_ledger_key(get_client_name(client), template_type, reference, offset)
+				if ledger_key not in claimed:
+					responses.append(None)
+					continue
+				
+				# A key repeated within the batch is sent once
+				claimed.discard(ledger_key)
+			
+			client_doc = clients.get(client) if isinstance(client, str) else client
+			if not client_doc:
+				frappe.log_error(f"Client {client} not found")
+				responses.append(None)
+				unsent.append(ledger_key)
+				continue
+			
+			response = deliver_whatsapp_notification(client_doc, template_type, data)
+			responses.append(response)
+			if not response:
+				unsent.append(ledger_key)
+			
+		except Exception as e:
+			frappe.log_error(f"Error sending WhatsApp notification: {str(e)}", "WhatsApp Notification Error")
+			responses.append(None)
+			unsent.append(ledger_key)
+	
+	release_notifications(unsent)
+	return responses
+
+
+def deliver_whatsapp_notification(client_doc, template_type, data):
+	"""Render a WhatsApp notification for a resolved client and queue it"""
+	# Get Firm Settings
+	if not client_doc.firm:
+		frappe.log_error(f"Client {client_doc.client_name} is not linked to any CA Firm")
+		return None
+		
+	firm_settings = get_firm(client_doc.firm)
+	
+	# Check if WhatsApp notifications are enabled
+	if not firm_settings.enable_whatsapp_notifications:
+		return None
+	
+	# Get WhatsApp instance
+	if not firm_settings.whatsapp_instance:
+		frappe.log_error(f"WhatsApp instance not configured for Firm: {firm_settings.firm_name}")
+		return None
+	
+	# Check if client has WhatsApp number
+	if not client_doc.whatsapp_number:
+		frappe.log_error(f"Client {client_doc.client_name} does not have WhatsApp number")
+		return None
+	
+	# Get notification template for this Firm
+	template = get_template(client_doc.firm, template_type, "WhatsApp")
+	
+	if not template:
+		frappe.log_error(f"No active WhatsApp template found for type: {template_type} in Firm: {firm_settings.firm_name}")
+		return None
+	
+	# Render template with data
+	message = template.render(data)
+	
+	if not message:
+		frappe.log_error("Failed to render notification template")
+		return None
+	
+	from microsaas.microsaas.services.notification_digest import should_buffer, buffer_notification
+	
+	# Digest firms get scheduler reminders merged into one message per client
+	if should_buffer(firm_settings, template_type):
+		return buffer_notification(client_doc, firm_settings, template, template_type, message)
+	
+	# Queue for background delivery, the drain job sends and logs it
+	return enqueue_message(
+		"whatsapp",
+		firm_settings.whatsapp_instance,
+		payload={
+			"instance_id": firm_settings.whatsapp_instance,
+			"number": client_doc.whatsapp_number,
+			"message": message
+		},
+		client=client_doc.name,
+		template=template.name,
+		log_message=message,
+		concurrency=firm_settings.whatsapp_concurrency,
+		rate_limit=firm_settings.whatsapp_rate_limit
+	)
+
+
+def get_clients(client_names):
+	"""
+	Fetch notification fields for many clients
+	
+	Args:
+		client_names: Iterable of CA Client names (non-string entries are ignored)
+	
+	Returns:
+		Dict of client name to client row
+	"""
+	names = list({name for name in client_names if isinstance(name, str)})
+	clients = {}
+	
+	for chunk in create_batch(names, CLIENT_FETCH_CHUNK_SIZE):
+		for row in frappe.get_all(
+			"CA Client",
+			filters={"name": ["in", chunk]},
+			fields=["name", "client_name", "firm", "email", "whatsapp_number"]
+		):
+			clients[row.name] = row
+	
+	return clients
+
+
+def get_firm(firm_name):
+	"""Return the cached CA Firm document"""
+	return firm_cache.get(firm_name, lambda: frappe.get_doc("CA Firm", firm_name))
+
+
+def get_template(firm, template_type, channel):
+	"""Return the cached active Notification Template, or None if missing"""
+	def load():
+		name = frappe.db.get_value("Notification Template", {
+			"firm": firm,
+			"template_type": template_type,
+			"channel": channel,
+			"is_active": 1
+		})
+		return frappe.get_doc("Notification Template", name) if name else None
+	
+	return template_cache.get((firm, template_type, channel), load)
+
+
+def sync_notification_cache():
+	"""Pick up firm/template changes saved by other workers"""
+	firm_cache.sync()
+	template_cache.sync()
+
+
+def clear_notification_cache(doc=None, method=None):
+	"""Invalidate cached firms and templates (doc_events hook)"""
+	if not doc or doc.doctype == "CA Firm":
+		firm_cache.clear()
+	if not doc or doc.doctype == "Notification Template":
+		template_cache.clear()
+
+
+def send_whatsapp_with_file(client, template_type, data, file_url, file_name=None, reference=None, offset=None):
 	"""
 	Send WhatsApp notification with file attachment
 	
@@ -104,7 +276,11 @@ def send_whatsapp_with_file(client, template_type, data, file_url, file_name=Non
 		data: Dictionary of variables for template rendering
 		file_url: Full URL of the file to attach
 		file_name: Optional name for the file
+		reference: Entity the notification is about, as in send_notification
+		offset: Offset or date for the reference, as in send_notification
 	"""
+	ledger_key = None
+	
 	try:
 		# Get client details
 		if isinstance(client, str):
@@ -115,69 +291,92 @@ def send_whatsapp_with_file(client, template_type, data, file_url, file_name=Non
 		# Get Firm Settings
 		if not client_doc.firm:
 			return None
-			
-		firm_settings = frappe.get_doc("CA Firm", client_doc.firm)
-		
-		# Check if WhatsApp notifications are enabled
-		if not firm_settings.enable_whatsapp_notifications:
-			return None
-		
-		# Get WhatsApp instance
-		if not firm_settings.whatsapp_instance:
-			return None
-		
-		# Get notification template for this Firm
-		template = frappe.get_doc("Notification Template", {
-			"firm": client_doc.firm,
-			"template_type": template_type,
-			"channel": "WhatsApp",
-			"is_active": 1
-		})
-		
-		# Render caption
-		caption = ""
-		if template:
-			caption = template.render(data)
-			
-		# Prepare payload for whatsapp_saas
-		# Assuming whatsapp_saas endpoint supports 'url' or 'media' param for remote files
-		args = {
-			"instance_id": firm_settings.whatsapp_instance,
-			"number": client_doc.whatsapp_number,
-			"media": file_url,
-			"url": file_url, # sending both to be safe depending on Baileys API expectations
-			"caption": caption,
-			"type": "document",
-			"filename": file_name or "Invoice.pdf",
-			"mimetype": "application/pdf"
-		}
-		
-		# Call whatsapp_saas send_media
-		# We use frappe.call to invoke the whitelist method, but since we are server-side, 
-		# we can import and call if it allows, or use frappe.call which does a local call.
-		# However, endpoints.send_media expects frappe.request.files for uploads.
-		# If the underlying API supports URL, passing it in kwargs (which becomes data) should work.
 		
-		from whatsapp_saas.whatsapp_saas.api.endpoints import send_media
-		response = send_media(**args)
+		if reference:
+			ledger_key = claim_notification(client_doc.name, template_type, reference, offset)
+			if not ledger_key:
+				return None
 		
-		# Log notification
-		log_notification(
-			client=client_doc.name,
-			template=template.name if template else "Manual File",
-			channel="WhatsApp",
-			status="Sent" if response else "Failed",
-			message=f"File: {file_url}\nCaption: {caption}",
-			response=response
-		)
+		response = queue_whatsapp_file(client_doc, template_type, data, file_url, file_name)
+		if not response:
+			release_notifications([ledger_key])
 		
 		return response
 		
 	except Exception as e:
+		release_notifications([ledger_key])
 		frappe.log_error(f"Error sending WhatsApp file: {str(e)}", "WhatsApp File Error")
 		return None
 
 
+def queue_whatsapp_file(client_doc, template_type, data, file_url, file_name=None):
+	"""Render the caption for a file message and queue it"""
+	sync_notification_cache()
+	firm_settings = get_firm(client_doc.firm)
+	
+	# Check if WhatsApp notifications are enabled
+	if not firm_settings.enable_whatsapp_notifications:
+		return None
+	
+	# Get WhatsApp instance
+	if not firm_settings.whatsapp_instance:
+		return None
+	
+	# Get notification template for this Firm
+	template = get_template(client_doc.firm, template_type, "WhatsApp")
+	
+	# Render caption
+	caption = ""
+	if template:
+		caption = template.render(data)
+		
+	# Prepare payload for whatsapp_saas
+	# Assuming whatsapp_saas endpoint supports 'url' or 'media' param for remote files
+	args = {
+		"instance_id": firm_settings.whatsapp_instance,
+		"number": client_doc.whatsapp_number,
+		"media": file_url,
+		"url": file_url, # sending both to be safe depending on Baileys API expectations
+		"caption": caption,
+		"type": "document",
+		"filename": file_name or "Invoice.pdf",
+		"mimetype": "application/pdf"
+	}
+	
+	# Queue for background delivery through whatsapp_saas send_media
+	return enqueue_message(
+		"whatsapp",
+		firm_settings.whatsapp_instance,
+		payload={"media": args},
+		client=client_doc.name,
+		template=template.name if template else "Manual File",
+		log_message=f"File: {file_url}\nCaption: {caption}",
+		concurrency=firm_settings.whatsapp_concurrency,
+		rate_limit=firm_settings.whatsapp_rate_limit
+	)
+
+
+def deliver_queued_whatsapp(queued_message):
+	"""
+	Transport used by the message queue to send a WhatsApp message
+	
+	Args:
+		queued_message: Message dict from the outbound queue
+	
+	Returns:
+		API response (falsy on failure so the queue retries)
+	"""
+	payload = queued_message["payload"]
+	
+	if payload.get("media"):
+		# endpoints.send_media expects frappe.request.files for uploads, but
+		# accepts a remote file through the 'url'/'media' kwargs
+		from whatsapp_saas.whatsapp_saas.api.endpoints import send_media
+		return send_media(**payload["media"])
+	
+	return send_whatsapp_message(**payload)
+
+
 def send_whatsapp_message(instance_id, number, message):
 	"""
 	Send WhatsApp message using whatsapp_saas API
@@ -210,6 +409,10 @@ def log_notification(client, template, channel, status, message, response=None):
 	"""
 	Log notification delivery
 	
+	Inside buffered_notification_logs() the row is buffered and written with
+	the rest of the batch, otherwise it is written straight away. The row is
+	named up front, so writing it again after a crash does not duplicate it.
+	
 	Args:
 		client: CA Client name
 		template: Notification Template name
@@ -217,78 +420,282 @@ def log_notification(client, template, channel, status, message, response=None):
 		status: Delivery status
 		message: Message content
 		response: API response
+	
+	Returns:
+		The log row, or None if it could not be built
 	"""
 	try:
-		log = frappe.get_doc({
-			"doctype": "Notification Log",
-			"client": client,
-			"template": template,
-			"channel": channel,
-			"status": status,
-			"message": message,
-			"response": json.dumps(response) if response else None
-		})
-		log.insert(ignore_permissions=True)
+		row = (
+			frappe.generate_hash(length=10),
+			client,
+			template,
+			channel,
+			status,
+			message,
+			json.dumps(response, separators=(",", ":"), default=str) if response else None
+		)
+		
+		buffer = getattr(frappe.local, "notification_log_buffer", None)
+		if buffer is None:
+			write_notification_logs([row])
+			return row
+		
+		buffer.append(row)
+		if len(buffer) >= NOTIFICATION_LOG_FLUSH_SIZE:
+			flush_notification_logs()
+		
+		return row
 		
 	except Exception as e:
 		frappe.log_error(f"Error logging notification: {str(e)}")
 
 
-def send_email_notification(client, template_type, data):
+@contextmanager
+def buffered_notification_logs():
+	"""
+	Buffer CA Notification Log rows for a batch
+	
+	Rows are flushed when the buffer fills up and when the block exits,
+	including when it exits with an exception. They are written in the
+	caller's transaction, which the caller commits.
+	"""
+	if getattr(frappe.local, "notification_log_buffer", None) is not None:
+		# Already inside a buffered batch
+		yield
+		return
+	
+	frappe.local.notification_log_buffer = []
+	try:
+		yield
+	finally:
+		try:
+			flush_notification_logs()
+		finally:
+			frappe.local.notification_log_buffer = None
+
+
+def flush_notification_logs():
+	"""Write buffered CA Notification Log rows in the current transaction"""
+	buffer = getattr(frappe.local, "notification_log_buffer", None)
+	if not buffer:
+		return
+	
+	rows = list(buffer)
+	buffer.clear()
+	
+	try:
+		write_notification_logs(rows)
+	except Exception as e:
+		# A failed INSERT only undoes itself; keep the rows in Redis so a
+		# later flush can still write them
+		for row in rows:
+			frappe.cache().rpush(NOTIFICATION_LOG_SPOOL_KEY, json.dumps(row))
+		frappe.log_error(f"Error writing notification logs, spooled {len(rows)} rows: {str(e)}")
+
+
+def write_notification_logs(rows):
+	"""
+	Insert CA Notification Log rows with multi-row inserts
+	
+	Rows already written (same name) are skipped, so a replayed row is harmless.
+	"""
+	timestamp = now()
+	user = frappe.session.user
+	
+	frappe.db.bulk_insert(
+		"CA Notification Log",
+		fields=["name", "creation", "modified", "owner", "modified_by"] + NOTIFICATION_LOG_FIELDS,
+		values=[
+			(row[0], timestamp, timestamp, user, user) + tuple(row[1:])
+			for row in rows
+		],
+		ignore_duplicates=True
+	)
+
+
+def flush_spooled_notification_logs():
+	"""
+	Write CA Notification Log rows from the spool (scheduler)
+	
+	Rows are moved to a processing key and deleted only after the insert
+	commits. Rows a dead flush left on the processing key are written again,
+	which skips any that made it in.
+	"""
+	cache = frappe.cache()
+	spool = cache.make_key(NOTIFICATION_LOG_SPOOL_KEY)
+	processing = cache.make_key(NOTIFICATION_LOG_SPOOL_PROCESSING_KEY)
+	
+	def move(pipe):
+		held = pipe.lrange(processing, 0, -1)
+		raw = pipe.lrange(spool, 0, NOTIFICATION_LOG_FLUSH_SIZE - 1)
+		pipe.multi()
+		if raw:
+			pipe.rpush(processing, *raw)
+		pipe.ltrim(spool, len(raw), -1)
+		return held + raw
+	
+	rows = [json.loads(raw) for raw in cache.transaction(move, spool, processing, value_from_callable=True)]
+	if not rows:
+		return
+	
+	write_notification_logs(rows)
+	frappe.db.commit()
+	cache.delete(processing)
+
+
+def send_email_notification(client, template_type, data, reference=None, offset=None):
 	"""
 	Send email notification
 	
+	The email is rendered now and queued on the firm's email lane, where a
+	drain job sends it over a pooled SMTP session.
+	
 	Args:
 		client: CA Client document name or object
 		template_type: Type of template
 		data: Dictionary of variables for template rendering
+		reference: Entity the notification is about, as in send_notification
+		offset: Offset or date for the reference, as in send_notification
+	
+	Returns:
+		Queued message id, or None if nothing was queued
+	"""
+	return send_bulk_email_notifications([(client, template_type, data, reference, offset)])[0]
+
+
+def send_bulk_email_notifications(items):
+	"""
+	Render and queue many email notifications in one batch
+	
+	Args:
+		items: Iterable of (client, template_type, data) tuples, optionally
+			followed by reference and offset as in send_notification
+	
+	Returns:
+		List of queued message ids (None where nothing was queued) in item order
 	"""
+	items = [tuple(item) + (None,) * (5 - len(item)) for item in items]
+	if not items:
+		return []
+	
+	responses = []
+	unsent = []
+	
 	try:
-		# Get client details
-		if isinstance(client, str):
-			client_doc = frappe.get_doc("CA Client", client)
-		else:
-			client_doc = client
-			
-		# Get Firm Settings
-		if not client_doc.firm:
-			return None
-			
-		firm_settings = frappe.get_doc("CA Firm", client_doc.firm)
-		
-		if not firm_settings.enable_email_notifications:
-			return None
-		
-		# Get notification template for this Firm
-		template = frappe.get_doc("Notification Template", {
-			"firm": client_doc.firm,
-			"template_type": template_type,
-			"channel": "Email",
-			"is_active": 1
-		})
+		sync_notification_cache()
+		clients = get_clients([item[0] for item in items])
 		
-		if not template:
-			return None
+		def get_client_name(client):
+			return client if isinstance(client, str) else client.name
 		
-		# Render template
-		message = template.render(data)
-		
-		# Send email using Frappe's email queue
-		frappe.sendmail(
-			recipients=[client_doc.email],
-			subject=f"Notification: {template_type.replace('_', ' ').title()}",
-			message=message,
-			delayed=False
+		# Emails are claimed apart from WhatsApp messages for the same reminder
+		claimed = claim_notifications(
+			(get_client_name(client), f"{template_type}:email", reference, offset)
+			for client, template_type, data, reference, offset in items
+			if reference
 		)
 		
-		# Log notification
-		log_notification(
-			client=client_doc.name,
-			template=template.name,
-			channel="Email",
-			status="Sent",
-			message=message
-		)
+		for client, template_type, data, reference, offset in items:
+			ledger_key = None
+			
+			try:
+				if reference:
+					ledger_key = get_ledger_key(get_client_name(client), f"{template_type}:email", reference, offset)
+					if ledger_key not in claimed:
+						responses.append(None)
+						continue
+					claimed.discard(ledger_key)
+				
+				client_doc = clients.get(client) if isinstance(client, str) else client
+				response = deliver_email_notification(client_doc, template_type, data) if client_doc else None
+				
+				responses.append(response)
+				if not response:
+					unsent.append(ledger_key)
+				
+			except Exception as e:
+				frappe.log_error(f"Error sending email notification: {str(e)}")
+				responses.append(None)
+				unsent.append(ledger_key)
+		
+		release_notifications(unsent)
 		
 	except Exception as e:
 		frappe.log_error(f"Error sending email notification: {str(e)}")
+		responses += [None] * (len(items) - len(responses))
+	
+	return responses
+
+
+def deliver_email_notification(client_doc, template_type, data):
+	"""Render an email notification for a resolved client and queue it"""
+	if not client_doc.firm or not client_doc.email:
+		return None
+	
+	firm_settings = get_firm(client_doc.firm)
+	
+	if not firm_settings.enable_email_notifications:
+		return None
+	
+	# Get notification template for this Firm
+	template = get_template(client_doc.firm, template_type, "Email")
+	
+	if not template:
+		return None
+	
+	# Render template
+	message = template.render(data)
+	
+	if not message:
+		frappe.log_error("Failed to render notification template")
+		return None
+	
+	return enqueue_message(
+		"email",
+		client_doc.firm,
+		payload={
+			"recipients": [client_doc.email],
+			"subject": f"Notification: {template_type.replace('_', ' ').title()}",
+			"message": message,
+			"reply_to": firm_settings.contact_email
+		},
+		client=client_doc.name,
+		template=template.name,
+		log_message=message,
+		concurrency=firm_settings.email_concurrency,
+		rate_limit=firm_settings.email_rate_limit,
+		max_attempts=firm_settings.email_max_attempts,
+		retry_delay=firm_settings.email_retry_delay
+	)
+
+
+def deliver_queued_email(queued_message):
+	"""
+	Transport used by the message queue to send an email
+	
+	Args:
+		queued_message: Message dict from the outbound queue
+	
+	Returns:
+		Dict with the sent status (errors raise so the queue retries)
+	"""
+	from email.message import EmailMessage
+	from email.utils import make_msgid
+	from microsaas.microsaas.services.smtp_pool import smtp_pool, get_smtp_settings
+	
+	payload = queued_message["payload"]
+	settings = get_smtp_settings()
+	
+	email = EmailMessage()
+	email["From"] = settings.get("sender") or settings.get("login")
+	email["To"] = ", ".join(payload["recipients"])
+	email["Subject"] = payload["subject"]
+	email["Message-ID"] = make_msgid(idstring=queued_message["id"])
+	if payload.get("reply_to"):
+		email["Reply-To"] = payload["reply_to"]
+	
+	email.set_content(frappe.utils.html2text(payload["message"]))
+	email.add_alternative(payload["message"], subtype="html")
+	
+	smtp_pool.send(settings, email)
+	return {"status": "sent", "message_id": email["Message-ID"]}
@@ -0,0 +1,313 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Payment Links
+An invoice keeps the link it was last given together with the gateway,
+amount, currency and expiry it was created for. Links charge the outstanding
+balance, and the existing link is returned until one of those changes or it
+nears expiry, so portal clicks and reminders do not each create a link.
+
+Creates payment links for many invoices at once. Gateway requests are built
+in the calling process, then sent from a bounded thread pool with one token
+bucket per firm account, so a month-end batch keeps several requests in
+flight without exceeding the gateway's rate limit.
+
+References and URLs are written back to the invoices in batched UPDATEs
+instead of one save per invoice.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+import frappe
+from frappe.utils import cint, flt, now, now_datetime, get_datetime
+
+from microsaas.microsaas.integrations.payment_gateway.registry import get_gateway, get_default_gateway
+from microsaas.microsaas.services.rate_limiter import TokenBucket
+from microsaas.microsaas.services.reminder_schedule import OPEN_INVOICE_STATUSES
+
+
+# Threads sending gateway requests (site config `microsaas_payment_link_workers` overrides)
+DEFAULT_LINK_WORKERS = 8
+
+# Link requests per second per firm account; site config
+# `microsaas_payment_link_rate_limits` (e.g. {"Stripe": 50}) overrides
+GATEWAY_RATE_LIMITS = {"Razorpay": 10, "Stripe": 25}
+
+# Invoices written back per UPDATE (and commit)
+WRITE_BATCH_SIZE = 200
+
+# Batches up to this size are created in the request instead of a background job
+SYNC_BATCH_LIMIT = 20
+
+# Days a link is reused (site config `microsaas_payment_link_ttl_days` overrides)
+DEFAULT_LINK_TTL_DAYS = 30
+
+# A link expiring sooner than this is replaced rather than sent again
+LINK_REUSE_MARGIN = timedelta(days=1)
+
+# Invoice fields describing its current link
+LINK_FIELDS = [
+	"payment_gateway_reference", "portal_link", "payment_link_gateway",
+	"payment_link_amount", "payment_link_currency", "payment_link_expires_at"
+]
+
+INVOICE_FIELDS = [
+	"name", "firm", "client", "client_name", "client_email", "currency",
+	"total_amount", "outstanding_amount", "status", "docstatus"
+] + LINK_FIELDS
+
+
+def get_link_amount(invoice):
+	"""Amount a link for the invoice charges: its outstanding balance"""
+	return flt(invoice.outstanding_amount, 2)
+
+
+def get_link_expiry():
+	ttl_days = cint(frappe.conf.get("microsaas_payment_link_ttl_days")) or DEFAULT_LINK_TTL_DAYS
+	return now_datetime() + timedelta(days=ttl_days)
+
+
+def get_reusable_link(invoice, gateway):
+	"""
+	Return the invoice's current link if it can be sent again
+
+	The link must come from the same gateway, be for the current outstanding
+	amount and currency, and not expire within LINK_REUSE_MARGIN.
+
+	Args:
+		invoice: CA Invoice document or dict with LINK_FIELDS
+		gateway: Gateway name
+
+	Returns:
+		Link URL or None
+	"""
+	if (
+		invoice.payment_gateway_reference
+		and invoice.payment_link_gateway == gateway
+		and flt(invoice.payment_link_amount, 2) == get_link_amount(invoice)
+		and invoice.payment_link_currency == invoice.currency
+		and invoice.payment_link_expires_at
+		and get_datetime(invoice.payment_link_expires_at) > now_datetime() + LINK_REUSE_MARGIN
+	):
+		return invoice.portal_link
+
+
+def get_replaced_reference(invoice, gateway):
+	"""Gateway id of the invoice's current link if a new link from the same gateway replaces it"""
+	if invoice.payment_gateway_reference and invoice.payment_link_gateway == gateway:
+		return invoice.payment_gateway_reference
+
+
+def get_link_values(invoice, gateway, payment_link, expires_at):
+	"""Invoice field values recording a newly created link"""
+	return {
+		"payment_gateway_reference": payment_link.reference,
+		"portal_link": payment_link.url,
+		"payment_link_gateway": gateway,
+		"payment_link_amount": get_link_amount(invoice),
+		"payment_link_currency": invoice.currency,
+		"payment_link_expires_at": expires_at
+	}
+
+
+def create_payment_links(invoice_names, gateway=None, workers=None):
+	"""
+	Create payment links for a batch of invoices in parallel
+
+	Args:
+		invoice_names: CA Invoice names
+		gateway: Payment gateway (Razorpay/Stripe); each firm's default if not set
+		workers: Number of sending threads
+
+	Returns:
+		List of dicts with invoice, status (Created/Reused/Skipped/Failed),
+		gateway, reference, payment_link and error
+	"""
+	results = {}
+	pending = []
+
+	invoices = {
+		invoice.name: invoice
+		for invoice in frappe.get_all("CA Invoice", filters={"name": ["in", list(invoice_names)]}, fields=INVOICE_FIELDS)
+	}
+	phones = dict(frappe.get_all(
+		"CA Client",
+		filters={"name": ["in", list({invoice.client for invoice in invoices.values()})]},
+		fields=["name", "phone"],
+		as_list=True
+	))
+
+	limits = {**GATEWAY_RATE_LIMITS, **(frappe.conf.get("microsaas_payment_link_rate_limits") or {})}
+	buckets = {}
+	expires_at = get_link_expiry()
+
+	for invoice_name in invoice_names:
+		invoice = invoices.get(invoice_name)
+
+		if not invoice:
+			results[invoice_name] = {"invoice": invoice_name, "status": "Failed", "error": "Invoice not found"}
+			continue
+
+		if invoice.docstatus != 1 or invoice.status not in OPEN_INVOICE_STATUSES:
+			results[invoice_name] = {"invoice": invoice_name, "status": "Skipped", "error": f"Invoice is {invoice.status}"}
+			continue
+
+		try:
+			gateway_name = gateway or get_default_gateway(invoice.firm)
+
+			reusable = get_reusable_link(invoice, gateway_name)
+			if reusable:
+				results[invoice_name] = {
+					"invoice": invoice_name,
+					"status": "Reused",
+					"gateway": gateway_name,
+					"reference": invoice.payment_gateway_reference,
+					"payment_link": reusable
+				}
+				continue
+
+			client = get_gateway(gateway_name, invoice.firm)
+
+			key = (gateway_name, invoice.firm)
+			if key not in buckets:
+				buckets[key] = TokenBucket(limits.get(gateway_name) or 1)
+
+			invoice.client_phone = phones.get(invoice.client)
+			params = client.payment_link_params(invoice, get_link_amount(invoice), expires_at)
+			pending.append((
+				invoice, gateway_name, client, buckets[key], params,
+				get_replaced_reference(invoice, gateway_name)
+			))
+
+		except Exception as e:
+			results[invoice_name] = {"invoice": invoice_name, "status": "Failed", "gateway": gateway, "error": str(e)}
+
+	if pending:
+		workers = cint(workers) or cint(frappe.conf.get("microsaas_payment_link_workers")) or DEFAULT_LINK_WORKERS
+		created = []
+		failed = []
+
+		with ThreadPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+			futures = {
+				pool.submit(send_payment_link, client, bucket, params, replaced): (invoice, gateway_name)
+				for invoice, gateway_name, client, bucket, params, replaced in pending
+			}
+
+			for future in as_completed(futures):
+				invoice, gateway_name = futures[future]
+				invoice_name = invoice.name
+
+				try:
+					link = future.result()
+				except Exception as e:
+					failed.append(f"{invoice_name}: {str(e)}")
+					results[invoice_name] = {"invoice": invoice_name, "status": "Failed", "gateway": gateway_name, "error": str(e)}
+					continue
+
+				created.append((invoice_name, get_link_values(invoice, gateway_name, link, expires_at)))
+				results[invoice_name] = {
+					"invoice": invoice_name,
+					"status": "Created",
+					"gateway": gateway_name,
+					"reference": link.reference,
+					"payment_link": link.url
+				}
+
+				if len(created) >= WRITE_BATCH_SIZE:
+					save_payment_links(created)
+					frappe.db.commit()
+					created = []
+
+		save_payment_links(created)
+		frappe.db.commit()
+
+		if failed:
+			frappe.log_error("\n".join(failed), "Payment Link Error")
+
+	return [results[invoice_name] for invoice_name in invoice_names]
+
+
+def send_payment_link(client, bucket, params, replaced=None):
+	"""
+	Wait for a rate-limit token, then create one link (runs in a pool thread)
+
+	The link it replaces is deactivated afterwards, on a best-effort basis:
+	a paid or expired old link cannot be deactivated and needs no action.
+	"""
+	bucket.acquire()
+	link = client.send_payment_link(params)
+
+	if replaced:
+		bucket.acquire()
+		try:
+			client.deactivate_payment_link(replaced)
+		except Exception:
+			pass
+
+	return link
+
+
+def save_payment_links(links):
+	"""
+	Write link fields back to invoices in one UPDATE
+
+	Args:
+		links: List of (invoice name, dict of LINK_FIELDS values)
+	"""
+	if not links:
+		return
+
+	cases = " ".join(["WHEN %s THEN %s"] * len(links))
+	assignments = []
+	values = []
+
+	for fieldname in LINK_FIELDS:
+		assignments.append(f"`{fieldname}` = CASE name {cases} END")
+		values.extend(value for name, link_values in links for value in (name, link_values[fieldname]))
+
+	values.extend([now(), frappe.session.user])
+	values.extend(name for name, link_values in links)
+
+	frappe.db.sql(f"""
+		UPDATE `tabCA Invoice`
+		SET
+			{", ".join(assignments)},
+			modified = %s,
+			modified_by = %s
+		WHERE name IN ({", ".join(["%s"] * len(links))})
+	""", values)
+
+
+def enqueue_payment_links(invoice_names, gateway=None):
+	"""
+	Create payment links now for small batches, in the background otherwise
+
+	Background results are published to the requesting user as the
+	`payment_link_batch` realtime event when the batch finishes.
+
+	Returns:
+		Dict with results for small batches, or the number of invoices queued
+	"""
+	if len(invoice_names) <= SYNC_BATCH_LIMIT:
+		return {"results": create_payment_links(invoice_names, gateway)}
+
+	frappe.enqueue(
+		"microsaas.microsaas.services.payment_links.create_payment_link_batch",
+		queue="long",
+		timeout=3600,
+		invoice_names=invoice_names,
+		gateway=gateway,
+		user=frappe.session.user
+	)
+
+	return {"queued": len(invoice_names)}
+
+
+def create_payment_link_batch(invoice_names, gateway=None, user=None):
+	"""Create links for a batch and publish the per-invoice results (background job)"""
+	results = create_payment_links(invoice_names, gateway)
+
+	frappe.publish_realtime("payment_link_batch", {"results": results}, user=user)
+	return results
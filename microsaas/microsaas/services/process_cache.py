@@ -0,0 +1,73 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Process Cache
+In-process cache for rarely changing documents, shared by every request and
+job a worker runs. A version token in Redis lets a save in one worker
+invalidate the copies held by all the others.
+"""
+
+import threading
+
+import frappe
+
+
+class ProcessCache:
+	"""Per-site in-process cache invalidated through a shared version token"""
+
+	def __init__(self, namespace):
+		self.namespace = namespace
+		self._sites = {}
+		self._lock = threading.Lock()
+
+	@property
+	def version_key(self):
+		return f"microsaas:process_cache_version:{self.namespace}"
+
+	def sync(self):
+		"""
+		Drop local entries if another process invalidated the cache
+
+		Costs one Redis read, so call it once per request or batch rather
+		than once per lookup.
+		"""
+		version = frappe.cache().get_value(self.version_key)
+
+		with self._lock:
+			store = self._sites.get(frappe.local.site)
+			if store is None or store["version"] != version:
+				self._sites[frappe.local.site] = {"version": version, "values": {}}
+
+	def get(self, key, loader):
+		"""
+		Return cached value for key, loading it on a miss
+
+		Args:
+			key: Hashable cache key
+			loader: Callable returning the value to cache
+		"""
+		store = self._sites.get(frappe.local.site)
+		if store is None:
+			self.sync()
+			store = self._sites[frappe.local.site]
+
+		values = store["values"]
+		if key not in values:
+			values[key] = loader()
+
+		return values[key]
+
+	def clear(self):
+		"""Invalidate this cache in every process serving the site"""
+		self._bump_version()
+
+		# Bump again once the transaction commits so a worker that reloaded
+		# the old row in between does not keep it
+		frappe.db.after_commit.add(self._bump_version)
+
+	def _bump_version(self):
+		frappe.cache().set_value(self.version_key, frappe.generate_hash(length=10))
+
+		with self._lock:
+			self._sites.pop(frappe.local.site, None)
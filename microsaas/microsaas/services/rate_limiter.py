@@ -0,0 +1,73 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Rate Limiter
+Redis fixed-window limiter shared by every worker serving a site, and an
+in-process token bucket for calls fanned out over a thread pool
+"""
+
+import threading
+import time
+
+import frappe
+
+
+def acquire_slot(key, limit, window=60):
+	"""
+	Block until a slot is free in the current window, then take it
+
+	Args:
+		key: Limiter key (e.g. "whatsapp:<instance>")
+		limit: Maximum acquisitions per window (0 or None disables limiting)
+		window: Window length in seconds
+	"""
+	if not limit:
+		return
+
+	cache = frappe.cache()
+
+	while True:
+		now = time.time()
+		window_start = int(now // window) * window
+		counter_key = cache.make_key(f"microsaas:rate_limit:{key}:{window_start}")
+
+		count = cache.incr(counter_key)
+		if count == 1:
+			cache.expire(counter_key, window * 2)
+
+		if count <= limit:
+			return
+
+		# Window is full, wait for the next one
+		time.sleep(max(window_start + window - now, 0.05))
+
+
+class TokenBucket:
+	"""
+	Thread-safe token bucket: up to `capacity` calls at once, refilled at
+	`rate` tokens per second
+	"""
+
+	def __init__(self, rate, capacity=None):
+		self.rate = float(rate)
+		self.capacity = float(capacity or rate)
+		self.tokens = self.capacity
+		self.updated = time.monotonic()
+		self.lock = threading.Lock()
+
+	def acquire(self):
+		"""Block until a token is available, then take it"""
+		while True:
+			with self.lock:
+				now = time.monotonic()
+				self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+				self.updated = now
+
+				if self.tokens >= 1:
+					self.tokens -= 1
+					return
+
+				wait = (1 - self.tokens) / self.rate
+
+			time.sleep(wait)
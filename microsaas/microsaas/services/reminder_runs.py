@@ -0,0 +1,132 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Reminder Runs
+Each reminder job is recorded as a Reminder Run that walks its recipients in
+name order, one committed chunk at a time. The run stores the last name it
+processed, so a retried job resumes after it instead of messaging everyone
+again.
+"""
+
+import json
+import time
+
+import frappe
+from frappe.utils import now, today, add_to_date
+
+
+# Runs with no chunk committed for this long are assumed to belong to a dead worker
+STALE_RUN_MINUTES = 30
+
+
+def start_run(run_type, run_key, parameters=None, total=0):
+	"""
+	Get the run for a key, creating it on first use
+
+	Args:
+		run_type: Reminder Run type (Tax Deadline)
+		run_key: Unique key of the run, e.g. "Tax Deadline:2026-10-18"
+		parameters: Dict the run handler needs to rebuild its selection
+		total: Number of recipients, for progress reporting
+
+	Returns:
+		Reminder Run document
+	"""
+	if frappe.db.exists("Reminder Run", run_key):
+		return frappe.get_doc("Reminder Run", run_key)
+
+	run = frappe.get_doc({
+		"doctype": "Reminder Run",
+		"run_key": run_key,
+		"run_type": run_type,
+		"run_date": today(),
+		"status": "Running",
+		"parameters": json.dumps(parameters or {}, default=str),
+		"total": total,
+		"started_at": now()
+	}).insert(ignore_permissions=True)
+	frappe.db.commit()
+
+	return run
+
+
+def execute_run(run, fetch_chunk, dispatch, chunk_size):
+	"""
+	Process a run from its cursor to the end, committing after every chunk
+
+	Args:
+		run: Reminder Run document
+		fetch_chunk: Callable(after, limit) returning rows with a `name`, in name order
+		dispatch: Callable(rows) that sends the reminders for a chunk
+		chunk_size: Rows per chunk
+	"""
+	if run.status == "Completed":
+		return
+
+	started = time.perf_counter()
+	sent = 0
+
+	try:
+		while True:
+			# Lock the run so a concurrent retry never sends the same chunk
+			cursor, processed = frappe.db.get_value(
+				"Reminder Run", run.name, ["cursor", "processed"], for_update=True
+			)
+
+			rows = fetch_chunk(cursor, chunk_size)
+			if not rows:
+				break
+
+			dispatch(rows)
+
+			sent += len(rows)
+			throughput = round(sent / max(time.perf_counter() - started, 0.001), 2)
+
+			frappe.db.set_value("Reminder Run", run.name, {
+				"status": "Running",
+				"cursor": rows[-1].name,
+				"processed": processed + len(rows),
+				"throughput": throughput,
+				"last_chunk_at": now(),
+				"error": None
+			})
+			frappe.db.commit()
+
+			publish_progress(run, processed + len(rows), throughput)
+
+		frappe.db.set_value("Reminder Run", run.name, {"status": "Completed", "finished_at": now()})
+		frappe.db.commit()
+		publish_progress(run, run.total, None, completed=True)
+
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.db.set_value("Reminder Run", run.name, {"status": "Failed", "error": str(e)})
+		frappe.db.commit()
+		raise
+
+
+def publish_progress(run, processed, throughput, completed=False):
+	"""Push run progress to anyone viewing the Reminder Run"""
+	frappe.publish_realtime(
+		"reminder_run_progress",
+		{
+			"run": run.name,
+			"processed": processed,
+			"total": run.total,
+			"throughput": throughput,
+			"completed": completed
+		},
+		doctype="Reminder Run",
+		docname=run.name
+	)
+
+
+def get_resumable_runs():
+	"""Today's runs that failed or stopped committing chunks"""
+	return frappe.db.sql("""
+		SELECT name, run_type, parameters
+		FROM `tabReminder Run`
+		WHERE run_date = %(today)s
+		AND (status = 'Failed' OR (status = 'Running' AND modified < %(stale)s))
+	""", {"today": today(), "stale": add_to_date(now(), minutes=-STALE_RUN_MINUTES)}, as_dict=True)
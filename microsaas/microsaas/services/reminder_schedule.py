@@ -0,0 +1,425 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Reminder Schedule Service
+Keeps one Reminder Schedule row per reminder still to be sent (entity,
+template, offset and the time it is due). Rows are written when invoices,
+appointments and documents change and from the tax deadline calendar, so
+the dispatcher reads due rows from one indexed table instead of scanning
+each source doctype.
+
+A row's key includes the minute it is due and sent rows are kept, so the
+table doubles as a sent-ledger: rescheduling a record replaces its pending
+rows, but a reminder already sent for a given time is never created again.
+"""
+
+import re
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+import frappe
+from frappe.utils import get_datetime, getdate, now, now_datetime, today, cint, get_system_timezone
+
+
+# Invoice reminder offsets in days relative to the due date (negative = before due),
+# used when an invoice has no readable reminder_schedule
+DEFAULT_INVOICE_OFFSETS = (-3, 0, 3, 7, 14, 30)
+
+# Default text of CA Invoice.reminder_schedule. Invoices that still carry it
+# get DEFAULT_INVOICE_OFFSETS, the reminders they were always sent, including
+# the 7/14/30 day overdue ones the text does not mention.
+DEFAULT_REMINDER_SCHEDULE_TEXT = "3 days before due date, On due date, 3 days after due date"
+
+# Appointment reminder sent this many hours before, besides the appointment's reminder_time
+APPOINTMENT_FINAL_REMINDER_HOURS = 1
+
+# Days before expiry a document reminder is sent, unless CA Settings
+# document_expiry_reminder_days says otherwise
+DEFAULT_DOCUMENT_EXPIRY_DAYS = (30, 7, 1)
+
+# Indian tax deadlines (customize as needed)
+TAX_DEADLINES = {
+	"2026-07-31": "ITR Filing Deadline for Individuals",
+	"2026-10-31": "ITR Filing Deadline for Audit Cases",
+	"2026-03-31": "Financial Year End",
+	"2026-06-15": "Advance Tax Q1",
+	"2026-09-15": "Advance Tax Q2",
+	"2026-12-15": "Advance Tax Q3",
+	"2026-03-15": "Advance Tax Q4"
+}
+
+# Tax deadline reminder offsets in days relative to the deadline
+TAX_DEADLINE_OFFSETS = (-7, -1)
+
+# Time of day day-offset reminders become due
+DAILY_REMINDER_TIME = "09:00:00"
+
+# Day-offset reminders still pending this long after they were due are marked Missed
+DEFAULT_MAX_LATENESS_HOURS = 24
+
+OPEN_INVOICE_STATUSES = ("Unpaid", "Partially Paid", "Overdue")
+
+SCHEDULE_INSERT_FIELDS = [
+	"name", "creation", "modified", "owner", "modified_by", "docstatus",
+	"schedule_key", "reference_doctype", "reference_name", "template_type",
+	"reminder_offset", "offset_unit", "due_at", "expires_at", "status", "client", "firm"
+]
+
+
+def sync_reminder_schedule(doc, method=None):
+	"""Rewrite the pending reminders of an invoice, appointment or document (doc_events hook)"""
+	set_schedule(doc.doctype, doc.name, SCHEDULE_BUILDERS[doc.doctype](doc))
+
+
+def clear_reminder_schedule(doc, method=None):
+	"""Drop the pending reminders of a cancelled or deleted record (doc_events hook)"""
+	set_schedule(doc.doctype, doc.name, [])
+
+
+def get_invoice_schedule(invoice):
+	"""Reminder rows for a submitted open invoice"""
+	if invoice.docstatus != 1 or invoice.status not in OPEN_INVOICE_STATUSES or not invoice.due_date:
+		return []
+
+	rows = []
+	for offset in parse_reminder_offsets(invoice.reminder_schedule):
+		rows.append(make_row(
+			"CA Invoice", invoice.name,
+			"payment_overdue" if offset > 0 else "payment_reminder",
+			offset, "Day", get_day_due_at(invoice.due_date, offset),
+			invoice.client, invoice.firm
+		))
+
+	return rows
+
+
+def get_appointment_schedule(appointment):
+	"""Reminder rows for a scheduled appointment with reminders enabled"""
+	if appointment.status != "Scheduled" or not appointment.send_reminder:
+		return []
+
+	starts_at = get_appointment_start(appointment)
+	hours_before = {cint(appointment.reminder_time) or 24, APPOINTMENT_FINAL_REMINDER_HOURS}
+
+	# A reminder is pointless once the appointment has started
+	return [
+		make_row(
+			"CA Appointment", appointment.name, "appointment_reminder",
+			-hours, "Hour", starts_at - timedelta(hours=hours),
+			appointment.client, appointment.firm, expires_at=starts_at
+		)
+		for hours in sorted(hours_before, reverse=True)
+	]
+
+
+def get_appointment_start(appointment):
+	"""Appointment start in system time, read in the appointment's own timezone"""
+	starts_at = get_datetime(f"{appointment.appointment_date} {appointment.appointment_time}")
+	system_timezone = get_system_timezone()
+
+	if not appointment.timezone or appointment.timezone == system_timezone:
+		return starts_at
+
+	return (
+		starts_at.replace(tzinfo=ZoneInfo(appointment.timezone))
+		.astimezone(ZoneInfo(system_timezone))
+		.replace(tzinfo=None)
+	)
+
+
+def get_document_schedule(document):
+	"""Reminder rows for a document with an expiry date, one per expiry milestone"""
+	if not document.expiry_date:
+		return []
+
+	return [
+		make_row(
+			"CA Document", document.name, "document_expiry",
+			-days, "Day", get_day_due_at(document.expiry_date, -days),
+			document.client, document.firm
+		)
+		for days in get_document_expiry_days()
+	]
+
+
+def get_document_expiry_days():
+	"""Expiry milestones in days, from CA Settings (cached per request)"""
+	if not hasattr(frappe.local, "document_expiry_days"):
+		frappe.local.document_expiry_days = parse_reminder_days(
+			frappe.db.get_single_value("CA Settings", "document_expiry_reminder_days")
+		) or list(DEFAULT_DOCUMENT_EXPIRY_DAYS)
+
+	return frappe.local.document_expiry_days
+
+
+def parse_reminder_days(value):
+	"""
+	Read a comma separated list of day counts such as "30, 7, 1"
+
+	Returns:
+		Distinct positive day counts, largest first
+
+	Raises:
+		ValueError: If a part is not a positive whole number
+	"""
+	days = set()
+
+	for part in (value or "").split(","):
+		part = part.strip()
+		if not part:
+			continue
+		if not part.isdigit() or int(part) < 1:
+			raise ValueError(part)
+		days.add(int(part))
+
+	return sorted(days, reverse=True)
+
+
+def reschedule_document_reminders():
+	"""Rebuild document expiry rows after the milestones change (background job)"""
+	rebuild_reminder_schedule(doctypes=("CA Document",))
+
+
+SCHEDULE_BUILDERS = {
+	"CA Invoice": get_invoice_schedule,
+	"CA Appointment": get_appointment_schedule,
+	"CA Document": get_document_schedule
+}
+
+
+def parse_reminder_offsets(reminder_schedule):
+	"""
+	Read day offsets from an invoice's reminder_schedule text
+
+	Understands comma separated parts like "3 days before due date",
+	"On due date" and "7 days after due date". The untouched field default
+	means DEFAULT_INVOICE_OFFSETS.
+	"""
+	if normalize_schedule_text(reminder_schedule) == normalize_schedule_text(DEFAULT_REMINDER_SCHEDULE_TEXT):
+		return list(DEFAULT_INVOICE_OFFSETS)
+
+	offsets = set()
+
+	for part in (reminder_schedule or "").lower().split(","):
+		match = re.search(r"(\d+)\s*days?\s*(before|after)", part)
+		if match:
+			days = int(match.group(1))
+			offsets.add(-days if match.group(2) == "before" else days)
+		elif "on due date" in part:
+			offsets.add(0)
+
+	return sorted(offsets) or list(DEFAULT_INVOICE_OFFSETS)
+
+
+def normalize_schedule_text(text):
+	return [" ".join(part.split()) for part in (text or "").lower().split(",")]
+
+
+def make_row(reference_doctype, reference_name, template_type, offset, unit, due_at, client=None, firm=None,
+		expires_at=None):
+	# Due times are kept to the minute so the key is stable across saves
+	due_at = get_datetime(due_at).replace(second=0, microsecond=0)
+
+	return frappe._dict({
+		"schedule_key": f"{reference_doctype}:{reference_name}:{template_type}:{offset}:{due_at:%Y-%m-%d %H:%M}",
+		"reference_doctype": reference_doctype,
+		"reference_name": reference_name,
+		"template_type": template_type,
+		"reminder_offset": offset,
+		"offset_unit": unit,
+		"due_at": due_at,
+		"expires_at": get_datetime(expires_at) if expires_at else due_at + timedelta(hours=DEFAULT_MAX_LATENESS_HOURS),
+		"client": client,
+		"firm": firm
+	})
+
+
+def get_day_due_at(date, offset):
+	return get_datetime(f"{getdate(date) + timedelta(days=offset)} {DAILY_REMINDER_TIME}")
+
+
+def set_schedule(reference_doctype, reference_name, rows):
+	"""
+	Make the stored reminders of one record match `rows`
+
+	Pending rows that are no longer wanted are deleted and reminders already
+	in the past are not created. A wanted row that is already due but not
+	yet dispatched is kept. A moved due time gives a new key, so the old row
+	is replaced; rows already sent stay behind as the ledger that stops the
+	same reminder going out twice.
+
+	Args:
+		reference_doctype: Source doctype (or "Tax Deadline")
+		reference_name: Source record name
+		rows: Rows from make_row
+	"""
+	existing = {
+		row.name: row for row in frappe.get_all(
+			"Reminder Schedule",
+			filters={"reference_doctype": reference_doctype, "reference_name": reference_name},
+			fields=["name", "status"]
+		)
+	}
+
+	wanted = {row.schedule_key: row for row in rows}
+	current = now_datetime()
+
+	stale = [name for name, row in existing.items() if name not in wanted and row.status == "Pending"]
+	if stale:
+		frappe.db.delete("Reminder Schedule", {"name": ["in", stale]})
+
+	# Rows cancelled while the record was inactive come back if it is restored
+	restored = [
+		key for key, row in wanted.items()
+		if key in existing and existing[key].status == "Cancelled" and row.due_at >= current
+	]
+	mark_schedule_rows(restored, "Pending")
+
+	insert_schedule_rows([row for key, row in wanted.items() if key not in existing and row.due_at >= current])
+
+
+def insert_schedule_rows(rows):
+	if not rows:
+		return
+
+	timestamp = now()
+	user = frappe.session.user
+
+	frappe.db.bulk_insert(
+		"Reminder Schedule",
+		fields=SCHEDULE_INSERT_FIELDS,
+		values=[
+			(
+				row.schedule_key, timestamp, timestamp, user, user, 0,
+				row.schedule_key, row.reference_doctype, row.reference_name, row.template_type,
+				row.reminder_offset, row.offset_unit, row.due_at, row.expires_at, "Pending", row.client, row.firm
+			)
+			for row in rows
+		],
+		ignore_duplicates=True
+	)
+
+
+def sync_tax_deadline_schedule():
+	"""Write reminder rows for the tax deadline calendar (scheduler)"""
+	for deadline_date in TAX_DEADLINES:
+		set_schedule("Tax Deadline", deadline_date, [
+			make_row("Tax Deadline", deadline_date, "tax_deadline", offset, "Day", get_day_due_at(deadline_date, offset))
+			for offset in TAX_DEADLINE_OFFSETS
+		])
+
+
+def rebuild_reminder_schedule(chunk_size=5000, commit=True, doctypes=None):
+	"""
+	Recreate pending reminder rows for every open invoice, scheduled
+	appointment and expiring document
+
+	Run with:
+		bench --site <site> execute microsaas.microsaas.services.reminder_schedule.rebuild_reminder_schedule
+
+	Args:
+		chunk_size: Source records read per query
+		commit: Commit after every chunk
+		doctypes: Only rebuild these source doctypes (all, plus tax deadlines, if not set)
+	"""
+	sources = {
+		"CA Invoice": (
+			{"docstatus": 1, "status": ["in", list(OPEN_INVOICE_STATUSES)], "due_date": [">=", getdate(today()) - timedelta(days=max(DEFAULT_INVOICE_OFFSETS) + 1)]},
+			["name", "client", "firm", "due_date", "docstatus", "status", "reminder_schedule"]
+		),
+		"CA Appointment": (
+			{"status": "Scheduled", "send_reminder": 1, "appointment_date": [">=", today()]},
+			["name", "client", "firm", "appointment_date", "appointment_time", "timezone", "status", "send_reminder", "reminder_time"]
+		),
+		"CA Document": (
+			{"expiry_date": [">=", today()]},
+			["name", "client", "firm", "expiry_date"]
+		)
+	}
+
+	for doctype, (filters, fields) in sources.items():
+		if doctypes and doctype not in doctypes:
+			continue
+
+		# Rows already due are left for the dispatcher; later ones are rebuilt
+		cutoff = now_datetime()
+		frappe.db.delete("Reminder Schedule", {
+			"reference_doctype": doctype,
+			"status": "Pending",
+			"due_at": [">", cutoff]
+		})
+
+		after = None
+		while True:
+			records = frappe.get_all(
+				doctype,
+				filters=dict(filters, name=[">", after]) if after else filters,
+				fields=fields,
+				order_by="name asc",
+				limit=chunk_size
+			)
+			if not records:
+				break
+
+			insert_schedule_rows([
+				row
+				for record in records
+				for row in SCHEDULE_BUILDERS[doctype](record)
+				if row.due_at > cutoff
+			])
+
+			after = records[-1].name
+			if commit:
+				frappe.db.commit()
+
+	if not doctypes:
+		sync_tax_deadline_schedule()
+
+	if commit:
+		frappe.db.commit()
+
+
+def get_due_schedule_rows(until=None, limit=500, lock=False):
+	"""
+	Pending rows due at or before `until`, oldest first
+
+	Rows of the same client due at the same time are kept next to each other,
+	so reminders that are sent together land in the same chunk.
+
+	Args:
+		until: Datetime rows must be due by (defaults to now)
+		limit: Maximum rows returned (None for all)
+		lock: Lock the returned rows until the transaction ends, skipping rows
+			another dispatcher has locked, so no row is claimed twice
+	"""
+	return frappe.db.sql(f"""
+		SELECT name, reference_doctype, reference_name, template_type, reminder_offset, due_at, client
+		FROM `tabReminder Schedule`
+		WHERE status = 'Pending' AND due_at <= %(until)s
+		ORDER BY due_at ASC, client ASC, name ASC
+		{"LIMIT %(limit)s" if limit else ""}
+		{"FOR UPDATE SKIP LOCKED" if lock else ""}
+	""", {"until": until or now_datetime(), "limit": limit}, as_dict=True)
+
+
+def mark_schedule_rows(names, status):
+	if not names:
+		return
+
+	frappe.db.sql("""
+		UPDATE `tabReminder Schedule`
+		SET status = %s, sent_at = %s
+		WHERE name IN %s
+	""", (status, now() if status == "Sent" else None, tuple(names)))
+
+
+def mark_missed_reminders():
+	"""Give up on pending rows past their expiry (e.g. after downtime)"""
+	current = now_datetime()
+
+	frappe.db.sql("""
+		UPDATE `tabReminder Schedule`
+		SET status = 'Missed'
+		WHERE status = 'Pending' AND due_at < %(now)s AND expires_at < %(now)s
+	""", {"now": current})
@@ -6,316 +6,454 @@ Reminder Scheduler Service
 Automated reminders for invoices, payments, appointments, and tax deadlines
 """
 
+import hashlib
+import json
+
 import frappe
-from frappe.utils import today, add_days, getdate, add_months
-from datetime import datetime, timedelta
+from frappe.utils import today, add_days, getdate, add_months, now_datetime
 
+from microsaas.microsaas.services.notification_digest import digest_window
+from microsaas.microsaas.services.reminder_runs import start_run, execute_run, get_resumable_runs
+from microsaas.microsaas.services.reminder_schedule import (
+	TAX_DEADLINES,
+	OPEN_INVOICE_STATUSES,
+	get_due_schedule_rows,
+	mark_schedule_rows,
+	mark_missed_reminders
+)
 
-def send_invoice_reminders():
-	"""Send invoice payment reminders based on due dates"""
-	try:
-		# Get all unpaid and overdue invoices
-		invoices = frappe.get_all(
-			"CA Invoice",
-			filters={
-				"status": ["in", ["Unpaid", "Partially Paid", "Overdue"]],
-				"docstatus": 1
-			},
-			fields=["name", "client", "client_name", "total_amount", "due_date", "status"]
-		)
-		
-		for invoice_data in invoices:
-			invoice = frappe.get_doc("CA Invoice", invoice_data.name)
-			days_until_due = (getdate(invoice.due_date) - getdate(today())).days
-			
-			# Send reminder based on schedule
-			if days_until_due == 3:
-				# 3 days before due date
-				send_reminder(invoice, "payment_reminder", days_until_due)
-			elif days_until_due == 0:
-				# On due date
-				send_reminder(invoice, "payment_reminder", days_until_due)
-			elif days_until_due < 0:
-				# Overdue
-				days_overdue = abs(days_until_due)
-				if days_overdue in [3, 7, 14, 30]:  # Send on specific overdue days
-					send_reminder(invoice, "payment_overdue", days_overdue)
-		
-		frappe.db.commit()
-		
-	except Exception as e:
-		frappe.log_error(f"Error sending invoice reminders: {str(e)}", "Invoice Reminder Error")
+
+# Due Reminder Schedule rows handled per committed chunk
+REMINDER_DISPATCH_BATCH_SIZE = 500
+
+# Clients messaged per committed chunk of a tax deadline run
+TAX_DEADLINE_BATCH_SIZE = 500
+
+RECURRING_FREQUENCY_MONTHS = {
+	"Monthly": 1,
+	"Quarterly": 3,
+	"Half-Yearly": 6,
+	"Annual": 12
+}
+
+PAYMENT_TERM_DAYS = {
+	"Net 15": 15,
+	"Net 30": 30,
+	"Net 45": 45,
+	"Net 60": 60
+}
 
 
-def send_reminder(invoice, template_type, days):
-	"""Send reminder notification"""
+def dispatch_due_reminders(until=None):
+	"""
+	Send every scheduled reminder that has come due (scheduler)
+	
+	Runs every minute. Rows are claimed with a row lock in due order and
+	marked Sent or Cancelled in the same transaction that queues their
+	messages, one committed chunk at a time, so a row is sent at most once
+	even if two dispatchers overlap.
+	
+	Args:
+		until: Send rows due up to this datetime (defaults to now)
+	"""
 	try:
-		from microsaas.microsaas.services.notification_service import send_notification
-		
-		# Prepare notification data
-		notification_data = {
-			"client_name": invoice.client_name,
-			"invoice_number": invoice.name,
-			"amount": invoice.total_amount,
-			"due_date": invoice.due_date,
-			"portal_link": invoice.portal_link,
-			"days_overdue": days if template_type == "payment_overdue" else 0,
-			"days_until_due": days if template_type == "payment_reminder" else 0
-		}
+		mark_missed_reminders()
+		frappe.db.commit()
 		
-		# Send notification
-		send_notification(
-			client=invoice.client,
-			template_type=template_type,
-			data=notification_data
-		)
+		with digest_window():
+			while True:
+				rows = get_due_schedule_rows(until or now_datetime(), REMINDER_DISPATCH_BATCH_SIZE, lock=True)
+				if not rows:
+					break
+				
+				dispatch_schedule_rows(rows)
+				frappe.db.commit()
 		
 	except Exception as e:
-		frappe.log_error(f"Error sending reminder for invoice {invoice.name}: {str(e)}")
+		frappe.db.rollback()
+		frappe.log_error(f"Error dispatching reminders: {str(e)}", "Reminder Dispatch Error")
 
 
-def send_appointment_reminders():
-	"""Send appointment reminders 24 hours and 1 hour before"""
-	try:
-		# Get appointments scheduled for tomorrow (24 hour reminder)
-		tomorrow = add_days(today(), 1)
-		appointments_tomorrow = frappe.get_all(
-			"CA Appointment",
-			filters={
-				"appointment_date": tomorrow,
-				"status": "Scheduled"
-			},
-			fields=["name", "client", "appointment_date", "appointment_time", "assigned_ca"]
-		)
-		
-		for apt in appointments_tomorrow:
-			send_appointment_reminder(apt, hours_before=24)
-		
-		# Get appointments in the next hour (1 hour reminder)
-		now = datetime.now()
-		one_hour_later = now + timedelta(hours=1)
-		
-		appointments_soon = frappe.get_all(
-			"CA Appointment",
-			filters={
-				"appointment_date": today(),
-				"status": "Scheduled"
-			},
-			fields=["name", "client", "appointment_date", "appointment_time", "assigned_ca"]
+def dispatch_schedule_rows(rows):
+	"""Send one chunk of due rows, grouped by source so each source is read with one query"""
+	from microsaas.microsaas.services.notification_service import send_bulk_notifications
+	
+	rows_by_doctype = {}
+	for row in rows:
+		rows_by_doctype.setdefault(row.reference_doctype, []).append(row)
+	
+	notifications = []
+	sent = []
+	cancelled = []
+	
+	for reference_doctype, doctype_rows in rows_by_doctype.items():
+		REMINDER_HANDLERS[reference_doctype](doctype_rows, notifications, sent, cancelled)
+	
+	send_bulk_notifications(notifications)
+	mark_schedule_rows(sent, "Sent")
+	mark_schedule_rows(cancelled, "Cancelled")
+
+
+def get_invoice_reminders(rows, notifications, sent, cancelled):
+	"""Build reminders for invoices that are still open"""
+	invoices = get_references("CA Invoice", rows, [
+		"name", "client", "client_name", "total_amount", "due_date", "status", "docstatus", "portal_link"
+	])
+	
+	for row in rows:
+		invoice = invoices.get(row.reference_name)
+		if not invoice or invoice.docstatus != 1 or invoice.status not in OPEN_INVOICE_STATUSES:
+			cancelled.append(row.name)
+			continue
+		
+		notifications.append((
+			invoice.client,
+			row.template_type,
+			get_reminder_data(invoice, row.template_type, abs(row.reminder_offset)),
+			f"CA Invoice:{invoice.name}",
+			get_ledger_offset(row)
+		))
+		sent.append(row.name)
+
+
+def get_appointment_reminders(rows, notifications, sent, cancelled):
+	"""Build reminders for appointments that are still scheduled"""
+	appointments = get_references("CA Appointment", rows, [
+		"name", "client", "client_name", "appointment_date", "appointment_time", "assigned_ca", "ca_name", "status"
+	])
+	
+	# Current client and CA names for the whole chunk, one query each
+	client_names = get_names("CA Client", "client_name", [a.client for a in appointments.values()])
+	ca_names = get_names("User", "full_name", [a.assigned_ca for a in appointments.values()])
+	
+	for row in rows:
+		appointment = appointments.get(row.reference_name)
+		if not appointment or appointment.status != "Scheduled":
+			cancelled.append(row.name)
+			continue
+		
+		notifications.append((appointment.client, row.template_type, {
+			"client_name": client_names.get(appointment.client) or appointment.client_name,
+			"appointment_date": appointment.appointment_date,
+			"appointment_time": appointment.appointment_time,
+			"ca_name": ca_names.get(appointment.assigned_ca) or appointment.ca_name,
+			"hours_before": -row.reminder_offset
+		}, f"CA Appointment:{appointment.name}", get_ledger_offset(row)))
+		sent.append(row.name)
+
+
+def get_document_reminders(rows, notifications, sent, cancelled):
+	"""
+	Build expiry reminders for documents that still have an expiry date
+	
+	Documents of the same client reaching a milestone together are listed
+	in one message instead of one message each. A client's documents can be
+	split across two chunks, so each notice is recorded in the ledger under
+	the documents it lists rather than only the client and date.
+	"""
+	documents = get_references("CA Document", rows, [
+		"name", "client", "document_name", "expiry_date"
+	])
+	client_names = get_names("CA Client", "client_name", [d.client for d in documents.values()])
+	
+	notices = {}
+	for row in rows:
+		document = documents.get(row.reference_name)
+		if not document or not document.expiry_date:
+			cancelled.append(row.name)
+			continue
+		
+		notices.setdefault((document.client, getdate(row.due_at)), []).append(document)
+		sent.append(row.name)
+	
+	for (client, notice_date), client_documents in notices.items():
+		client_documents.sort(key=lambda d: (getdate(d.expiry_date), d.document_name or d.name))
+		expiring = [
+			{
+				"document_name": d.document_name,
+				"expiry_date": d.expiry_date,
+				"days_until_expiry": (getdate(d.expiry_date) - getdate(today())).days
+			}
+			for d in client_documents
+		]
+		
+		notifications.append((client, "document_expiry", {
+			"client_name": client_names.get(client),
+			"document_name": ", ".join(d["document_name"] or "" for d in expiring),
+			"expiry_date": expiring[0]["expiry_date"],
+			"days_until_expiry": expiring[0]["days_until_expiry"],
+			"documents": expiring,
+			"document_count": len(expiring)
+		}, get_document_notice_reference(client_documents), notice_date))
+
+
+def get_tax_deadline_reminders(rows, notifications, sent, cancelled):
+	"""Queue the client-wide run for each due tax deadline"""
+	for row in rows:
+		deadline_date = row.reference_name
+		
+		# Runs commit per chunk, so they start once this chunk's claim has committed
+		frappe.enqueue(
+			"microsaas.microsaas.services.reminder_scheduler.send_tax_deadline_reminder",
+			queue="long",
+			job_id=f"tax_deadline::{deadline_date}:{row.reminder_offset}",
+			deduplicate=True,
+			enqueue_after_commit=True,
+			deadline_name=TAX_DEADLINES.get(deadline_date),
+			deadline_date=deadline_date,
+			days_until=-row.reminder_offset
 		)
-		
-		for apt in appointments_soon:
-			# Check if appointment is within next hour
-			apt_datetime = datetime.combine(getdate(apt.appointment_date), apt.appointment_time)
-			if now < apt_datetime <= one_hour_later:
-				send_appointment_reminder(apt, hours_before=1)
-		
-		frappe.db.commit()
-		
-	except Exception as e:
-		frappe.log_error(f"Error sending appointment reminders: {str(e)}", "Appointment Reminder Error")
+		sent.append(row.name)
 
 
-def send_appointment_reminder(appointment, hours_before):
-	"""Send appointment reminder notification"""
-	try:
-		from microsaas.microsaas.services.notification_service import send_notification
-		
-		apt_doc = frappe.get_doc("CA Appointment", appointment.name)
-		ca_name = frappe.db.get_value("User", apt_doc.assigned_ca, "full_name")
-		
-		notification_data = {
-			"client_name": frappe.db.get_value("CA Client", apt_doc.client, "client_name"),
-			"appointment_date": apt_doc.appointment_date,
-			"appointment_time": apt_doc.appointment_time,
-			"ca_name": ca_name,
-			"hours_before": hours_before
-		}
-		
-		send_notification(
-			client=apt_doc.client,
-			template_type="appointment_reminder",
-			data=notification_data
+def get_references(doctype, rows, fields):
+	"""Load the source records of a chunk of schedule rows with one query"""
+	return {
+		record.name: record for record in frappe.get_all(
+			doctype,
+			filters={"name": ["in", list({row.reference_name for row in rows})]},
+			fields=fields
 		)
-		
-	except Exception as e:
-		frappe.log_error(f"Error sending appointment reminder: {str(e)}")
+	}
 
 
-def check_tax_deadlines():
-	"""Check and send tax deadline reminders"""
-	try:
-		# Indian tax deadlines (customize as needed)
-		tax_deadlines = {
-			"2026-07-31": "ITR Filing Deadline for Individuals",
-			"2026-10-31": "ITR Filing Deadline for Audit Cases",
-			"2026-03-31": "Financial Year End",
-			"2026-06-15": "Advance Tax Q1",
-			"2026-09-15": "Advance Tax Q2",
-			"2026-12-15": "Advance Tax Q3",
-			"2026-03-15": "Advance Tax Q4"
-		}
-		
-		# Send reminders 7 days and 1 day before deadline
-		for deadline_date, deadline_name in tax_deadlines.items():
-			days_until = (getdate(deadline_date) - getdate(today())).days
-			
-			if days_until in [7, 1]:
-				send_tax_deadline_reminder(deadline_name, deadline_date, days_until)
-		
-		frappe.db.commit()
-		
-	except Exception as e:
-		frappe.log_error(f"Error checking tax deadlines: {str(e)}", "Tax Deadline Error")
+def get_document_notice_reference(documents):
+	"""Notification Ledger reference for one expiry notice: a hash of the sorted document names"""
+	names = ",".join(sorted(d.name for d in documents))
+	return f"CA Document:{hashlib.sha1(names.encode()).hexdigest()}"
+
+
+def get_ledger_offset(row):
+	"""Notification Ledger offset for a schedule row: the offset and the time it was due"""
+	return f"{row.reminder_offset}@{row.due_at}"
+
+
+def get_names(doctype, fieldname, names):
+	"""Map record names to one field's value with a single query"""
+	names = list({name for name in names if name})
+	if not names:
+		return {}
+	
+	return dict(frappe.get_all(doctype, filters={"name": ["in", names]}, fields=["name", fieldname], as_list=True))
+
+
+REMINDER_HANDLERS = {
+	"CA Invoice": get_invoice_reminders,
+	"CA Appointment": get_appointment_reminders,
+	"CA Document": get_document_reminders,
+	"Tax Deadline": get_tax_deadline_reminders
+}
+
+
+def get_reminder_data(invoice, template_type, days):
+	"""Prepare template variables for an invoice reminder"""
+	return {
+		"client_name": invoice.client_name,
+		"invoice_number": invoice.name,
+		"amount": invoice.total_amount,
+		"due_date": invoice.due_date,
+		"portal_link": invoice.portal_link,
+		"days_overdue": days if template_type == "payment_overdue" else 0,
+		"days_until_due": days if template_type == "payment_reminder" else 0
+	}
 
 
 def send_tax_deadline_reminder(deadline_name, deadline_date, days_until):
 	"""Send tax deadline reminder to all active clients"""
 	try:
-		from microsaas.microsaas.services.notification_service import send_notification
-		
-		# Get all active clients
-		clients = frappe.get_all(
-			"CA Client",
-			filters={"status": "Active"},
-			fields=["name", "client_name"]
-		)
-		
-		for client in clients:
-			notification_data = {
-				"client_name": client.client_name,
+		run = start_run(
+			"Tax Deadline",
+			f"Tax Deadline:{deadline_date}:{days_until}",
+			parameters={
 				"deadline_name": deadline_name,
 				"deadline_date": deadline_date,
 				"days_until": days_until
-			}
-			
-			send_notification(
-				client=client.name,
-				template_type="tax_deadline",
-				data=notification_data
-			)
+			},
+			total=frappe.db.count("CA Client", {"status": "Active"})
+		)
+		run_tax_deadline_reminders(run)
 		
 	except Exception as e:
 		frappe.log_error(f"Error sending tax deadline reminder: {str(e)}")
 
 
-def check_document_expiry():
-	"""Check for expiring documents and send reminders"""
-	try:
-		# Get documents expiring in 30 days
-		expiry_date = add_days(today(), 30)
-		
-		documents = frappe.get_all(
-			"CA Document",
-			filters={
-				"expiry_date": ["<=", expiry_date],
-				"expiry_date": [">=", today()]
-			},
-			fields=["name", "client", "document_name", "expiry_date"]
+def run_tax_deadline_reminders(run):
+	"""Send a run's tax deadline reminders in committed chunks, resuming from its cursor"""
+	from microsaas.microsaas.services.notification_service import send_bulk_notifications
+	
+	parameters = json.loads(run.parameters)
+	
+	def fetch_chunk(after, limit):
+		filters = {"status": "Active"}
+		if after:
+			filters["name"] = [">", after]
+		
+		return frappe.get_all(
+			"CA Client",
+			filters=filters,
+			fields=["name", "client_name"],
+			order_by="name asc",
+			limit=limit
 		)
-		
-		for doc in documents:
-			send_document_expiry_reminder(doc)
-		
-		frappe.db.commit()
-		
-	except Exception as e:
-		frappe.log_error(f"Error checking document expiry: {str(e)}", "Document Expiry Error")
+	
+	def dispatch(clients):
+		send_bulk_notifications([
+			(client.name, "tax_deadline", {
+				"client_name": client.client_name,
+				"deadline_name": parameters["deadline_name"],
+				"deadline_date": parameters["deadline_date"],
+				"days_until": parameters["days_until"]
+			}, f"Tax Deadline:{parameters['deadline_date']}", parameters["days_until"])
+			for client in clients
+		])
+	
+	with digest_window():
+		execute_run(run, fetch_chunk, dispatch, chunk_size=TAX_DEADLINE_BATCH_SIZE)
 
 
-def send_document_expiry_reminder(document):
-	"""Send document expiry reminder"""
-	try:
-		from microsaas.microsaas.services.notification_service import send_notification
-		
-		days_until_expiry = (getdate(document.expiry_date) - getdate(today())).days
-		
-		notification_data = {
-			"client_name": frappe.db.get_value("CA Client", document.client, "client_name"),
-			"document_name": document.document_name,
-			"expiry_date": document.expiry_date,
-			"days_until_expiry": days_until_expiry
-		}
-		
-		send_notification(
-			client=document.client,
-			template_type="document_expiry",
-			data=notification_data
-		)
-		
-	except Exception as e:
-		frappe.log_error(f"Error sending document expiry reminder: {str(e)}")
+# Handler for each Reminder Run type, used to resume interrupted runs
+REMINDER_RUN_HANDLERS = {
+	"Tax Deadline": run_tax_deadline_reminders
+}
+
+
+def resume_reminder_runs():
+	"""Resume today's reminder runs that failed or were interrupted (scheduler)"""
+	for row in get_resumable_runs():
+		try:
+			REMINDER_RUN_HANDLERS[row.run_type](frappe.get_doc("Reminder Run", row.name))
+		except Exception as e:
+			frappe.log_error(f"Error resuming reminder run {row.name}: {str(e)}", "Reminder Run Error")
 
 
 def generate_recurring_invoices():
-	"""Generate recurring invoices based on schedule"""
+	"""Start one recurring invoice job per firm with templates due today (cron)"""
 	try:
-		# Get all recurring invoices due for generation
-		invoices = frappe.get_all(
-			"CA Invoice",
-			filters={
-				"is_recurring": 1,
-				"next_generation_date": ["<=", today()],
-				"docstatus": 1
-			},
-			fields=["name", "client", "frequency", "next_generation_date", "end_date"]
-		)
-		
-		for invoice_data in invoices:
-			# Check if recurring should continue
-			if invoice_data.end_date and getdate(invoice_data.end_date) < getdate(today()):
-				continue
-			
-			# Generate new invoice
-			generate_new_invoice(invoice_data.name)
-		
-		frappe.db.commit()
+		firms = frappe.db.sql_list("""
+			SELECT DISTINCT firm
+			FROM `tabCA Invoice`
+			WHERE is_recurring = 1 AND docstatus = 1 AND next_generation_date <= %s
+		""", today())
+		
+		for firm in firms:
+			frappe.enqueue(
+				"microsaas.microsaas.services.reminder_scheduler.generate_recurring_invoices_for_firm",
+				queue="long",
+				job_id=f"recurring_invoices::{firm}",
+				deduplicate=True,
+				firm=firm
+			)
 		
 	except Exception as e:
 		frappe.log_error(f"Error generating recurring invoices: {str(e)}", "Recurring Invoice Error")
 
 
+def generate_recurring_invoices_for_firm(firm):
+	"""
+	Generate the due recurring invoices of one firm
+	
+	Each template is handled in its own transaction, and notifications for
+	the new invoices are queued once the whole batch has committed.
+	
+	Args:
+		firm: CA Firm name
+	"""
+	templates = frappe.get_all(
+		"CA Invoice",
+		filters={
+			"firm": firm,
+			"is_recurring": 1,
+			"next_generation_date": ["<=", today()],
+			"docstatus": 1
+		},
+		pluck="name"
+	)
+	
+	generated = []
+	
+	for template in templates:
+		try:
+			new_invoice = generate_new_invoice(template)
+			frappe.db.commit()
+			
+			if new_invoice and new_invoice.auto_send_on_creation:
+				generated.append(new_invoice.name)
+			
+		except Exception as e:
+			frappe.db.rollback()
+			frappe.log_error(f"Error generating new invoice from {template}: {str(e)}", "Recurring Invoice Error")
+	
+	for invoice_name in generated:
+		frappe.enqueue(
+			"microsaas.microsaas.doctype.ca_invoice.ca_invoice.send_invoice_notification",
+			queue="default",
+			job_id=f"invoice_notification::{invoice_name}",
+			deduplicate=True,
+			invoice_name=invoice_name
+		)
+
+
 def generate_new_invoice(original_invoice_name):
-	"""Generate new invoice from recurring template"""
-	try:
+	"""
+	Generate the invoice for a recurring template's current period
+	
+	The new invoice carries a template:period recurrence key (unique), so a
+	retried run finds the invoice it already made instead of billing twice.
+	The caller commits; notifications are left to the caller.
+	
+	Args:
+		original_invoice_name: Recurring template CA Invoice name
+	
+	Returns:
+		The new CA Invoice, or None if nothing was due
+	"""
+	# Lock the template so two runs never generate the same period
+	template = frappe.db.get_value(
+		"CA Invoice",
+		original_invoice_name,
+		["is_recurring", "frequency", "next_generation_date", "end_date"],
+		as_dict=True,
+		for_update=True
+	)
+	
+	if not template.is_recurring or getdate(template.next_generation_date) > getdate(today()):
+		return None
+	
+	if template.end_date and getdate(template.end_date) < getdate(today()):
+		return None
+	
+	recurrence_key = f"{original_invoice_name}:{template.next_generation_date}"
+	new_invoice = None
+	
+	if not frappe.db.exists("CA Invoice", {"recurrence_key": recurrence_key}):
 		original = frappe.get_doc("CA Invoice", original_invoice_name)
 		
-		# Create new invoice
 		new_invoice = frappe.copy_doc(original)
 		new_invoice.invoice_date = today()
-		
-		# Calculate new due date based on payment terms
-		if original.payment_terms == "Net 15":
-			new_invoice.due_date = add_days(today(), 15)
-		elif original.payment_terms == "Net 30":
-			new_invoice.due_date = add_days(today(), 30)
-		elif original.payment_terms == "Net 45":
-			new_invoice.due_date = add_days(today(), 45)
-		elif original.payment_terms == "Net 60":
-			new_invoice.due_date = add_days(today(), 60)
-		else:
-			new_invoice.due_date = today()
+		new_invoice.due_date = add_days(today(), PAYMENT_TERM_DAYS.get(original.payment_terms, 0))
 		
 		new_invoice.status = "Unpaid"
 		new_invoice.payment_gateway_reference = None
 		new_invoice.portal_link = None
 		
+		# The copy is a plain invoice; only the template recurs
+		new_invoice.is_recurring = 0
+		new_invoice.frequency = None
+		new_invoice.next_generation_date = None
+		new_invoice.end_date = None
+		new_invoice.recurring_template = original_invoice_name
+		new_invoice.recurrence_key = recurrence_key
+		
+		new_invoice.flags.defer_notification = True
 		new_invoice.insert(ignore_permissions=True)
 		new_invoice.submit()
-		
-		# Update original invoice's next generation date
-		if original.frequency == "Monthly":
-			original.next_generation_date = add_months(original.next_generation_date, 1)
-		elif original.frequency == "Quarterly":
-			original.next_generation_date = add_months(original.next_generation_date, 3)
-		elif original.frequency == "Half-Yearly":
-			original.next_generation_date = add_months(original.next_generation_date, 6)
-		elif original.frequency == "Annual":
-			original.next_generation_date = add_months(original.next_generation_date, 12)
-		
-		original.save(ignore_permissions=True)
-		
-		frappe.msgprint(f"Generated new invoice {new_invoice.name} from recurring template")
-		
-	except Exception as e:
-		frappe.log_error(f"Error generating new invoice from {original_invoice_name}: {str(e)}")
+	
+	# Advance the template in the same transaction as the insert
+	frappe.db.set_value(
+		"CA Invoice",
+		original_invoice_name,
+		"next_generation_date",
+		add_months(template.next_generation_date, RECURRING_FREQUENCY_MONTHS.get(template.frequency, 1))
+	)
+	
+	return new_invoice
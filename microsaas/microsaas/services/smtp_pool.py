@@ -0,0 +1,155 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+SMTP Connection Pool
+Keeps one authenticated SMTP session per server in each worker process, so
+a drain job sends its whole backlog over a single connection instead of
+connecting and logging in for every email.
+
+Sessions idle for a while are checked with NOOP before reuse, recycled after
+SMTP_MAX_MESSAGES_PER_SESSION messages, and reconnected once if the server
+dropped them.
+"""
+
+import smtplib
+import threading
+import time
+
+import frappe
+from frappe.utils import cint
+
+
+# Seconds a session may sit idle before it is checked with NOOP
+SMTP_IDLE_SECONDS = 60
+
+# Messages sent over one session before it is replaced
+SMTP_MAX_MESSAGES_PER_SESSION = 500
+
+SMTP_TIMEOUT = 30
+
+
+class SMTPConnectionPool:
+	"""Per-process SMTP sessions keyed by server, port and login"""
+
+	def __init__(self):
+		self.sessions = {}
+		self.lock = threading.Lock()
+
+	def send(self, settings, message):
+		"""
+		Send an email.message.EmailMessage over a pooled session
+
+		Args:
+			settings: Dict from get_smtp_settings
+			message: EmailMessage with From, To and Subject set
+		"""
+		key = (settings["host"], cint(settings["port"]), settings.get("login"))
+
+		with self.lock:
+			try:
+				self.get_session(key, settings).send_message(message)
+			except (smtplib.SMTPServerDisconnected, ConnectionError):
+				# The server closed an idle session; retry once on a fresh one
+				self.close(key)
+				self.get_session(key, settings).send_message(message)
+
+			entry = self.sessions[key]
+			entry["sent"] += 1
+			entry["last_used"] = time.monotonic()
+
+			if entry["sent"] >= SMTP_MAX_MESSAGES_PER_SESSION:
+				self.close(key)
+
+	def get_session(self, key, settings):
+		entry = self.sessions.get(key)
+
+		if entry and time.monotonic() - entry["last_used"] > SMTP_IDLE_SECONDS:
+			try:
+				if entry["session"].noop()[0] != 250:
+					raise smtplib.SMTPServerDisconnected("NOOP failed")
+			except (smtplib.SMTPException, ConnectionError, OSError):
+				self.close(key)
+				entry = None
+
+		if not entry:
+			entry = self.sessions[key] = {
+				"session": connect(settings),
+				"sent": 0,
+				"last_used": time.monotonic()
+			}
+
+		return entry["session"]
+
+	def close(self, key):
+		entry = self.sessions.pop(key, None)
+		if not entry:
+			return
+
+		try:
+			entry["session"].quit()
+		except Exception:
+			# Already gone; nothing to clean up
+			pass
+
+	def close_all(self):
+		with self.lock:
+			for key in list(self.sessions):
+				self.close(key)
+
+
+smtp_pool = SMTPConnectionPool()
+
+
+def connect(settings):
+	"""Open and authenticate an SMTP session"""
+	port = cint(settings["port"])
+
+	if settings.get("use_ssl"):
+		session = smtplib.SMTP_SSL(settings["host"], port or 465, timeout=SMTP_TIMEOUT)
+	else:
+		session = smtplib.SMTP(settings["host"], port or 25, timeout=SMTP_TIMEOUT)
+		if settings.get("use_tls"):
+			session.ehlo()
+			session.starttls()
+
+	session.ehlo()
+
+	if settings.get("login") and settings.get("password"):
+		session.login(settings["login"], settings["password"])
+
+	return session
+
+
+def get_smtp_settings():
+	"""
+	Resolve the SMTP server for queued email (cached per job)
+
+	Site config `microsaas_smtp_server` ({"host", "port", "use_tls", "use_ssl",
+	"login", "password", "sender"}) takes precedence, e.g. to point at a local
+	SMTP sink. Otherwise the default outgoing Email Account is used.
+
+	Returns:
+		Dict with host, port, use_tls, use_ssl, login, password and sender
+	"""
+	if getattr(frappe.local, "microsaas_smtp_settings", None):
+		return frappe.local.microsaas_smtp_settings
+
+	settings = frappe.conf.get("microsaas_smtp_server")
+
+	if not settings:
+		from frappe.email.doctype.email_account.email_account import EmailAccount
+
+		account = EmailAccount.find_outgoing(_raise_error=True)
+		settings = {
+			"host": account.smtp_server,
+			"port": account.smtp_port,
+			"use_tls": cint(account.use_tls),
+			"use_ssl": cint(account.use_ssl_for_outgoing),
+			"login": None if account.no_smtp_authentication else (account.login_id or account.email_id),
+			"password": None if account.no_smtp_authentication else account.get_password(raise_exception=False),
+			"sender": account.default_sender or account.email_id
+		}
+
+	frappe.local.microsaas_smtp_settings = settings
+	return settings
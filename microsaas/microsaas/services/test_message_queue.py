@@ -0,0 +1,184 @@
+# Copyright (c) 2026, India100x pvt. ltd. and Contributors
+# See license.txt
+
+import json
+import time
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from microsaas.microsaas.services import message_queue
+from microsaas.microsaas.services.message_queue import (
+	LANES_KEY,
+	drain_lane,
+	enqueue_message,
+	get_queue_metrics,
+	log_journal_key,
+	metrics_key,
+	pending_key,
+	processing_key,
+	push_message,
+	recover_processing,
+	retry_key,
+	slots_key
+)
+from microsaas.microsaas.services.notification_service import NOTIFICATION_LOG_SPOOL_KEY
+
+
+CHANNEL = "whatsapp"
+
+
+class TestMessageQueue(FrappeTestCase):
+	def setUp(self):
+		self.lane = f"_test_lane_{frappe.generate_hash(length=6)}"
+		self.client = f"_Test Queue Client {frappe.generate_hash(length=6)}"
+
+		# Deliver through the stub transport and drain in the test instead of in workers
+		self.conf = patch.dict(frappe.conf, {
+			"microsaas_whatsapp_transport": "microsaas.microsaas.services.message_queue.stub_transport",
+			"microsaas_stub_transport_failures": 0
+		})
+		self.conf.start()
+		self.drain_jobs = patch.object(message_queue, "start_drain_jobs")
+		self.drain_jobs.start()
+
+	def tearDown(self):
+		self.drain_jobs.stop()
+		self.conf.stop()
+
+		cache = frappe.cache()
+		cache.delete(*[
+			cache.make_key(key) for key in (
+				pending_key(CHANNEL, self.lane),
+				processing_key(CHANNEL, self.lane, 0),
+				log_journal_key(CHANNEL, self.lane, 0),
+				retry_key(CHANNEL, self.lane),
+				metrics_key(CHANNEL, self.lane),
+				slots_key(CHANNEL, self.lane),
+				self.stub_key
+			)
+		])
+		cache.srem(LANES_KEY, json.dumps([CHANNEL, self.lane]))
+
+	@property
+	def stub_key(self):
+		return f"microsaas:outbox_stub:{CHANNEL}:{self.lane}"
+
+	def enqueue(self, text, **kwargs):
+		message_id = enqueue_message(
+			CHANNEL, self.lane,
+			payload={"instance_id": self.lane, "number": "919800000000", "message": text},
+			client=self.client,
+			log_message=text,
+			**kwargs
+		)
+		# Messages are pushed once the transaction commits
+		frappe.db.after_commit.run()
+		return message_id
+
+	def get_retries(self):
+		cache = frappe.cache()
+		return [
+			(json.loads(raw), score)
+			for raw, score in cache.zrange(cache.make_key(retry_key(CHANNEL, self.lane)), 0, -1, withscores=True)
+		]
+
+	def expire_backoff(self):
+		cache = frappe.cache()
+		key = cache.make_key(retry_key(CHANNEL, self.lane))
+		for raw in cache.zrange(key, 0, -1):
+			cache.zadd(key, {raw: 0})
+
+	def get_metrics(self):
+		return next(row for row in get_queue_metrics() if row["lane"] == self.lane)
+
+	def get_logs(self):
+		return frappe.get_all(
+			"CA Notification Log",
+			filters={"client": self.client},
+			fields=["status", "message"],
+			order_by="message"
+		)
+
+	def test_enqueued_messages_are_delivered_in_order(self):
+		for number in range(3):
+			self.enqueue(f"Message {number}")
+
+		drain_lane(CHANNEL, self.lane, rate_limit=0)
+
+		delivered = [json.loads(raw) for raw in frappe.cache().lrange(self.stub_key, 0, -1)]
+		self.assertEqual([message["payload"]["message"] for message in delivered], ["Message 0", "Message 1", "Message 2"])
+		self.assertEqual(frappe.cache().llen(pending_key(CHANNEL, self.lane)), 0)
+		self.assertEqual(frappe.cache().llen(processing_key(CHANNEL, self.lane, 0)), 0)
+		self.assertEqual([log.status for log in self.get_logs()], ["Sent", "Sent", "Sent"])
+
+	def test_failing_send_backs_off_then_gives_up(self):
+		frappe.conf["microsaas_stub_transport_failures"] = 10
+		self.enqueue("Bounces", max_attempts=3, retry_delay=10)
+
+		for attempt, delay in ((1, 10), (2, 20)):
+			started = time.time()
+			drain_lane(CHANNEL, self.lane, rate_limit=0)
+
+			# Parked with exponential backoff plus up to 10% jitter
+			(message, due), = self.get_retries()
+			self.assertEqual(message["attempts"], attempt)
+			self.assertGreaterEqual(due - started, delay)
+			self.assertLessEqual(due - time.time(), delay * 1.1)
+
+			self.expire_backoff()
+
+		drain_lane(CHANNEL, self.lane, rate_limit=0)
+
+		self.assertEqual(self.get_retries(), [])
+		self.assertEqual(frappe.cache().llen(self.stub_key), 0)
+		self.assertEqual([log.status for log in self.get_logs()], ["Failed"])
+
+		metrics = self.get_metrics()
+		self.assertEqual((metrics["retried"], metrics["failed"], metrics["sent"]), (2, 1, 0))
+
+	def test_recover_processing_returns_messages_of_dead_slot(self):
+		cache = frappe.cache()
+		self.enqueue("Queued")
+
+		# A drain job died after taking one message and delivering another
+		held = {"id": "held", "channel": CHANNEL, "lane": self.lane, "attempts": 0}
+		cache.rpush(processing_key(CHANNEL, self.lane, 0), json.dumps(held))
+		log_row = [frappe.generate_hash(length=10), self.client, None, "WhatsApp", "Sent", "Journaled", None]
+		cache.rpush(log_journal_key(CHANNEL, self.lane, 0), json.dumps(log_row))
+
+		recover_processing(CHANNEL, self.lane, 0)
+
+		pending = [json.loads(raw)["id"] for raw in cache.lrange(pending_key(CHANNEL, self.lane), 0, -1)]
+		self.assertEqual(pending[0], "held")
+		self.assertEqual(len(pending), 2)
+		self.assertEqual(cache.llen(processing_key(CHANNEL, self.lane, 0)), 0)
+
+		spooled = [json.loads(raw) for raw in cache.lrange(NOTIFICATION_LOG_SPOOL_KEY, 0, -1)]
+		self.assertIn(log_row, spooled)
+		cache.lrem(cache.make_key(NOTIFICATION_LOG_SPOOL_KEY), 1, json.dumps(log_row))
+
+	def test_queue_metrics_report_depth_and_latency(self):
+		for number in range(3):
+			push_message({
+				"id": f"metric-{number}",
+				"channel": CHANNEL,
+				"lane": self.lane,
+				"payload": {},
+				"attempts": 0,
+				"max_attempts": 1,
+				"enqueued_at": time.time() - 2
+			})
+
+		self.assertEqual(self.get_metrics()["pending"], 3)
+
+		# Deliver two of the three
+		with patch.object(message_queue, "DRAIN_BATCH_SIZE", 2):
+			message_queue.drain_batch(CHANNEL, self.lane, 0, 0, time.monotonic() + 60)
+
+		metrics = self.get_metrics()
+		self.assertEqual(metrics["pending"], 1)
+		self.assertEqual(metrics["sent"], 2)
+		self.assertGreaterEqual(metrics["avg_latency_ms"], 2000)
+		self.assertLess(metrics["avg_latency_ms"], 60000)
@@ -0,0 +1,80 @@
+# Copyright (c) 2026, India100x pvt. ltd. and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from microsaas.microsaas.services import notification_digest
+from microsaas.microsaas.services.notification_digest import (
+	DIGEST_CLIENTS_KEY,
+	DIGEST_PROCESSING_KEY,
+	buffer_key,
+	flush_digests,
+	pop_entries,
+	processing_key,
+	push_entry
+)
+
+
+class TestNotificationDigest(FrappeTestCase):
+	def setUp(self):
+		self.client = f"_Test Digest Client {frappe.generate_hash(length=6)}"
+		self.firm = frappe._dict(name="_Test Digest Firm", whatsapp_concurrency=1, whatsapp_rate_limit=0)
+		self.template = frappe._dict(
+			name="_Test Daily Digest",
+			render=lambda data: f"{data['count']} reminders:\n\n{data['messages']}"
+		)
+
+		for number, template_type in enumerate(("payment_reminder", "document_expiry")):
+			push_entry({
+				"id": f"entry-{number}",
+				"client": self.client,
+				"client_name": "Digest Client",
+				"firm": self.firm.name,
+				"number": "919800000000",
+				"instance": "_test_instance",
+				"template": f"_Test {template_type}",
+				"template_type": template_type,
+				"message": f"Reminder {number}"
+			})
+
+	def tearDown(self):
+		cache = frappe.cache()
+		cache.delete(cache.make_key(buffer_key(self.client)), cache.make_key(processing_key(self.client)))
+		cache.zrem(cache.make_key(DIGEST_CLIENTS_KEY), self.client)
+		cache.zrem(cache.make_key(DIGEST_PROCESSING_KEY), self.client)
+
+	def list_length(self, key):
+		return frappe.cache().llen(key)
+
+	def flush(self, enqueue_message):
+		with (
+			patch("microsaas.microsaas.services.notification_service.get_firm", return_value=self.firm),
+			patch("microsaas.microsaas.services.notification_service.get_template", return_value=self.template),
+			patch.object(notification_digest, "enqueue_message", enqueue_message)
+		):
+			return flush_digests(force=True)
+
+	def test_buffered_entries_are_sent_as_one_message(self):
+		with patch.object(notification_digest, "enqueue_message") as enqueue_message:
+			self.flush(enqueue_message)
+
+		client_calls = [call for call in enqueue_message.call_args_list if call.kwargs["client"] == self.client]
+		self.assertEqual(len(client_calls), 1)
+		self.assertIn("Reminder 0", client_calls[0].kwargs["log_message"])
+		self.assertIn("Reminder 1", client_calls[0].kwargs["log_message"])
+
+		# Nothing is left in the buffer or held for processing
+		self.assertEqual(self.list_length(buffer_key(self.client)), 0)
+		self.assertEqual(self.list_length(processing_key(self.client)), 0)
+
+	def test_failed_send_returns_entries_to_buffer(self):
+		def fail(*args, **kwargs):
+			raise Exception("Queue unavailable")
+
+		self.flush(fail)
+
+		self.assertEqual(self.list_length(processing_key(self.client)), 0)
+		self.assertEqual([entry["id"] for entry in pop_entries(self.client)], ["entry-0", "entry-1"])
@@ -0,0 +1,85 @@
+# Copyright (c) 2026, India100x pvt. ltd. and Contributors
+# See license.txt
+
+import json
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from microsaas.microsaas.services.notification_service import (
+	NOTIFICATION_LOG_SPOOL_KEY,
+	NOTIFICATION_LOG_SPOOL_PROCESSING_KEY,
+	buffered_notification_logs,
+	flush_notification_logs,
+	flush_spooled_notification_logs,
+	log_notification
+)
+
+
+class TestNotificationLogBuffer(FrappeTestCase):
+	def setUp(self):
+		self.client = f"_Test Log Client {frappe.generate_hash(length=6)}"
+
+	def get_logs(self):
+		return frappe.get_all(
+			"CA Notification Log",
+			filters={"client": self.client},
+			fields=["client", "channel", "status", "message", "response"],
+			order_by="message"
+		)
+
+	def test_buffer_is_flushed_into_log_table(self):
+		with buffered_notification_logs():
+			for number in range(5):
+				log_notification(self.client, None, "WhatsApp", "Sent", f"Message {number}", {"id": number})
+
+			# Nothing is written until the buffer flushes
+			self.assertEqual(self.get_logs(), [])
+
+		logs = self.get_logs()
+		self.assertEqual(len(logs), 5)
+		self.assertEqual(logs[0].channel, "WhatsApp")
+		self.assertEqual(logs[0].status, "Sent")
+		self.assertEqual(json.loads(logs[4].response), {"id": 4})
+
+	def test_flush_leaves_transaction_to_caller(self):
+		with patch.object(frappe.db, "commit") as commit, patch.object(frappe.db, "rollback") as rollback:
+			with buffered_notification_logs():
+				log_notification(self.client, None, "Email", "Failed", "Bounced", "550 mailbox unavailable")
+				flush_notification_logs()
+
+		commit.assert_not_called()
+		rollback.assert_not_called()
+		self.assertEqual(len(self.get_logs()), 1)
+
+	def test_unbuffered_log_is_written_immediately(self):
+		log_notification(self.client, None, "Email", "Sent", "Invoice due")
+
+		self.assertEqual([log.message for log in self.get_logs()], ["Invoice due"])
+
+	def make_row(self, message):
+		return [frappe.generate_hash(length=10), self.client, None, "WhatsApp", "Sent", message, None]
+
+	def test_spooled_rows_are_written_once(self):
+		cache = frappe.cache()
+		spooled = self.make_row("Spooled")
+		# Left behind by a flush that died before committing its insert
+		held = self.make_row("Held")
+
+		cache.rpush(NOTIFICATION_LOG_SPOOL_KEY, json.dumps(spooled))
+		cache.rpush(NOTIFICATION_LOG_SPOOL_PROCESSING_KEY, json.dumps(held))
+		flush_spooled_notification_logs()
+
+		self.assertEqual(
+			sorted(log.message for log in self.get_logs()),
+			["Held", "Spooled"]
+		)
+		self.assertEqual(cache.llen(NOTIFICATION_LOG_SPOOL_PROCESSING_KEY), 0)
+
+		# Replaying rows that were written does not duplicate them
+		for row in (spooled, held):
+			cache.rpush(NOTIFICATION_LOG_SPOOL_KEY, json.dumps(row))
+		flush_spooled_notification_logs()
+
+		self.assertEqual(len(self.get_logs()), 2)
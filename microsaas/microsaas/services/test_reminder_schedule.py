@@ -0,0 +1,72 @@
+# Copyright (c) 2026, India100x pvt. ltd. and Contributors
+# See license.txt
+
+from datetime import timedelta
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import now_datetime
+
+from microsaas.microsaas.services.reminder_schedule import (
+	DEFAULT_INVOICE_OFFSETS,
+	DEFAULT_REMINDER_SCHEDULE_TEXT,
+	insert_schedule_rows,
+	make_row,
+	parse_reminder_offsets,
+	rebuild_reminder_schedule,
+	set_schedule
+)
+
+
+class TestParseReminderOffsets(FrappeTestCase):
+	def test_default_text_keeps_overdue_reminders(self):
+		self.assertEqual(parse_reminder_offsets(DEFAULT_REMINDER_SCHEDULE_TEXT), [-3, 0, 3, 7, 14, 30])
+		self.assertEqual(parse_reminder_offsets(DEFAULT_REMINDER_SCHEDULE_TEXT), list(DEFAULT_INVOICE_OFFSETS))
+
+	def test_default_text_ignores_case_and_spacing(self):
+		self.assertEqual(
+			parse_reminder_offsets("3 Days before due date,On due date,  3 days after due date "),
+			list(DEFAULT_INVOICE_OFFSETS)
+		)
+
+	def test_custom_text_is_parsed(self):
+		self.assertEqual(parse_reminder_offsets("3 days before due date, On due date"), [-3, 0])
+		self.assertEqual(parse_reminder_offsets("On due date, 10 days after due date"), [0, 10])
+
+	def test_empty_or_unreadable_text_uses_defaults(self):
+		self.assertEqual(parse_reminder_offsets(None), list(DEFAULT_INVOICE_OFFSETS))
+		self.assertEqual(parse_reminder_offsets("whenever"), list(DEFAULT_INVOICE_OFFSETS))
+
+
+class TestScheduleRewrite(FrappeTestCase):
+	def setUp(self):
+		self.document = f"_T-SCH-{frappe.generate_hash(length=8)}"
+		self.due = self.make_document_row(-7, now_datetime() - timedelta(hours=1))
+		self.future = self.make_document_row(-1, now_datetime() + timedelta(days=6))
+		insert_schedule_rows([self.due, self.future])
+
+	def make_document_row(self, offset, due_at):
+		return make_row("CA Document", self.document, "document_expiry", offset, "Day", due_at)
+
+	def get_pending(self):
+		return sorted(frappe.get_all(
+			"Reminder Schedule",
+			filters={"reference_name": self.document, "status": "Pending"},
+			pluck="name"
+		))
+
+	def test_resync_keeps_due_rows_not_yet_dispatched(self):
+		set_schedule("CA Document", self.document, [self.due, self.future])
+
+		self.assertEqual(self.get_pending(), sorted([self.due.schedule_key, self.future.schedule_key]))
+
+	def test_resync_drops_rows_no_longer_wanted(self):
+		set_schedule("CA Document", self.document, [self.future])
+
+		self.assertEqual(self.get_pending(), [self.future.schedule_key])
+
+	def test_rebuild_leaves_due_rows_for_dispatcher(self):
+		# The document does not exist, so only its future row is dropped
+		rebuild_reminder_schedule(commit=False, doctypes=("CA Document",))
+
+		self.assertEqual(self.get_pending(), [self.due.schedule_key])
@@ -0,0 +1,74 @@
+# Copyright (c) 2026, India100x pvt. ltd. and Contributors
+# See license.txt
+
+from datetime import timedelta
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import get_datetime, getdate, now, today
+
+from microsaas.microsaas.services.notification_ledger import claim_notifications
+from microsaas.microsaas.services.reminder_scheduler import get_document_reminders
+
+
+class TestDocumentReminders(FrappeTestCase):
+	def setUp(self):
+		self.client = f"_Test Expiry Client {frappe.generate_hash(length=6)}"
+		self.expiry_date = getdate(today()) + timedelta(days=7)
+		self.due_at = get_datetime(f"{today()} 09:00:00")
+
+		timestamp = now()
+		self.documents = [f"_T-EXP-{frappe.generate_hash(length=8)}" for _ in range(3)]
+		frappe.db.bulk_insert(
+			"CA Document",
+			fields=["name", "creation", "modified", "owner", "modified_by", "client", "document_name", "expiry_date"],
+			values=[
+				(name, timestamp, timestamp, "Administrator", "Administrator", self.client, f"Return {number}", self.expiry_date)
+				for number, name in enumerate(self.documents)
+			]
+		)
+
+	def make_row(self, document):
+		return frappe._dict(
+			name=f"CA Document:{document}:document_expiry:-7:{self.due_at}",
+			reference_doctype="CA Document",
+			reference_name=document,
+			template_type="document_expiry",
+			reminder_offset=-7,
+			due_at=self.due_at,
+			client=self.client
+		)
+
+	def test_client_split_across_chunks_gets_every_notice(self):
+		rows = [self.make_row(document) for document in self.documents]
+		notifications = []
+		sent = []
+
+		# The dispatcher's chunk limit falls between the client's documents
+		for chunk in (rows[:2], rows[2:]):
+			get_document_reminders(chunk, notifications, sent, [])
+
+		self.assertEqual(len(notifications), 2)
+		self.assertEqual(len(sent), 3)
+
+		listed = [document["document_name"] for notice in notifications for document in notice[2]["documents"]]
+		self.assertEqual(sorted(listed), ["Return 0", "Return 1", "Return 2"])
+
+		# Both notices are claimed: neither is dropped by the ledger as a repeat of the other
+		claimed = claim_notifications([
+			(client, template_type, reference, offset)
+			for client, template_type, data, reference, offset in notifications
+		])
+		self.assertEqual(len(claimed), 2)
+
+	def test_same_documents_get_same_ledger_reference(self):
+		rows = [self.make_row(document) for document in self.documents]
+		first = []
+		second = []
+
+		get_document_reminders(rows, first, [], [])
+		get_document_reminders(list(reversed(rows)), second, [], [])
+
+		self.assertEqual(len(first), 1)
+		self.assertEqual(first[0][3], second[0][3])
+		self.assertEqual(first[0][4], second[0][4])
@@ -0,0 +1,155 @@
+# Copyright (c) 2026, India100x pvt. ltd. and Contributors
+# See license.txt
+
+import email
+import socket
+import socketserver
+import threading
+from email.message import EmailMessage
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from microsaas.microsaas.services import smtp_pool as smtp_pool_module
+from microsaas.microsaas.services.smtp_pool import SMTPConnectionPool
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+	"""Minimal SMTP server side: accepts every message and keeps it in memory"""
+
+	def handle(self):
+		self.server.connections += 1
+		self.server.handlers.add(self)
+		self.reply("220 sink ready")
+
+		in_data = False
+		lines = []
+		recipients = []
+
+		for raw in self.rfile:
+			line = raw.decode().rstrip("\r\n")
+
+			if in_data:
+				if line == ".":
+					self.server.messages.append({"to": recipients, "data": "\n".join(lines)})
+					in_data, lines, recipients = False, [], []
+					self.reply("250 OK")
+				else:
+					lines.append(line[1:] if line.startswith("..") else line)
+				continue
+
+			command = line[:4].upper()
+			if command == "EHLO":
+				self.reply("250-sink\r\n250 HELP")
+			elif command == "RCPT":
+				recipients.append(line.split(":", 1)[1].strip(" <>"))
+				self.reply("250 OK")
+			elif command == "DATA":
+				in_data = True
+				self.reply("354 End data with <CR><LF>.<CR><LF>")
+			elif command == "QUIT":
+				self.reply("221 Bye")
+				break
+			else:
+				# HELO, MAIL, RSET, NOOP
+				self.reply("250 OK")
+
+		self.server.handlers.discard(self)
+
+	def reply(self, text):
+		self.wfile.write(f"{text}\r\n".encode())
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+	"""Local SMTP sink on a free port, run in a background thread"""
+
+	allow_reuse_address = True
+	daemon_threads = True
+
+	def __init__(self):
+		super().__init__(("127.0.0.1", 0), SMTPSinkHandler)
+		self.messages = []
+		self.connections = 0
+		self.handlers = set()
+		threading.Thread(target=self.serve_forever, daemon=True).start()
+
+	@property
+	def settings(self):
+		return {"host": "127.0.0.1", "port": self.server_address[1], "sender": "noreply@example.com"}
+
+	def drop_connections(self):
+		"""Close every open session from the server side, like a relay timing out"""
+		for handler in list(self.handlers):
+			handler.request.shutdown(socket.SHUT_RDWR)
+
+	def stop(self):
+		self.shutdown()
+		self.server_close()
+
+
+def make_email(number):
+	message = EmailMessage()
+	message["From"] = "noreply@example.com"
+	message["To"] = f"client{number}@example.com"
+	message["Subject"] = f"Reminder {number}"
+	message.set_content(f"Body {number}")
+	return message
+
+
+class TestSMTPConnectionPool(FrappeTestCase):
+	def setUp(self):
+		self.sink = SMTPSink()
+		self.pool = SMTPConnectionPool()
+
+	def tearDown(self):
+		self.pool.close_all()
+		self.sink.stop()
+		frappe.local.microsaas_smtp_settings = None
+
+	def test_many_messages_share_one_session(self):
+		for number in range(20):
+			self.pool.send(self.sink.settings, make_email(number))
+
+		self.assertEqual(len(self.sink.messages), 20)
+		self.assertEqual(self.sink.connections, 1)
+
+	def test_reconnects_after_server_drops_session(self):
+		self.pool.send(self.sink.settings, make_email(1))
+		self.sink.drop_connections()
+		self.pool.send(self.sink.settings, make_email(2))
+
+		self.assertEqual([m["to"] for m in self.sink.messages], [["client1@example.com"], ["client2@example.com"]])
+		self.assertEqual(self.sink.connections, 2)
+
+	def test_session_recycled_after_message_limit(self):
+		with patch.object(smtp_pool_module, "SMTP_MAX_MESSAGES_PER_SESSION", 5):
+			for number in range(12):
+				self.pool.send(self.sink.settings, make_email(number))
+
+		self.assertEqual(len(self.sink.messages), 12)
+		self.assertEqual(self.sink.connections, 3)
+
+	def test_queued_email_transport(self):
+		from microsaas.microsaas.services.notification_service import deliver_queued_email
+
+		frappe.local.microsaas_smtp_settings = self.sink.settings
+
+		with patch.object(smtp_pool_module, "smtp_pool", self.pool):
+			response = deliver_queued_email({
+				"id": "testmessage01",
+				"payload": {
+					"recipients": ["client@example.com"],
+					"subject": "Notification: Payment Reminder",
+					"message": "<p>Invoice <b>INV-0001</b> is due</p>",
+					"reply_to": "firm@example.com"
+				}
+			})
+
+		self.assertEqual(response["status"], "sent")
+		self.assertEqual(self.sink.messages[0]["to"], ["client@example.com"])
+
+		sent = email.message_from_string(self.sink.messages[0]["data"])
+		self.assertEqual(sent["Subject"], "Notification: Payment Reminder")
+		self.assertEqual(sent["Reply-To"], "firm@example.com")
+		self.assertTrue(sent.is_multipart())
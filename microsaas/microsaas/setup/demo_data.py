@@ -2,8 +2,9 @@
 # For license information, please see license.txt
 
 import frappe
-from frappe.utils import today, add_days, add_months, getdate
+from frappe.utils import today, add_days, add_months, getdate, now
 import random
+import time
 
 def generate():
     """Generate dummy data for testing"""
@@ -224,3 +225,250 @@ def create_documents(client_names):
         })
         doc.insert(ignore_permissions=True)
 
+
+
+BULK_PREFIX = "LOAD"
+
+BULK_SERVICES = [
+    ("Monthly Retainer Fee", 25000),
+    ("GST Filing Charges", 5000),
+    ("Annual Audit Fee", 75000),
+    ("Consultation Charges", 3000),
+    ("TDS Return Filing", 2500)
+]
+
+BULK_FIELDS = {
+    "CA Firm": [
+        "firm_name", "contact_email", "default_currency", "default_payment_gateway",
+        "default_tax_rate", "enable_whatsapp_notifications", "enable_email_notifications"
+    ],
+    "CA Client": [
+        "firm", "client_name", "email", "phone", "whatsapp_number", "status",
+        "portal_access_enabled", "client_category"
+    ],
+    "CA Invoice": [
+        "firm", "client", "client_name", "client_email", "invoice_date", "due_date", "status",
+        "subtotal", "tax_rate", "tax_amount", "total_amount", "paid_amount", "outstanding_amount",
+        "currency", "payment_terms", "is_recurring", "frequency", "next_generation_date"
+    ],
+    "CA Invoice Item": [
+        "parent", "parenttype", "parentfield", "idx", "description", "quantity", "rate", "tax_rate", "amount"
+    ],
+    "CA Payment": [
+        "firm", "invoice", "client", "client_name", "payment_date", "amount", "currency",
+        "payment_gateway", "payment_method", "transaction_id", "status", "reconciled", "reconciliation_date"
+    ],
+    "CA Appointment": [
+        "firm", "client", "client_name", "assigned_ca", "appointment_date", "appointment_time",
+        "duration", "meeting_type", "status", "purpose", "send_reminder", "reminder_time"
+    ],
+    "CA Document": [
+        "firm", "client", "client_name", "document_name", "document_type", "file_attachment",
+        "uploaded_by", "upload_date", "visibility", "client_accessible", "expiry_date", "renewal_reminder"
+    ]
+}
+
+
+class BulkLoader:
+    """Buffers rows per doctype and writes them with multi-row inserts"""
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        self.timestamp = now()
+        self.user = frappe.session.user
+        self.rows = {doctype: [] for doctype in BULK_FIELDS}
+        self.counts = {doctype: 0 for doctype in BULK_FIELDS}
+
+    def add(self, doctype, name, values, docstatus=0):
+        self.rows[doctype].append(
+            (name, self.timestamp, self.timestamp, self.user, self.user, docstatus) + tuple(values)
+        )
+        if len(self.rows[doctype]) >= self.chunk_size:
+            self.flush(doctype)
+
+    def flush(self, doctype=None):
+        for dt in [doctype] if doctype else list(self.rows):
+            if not self.rows[dt]:
+                continue
+
+            frappe.db.bulk_insert(
+                dt,
+                fields=["name", "creation", "modified", "owner", "modified_by", "docstatus"] + BULK_FIELDS[dt],
+                values=self.rows[dt],
+                chunk_size=self.chunk_size
+            )
+            self.counts[dt] += len(self.rows[dt])
+            self.rows[dt] = []
+            frappe.db.commit()
+
+
+def generate_bulk(firms=10, clients_per_firm=1000, invoices_per_client=24, payment_ratio=0.7,
+        appointments_per_client=4, documents_per_client=6, recurring_ratio=0.05, seed=42,
+        base_date=None, chunk_size=10000):
+    """
+    Bulk load a seeded synthetic dataset for load testing
+
+    Rows go straight into the tables with multi-row inserts (no document
+    hooks), committed per chunk. The same seed and base_date always produce
+    the same data. Existing bulk data is removed first.
+
+    Run with:
+        bench --site <site> execute microsaas.microsaas.setup.demo_data.generate_bulk --kwargs "{'firms': 20}"
+
+    Args:
+        firms: Number of CA Firms
+        clients_per_firm: Clients created under each firm
+        invoices_per_client: Submitted invoices per client, spread over two years
+        payment_ratio: Share of invoices settled by a completed payment
+        appointments_per_client: Appointments per client, past and upcoming
+        documents_per_client: Documents per client, some with expiry dates
+        recurring_ratio: Share of clients with a monthly recurring invoice due on base_date
+        seed: Random seed
+        base_date: Date the dataset is generated around (defaults to today)
+        chunk_size: Rows per insert statement and commit
+
+    Returns:
+        Dict with row counts per doctype and elapsed seconds
+    """
+    from microsaas.microsaas.services.client_summary import rebuild_client_summaries
+    from microsaas.microsaas.services.reminder_schedule import rebuild_reminder_schedule
+
+    rng = random.Random(seed)
+    base_date = getdate(base_date or today())
+    started = time.perf_counter()
+
+    clear_bulk_data()
+    loader = BulkLoader(chunk_size)
+
+    client_no = invoice_no = payment_no = appointment_no = document_no = 0
+    firm_names = []
+
+    for f in range(firms):
+        firm = f"{BULK_PREFIX} Firm {f + 1:04d}"
+        firm_names.append(firm)
+        loader.add("CA Firm", firm, (
+            firm, f"admin{f + 1}@load.example.com", "INR", rng.choice(["Razorpay", "Stripe"]), 18, 1, 1
+        ))
+
+        for c in range(clients_per_firm):
+            client_no += 1
+            client = f"{BULK_PREFIX}-CLI-{client_no:08d}"
+            client_name = f"Load Client {client_no}"
+            client_email = f"client{client_no}@load.example.com"
+            phone = f"+91{9000000000 + client_no}"
+
+            loader.add("CA Client", client, (
+                firm, client_name, client_email, phone, phone,
+                "Active" if rng.random() < 0.95 else "Inactive", 1,
+                rng.choice(["Individual", "Small Business", "Medium Business", "Large Enterprise"])
+            ))
+
+            recurring = rng.random() < recurring_ratio
+
+            for i in range(invoices_per_client):
+                invoice_no += 1
+                invoice = f"{BULK_PREFIX}-INV-{invoice_no:09d}"
+                invoice_date = add_days(base_date, -rng.randint(0, 730))
+                due_date = add_days(invoice_date, 30)
+
+                subtotal = 0
+                for idx in range(1, rng.randint(1, 3) + 1):
+                    description, rate = rng.choice(BULK_SERVICES)
+                    subtotal += rate
+                    loader.add("CA Invoice Item", f"{invoice}-{idx}", (
+                        invoice, "CA Invoice", "items", idx, description, 1, rate, 18, rate
+                    ), docstatus=1)
+
+                tax_amount = subtotal * 18 / 100
+                total = subtotal + tax_amount
+                paid = rng.random() < payment_ratio
+
+                if paid:
+                    status = "Paid"
+                elif getdate(due_date) < base_date:
+                    status = "Overdue"
+                else:
+                    status = "Unpaid"
+
+                loader.add("CA Invoice", invoice, (
+                    firm, client, client_name, client_email, invoice_date, due_date, status,
+                    subtotal, 18, tax_amount, total, total if paid else 0, 0 if paid else total,
+                    "INR", "Net 30",
+                    *((1, "Monthly", base_date) if recurring and i == 0 else (0, None, None))
+                ), docstatus=1)
+
+                if paid:
+                    payment_no += 1
+                    payment_date = add_days(invoice_date, rng.randint(0, 30))
+                    loader.add("CA Payment", f"{BULK_PREFIX}-PAY-{payment_no:09d}", (
+                        firm, invoice, client, client_name, f"{payment_date} 12:00:00", total, "INR",
+                        rng.choice(["Razorpay", "Stripe", "Manual"]),
+                        rng.choice(["UPI", "Net Banking", "Credit Card", "Bank Transfer"]),
+                        f"{BULK_PREFIX}-TXN-{payment_no:09d}", "Completed", 1, payment_date
+                    ), docstatus=1)
+
+            for a in range(appointments_per_client):
+                appointment_no += 1
+                appointment_date = add_days(base_date, rng.randint(-180, 60))
+                if getdate(appointment_date) >= base_date:
+                    status = "Scheduled"
+                else:
+                    status = "Completed" if rng.random() < 0.85 else "Cancelled"
+
+                loader.add("CA Appointment", f"{BULK_PREFIX}-APT-{appointment_no:09d}", (
+                    firm, client, client_name, "Administrator", appointment_date,
+                    f"{rng.randint(9, 17):02d}:{rng.choice(['00', '30'])}:00", 60,
+                    rng.choice(["Video Call", "In-Person", "Phone Call"]), status,
+                    rng.choice(["Tax Planning", "Audit Discussion", "Monthly Review", "New Business Compliance"]),
+                    1, "24"
+                ))
+
+            for d in range(documents_per_client):
+                document_no += 1
+                document_type = rng.choice(["Tax Return", "Financial Statement", "Agreement", "GST Filing", "Compliance Certificate"])
+                client_accessible = 1 if rng.random() < 0.6 else 0
+                expiry_date = add_days(base_date, rng.randint(-30, 400)) if rng.random() < 0.5 else None
+
+                loader.add("CA Document", f"{BULK_PREFIX}-DOC-{document_no:09d}", (
+                    firm, client, client_name, f"{document_type} {d + 1}", document_type,
+                    "/files/sample_doc.pdf", "Administrator", add_days(base_date, -rng.randint(0, 730)),
+                    "Client Accessible" if client_accessible else "CA Only", client_accessible,
+                    expiry_date, 1 if expiry_date else 0
+                ))
+
+        print(f"Loaded firm {f + 1}/{firms} ({time.perf_counter() - started:.1f}s)")
+
+    loader.flush()
+
+    for firm in firm_names:
+        rebuild_client_summaries(firm)
+
+    rebuild_reminder_schedule(chunk_size=chunk_size)
+
+    result = dict(loader.counts, seconds=round(time.perf_counter() - started, 2))
+    print(result)
+    return result
+
+
+def clear_bulk_data():
+    """Delete every row created by generate_bulk, and rows later created for its clients"""
+    prefix = f"{BULK_PREFIX}%"
+
+    frappe.db.sql("""
+        DELETE item FROM `tabCA Invoice Item` item
+        INNER JOIN `tabCA Invoice` inv ON inv.name = item.parent
+        WHERE inv.client LIKE %s
+    """, prefix)
+
+    for doctype in ("CA Invoice", "CA Payment", "CA Appointment", "CA Document", "CA Client Summary"):
+        frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE client LIKE %s", prefix)
+
+    frappe.db.sql("DELETE FROM `tabPayment Webhook Event` WHERE invoice LIKE %s OR firm LIKE %s", (prefix, prefix))
+    frappe.db.sql("DELETE FROM `tabReminder Schedule` WHERE client LIKE %s", prefix)
+    frappe.db.sql("DELETE FROM `tabNotification Ledger` WHERE client LIKE %s", prefix)
+    frappe.db.sql("DELETE FROM `tabCA Notification Log` WHERE client LIKE %s", prefix)
+
+    for doctype in ("CA Client", "CA Firm", "Reminder Run"):
+        frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE name LIKE %s", prefix)
+
+    frappe.db.commit()
@@ -0,0 +1,56 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+"""
+Managed Composite Indexes
+Single-column indexes are declared with search_index in the doctype JSON.
+Composite indexes cannot be declared there, so they are listed here and
+created by the after_install and after_migrate hooks.
+"""
+
+import frappe
+
+
+COMPOSITE_INDEXES = {
+	"CA Invoice": [
+		# Portal lists and dashboard totals per client
+		("client", "docstatus", "status"),
+		# Reminder engine: open invoices by due date
+		("docstatus", "status", "due_date"),
+		# Recurring invoice generation
+		("is_recurring", "docstatus", "next_generation_date")
+	],
+	"CA Payment": [
+		# Invoice reconciliation and payment status
+		("invoice", "status"),
+		# Client totals
+		("client", "status", "docstatus")
+	],
+	"CA Appointment": [
+		# Appointment reminders
+		("status", "appointment_date"),
+		# Portal upcoming appointments
+		("client", "status", "appointment_date")
+	],
+	"CA Document": [
+		# Portal document lists
+		("client", "client_accessible", "upload_date")
+	],
+	"Reminder Schedule": [
+		# Reminder dispatcher: pending rows by due time
+		("status", "due_at"),
+		# Rewriting the reminders of one record
+		("reference_doctype", "reference_name")
+	]
+}
+
+
+def get_index_name(fields):
+	return "_".join(fields) + "_index"
+
+
+def ensure_indexes():
+	"""Create any managed composite index that does not exist yet"""
+	for doctype, indexes in COMPOSITE_INDEXES.items():
+		for fields in indexes:
+			frappe.db.add_index(doctype, list(fields), index_name=get_index_name(fields))
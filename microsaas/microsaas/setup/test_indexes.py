@@ -0,0 +1,149 @@
+# Copyright (c) 2026, India100x pvt. ltd. and Contributors
+# See license.txt
+
+from datetime import date, timedelta
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import now
+
+from microsaas.microsaas.setup.indexes import get_index_name
+
+
+FIRMS = [f"_Test Index Firm {number}" for number in range(20)]
+CLIENT_COUNT = 1000
+INVOICE_COUNT = 3000
+APPOINTMENT_COUNT = 1500
+DOCUMENT_COUNT = 1500
+START_DATE = date(2026, 1, 1)
+
+
+def client_name(number):
+	return f"_T-IDX-CLI-{number:05d}"
+
+
+def invoice_name(number):
+	return f"_T-IDX-INV-{number:05d}"
+
+
+def day(offset):
+	return START_DATE + timedelta(days=offset)
+
+
+# (description, query, values, indexes the plan may choose)
+HOT_QUERIES = [
+	(
+		"invoice reminder selection",
+		"""SELECT name FROM `tabCA Invoice`
+		WHERE docstatus = 1 AND status IN ('Unpaid', 'Partially Paid', 'Overdue')
+		AND due_date IN (%s, %s)""",
+		(day(200), day(203)),
+		[get_index_name(("docstatus", "status", "due_date")), "due_date"]
+	),
+	(
+		"client open invoices",
+		"""SELECT name FROM `tabCA Invoice`
+		WHERE client = %s AND docstatus = 1 AND status = 'Unpaid'""",
+		(client_name(1),),
+		[get_index_name(("client", "docstatus", "status")), "client"]
+	),
+	(
+		"invoice payments",
+		"""SELECT SUM(amount) FROM `tabCA Payment`
+		WHERE invoice = %s AND status = 'Completed'""",
+		(invoice_name(1),),
+		[get_index_name(("invoice", "status")), "invoice"]
+	),
+	(
+		"payment by transaction id",
+		"SELECT name FROM `tabCA Payment` WHERE transaction_id = %s",
+		("_t_idx_pay_1",),
+		["transaction_id"]
+	),
+	(
+		"appointments on a date",
+		"""SELECT name FROM `tabCA Appointment`
+		WHERE appointment_date = %s AND status = 'Scheduled'""",
+		(day(100),),
+		[get_index_name(("status", "appointment_date")), "appointment_date"]
+	),
+	(
+		"expiring documents",
+		"SELECT name FROM `tabCA Document` WHERE expiry_date BETWEEN %s AND %s",
+		(day(300), day(330)),
+		["expiry_date"]
+	),
+	(
+		"firm clients",
+		"SELECT name FROM `tabCA Client` WHERE firm = %s AND status = 'Active'",
+		(FIRMS[0],),
+		["firm"]
+	)
+]
+
+
+def insert_rows(doctype, fields, values):
+	"""Bulk insert rows with the standard columns filled in"""
+	timestamp = now()
+	frappe.db.bulk_insert(
+		doctype,
+		fields=["name", "creation", "modified", "owner", "modified_by", "docstatus"] + fields,
+		values=[
+			(row[0], timestamp, timestamp, "Administrator", "Administrator", 1 if doctype == "CA Invoice" else 0) + tuple(row[1:])
+			for row in values
+		]
+	)
+
+
+def load_representative_rows():
+	"""
+	A few thousand rows spread the way a live site spreads them: many
+	clients per firm, mostly paid invoices and dates over a couple of years,
+	so each hot query matches a small slice of its table
+	"""
+	insert_rows("CA Client", ["firm", "client_name", "email", "status"], [
+		(client_name(number), FIRMS[number % len(FIRMS)], f"Client {number}", f"idx.client{number}@example.com",
+			"Inactive" if number % 5 == 0 else "Active")
+		for number in range(CLIENT_COUNT)
+	])
+
+	invoice_statuses = ["Paid", "Paid", "Paid", "Paid", "Unpaid", "Overdue", "Partially Paid", "Cancelled"]
+	insert_rows("CA Invoice", ["firm", "client", "invoice_date", "due_date", "status", "total_amount"], [
+		(invoice_name(number), FIRMS[number % len(FIRMS)], client_name(number % CLIENT_COUNT),
+			day(number % 730), day(number % 730 + 30), invoice_statuses[number % len(invoice_statuses)], 1000)
+		for number in range(INVOICE_COUNT)
+	])
+
+	insert_rows("CA Payment", ["firm", "invoice", "client", "payment_date", "amount", "transaction_id", "status"], [
+		(f"_T-IDX-PAY-{number:05d}", FIRMS[number % len(FIRMS)], invoice_name(number), client_name(number % CLIENT_COUNT),
+			day(number % 730), 1000, f"_t_idx_pay_{number}", "Failed" if number % 10 == 0 else "Completed")
+		for number in range(INVOICE_COUNT)
+	])
+
+	appointment_statuses = ["Completed", "Completed", "Scheduled", "Cancelled"]
+	insert_rows("CA Appointment", ["firm", "client", "appointment_date", "appointment_time", "status"], [
+		(f"_T-IDX-APT-{number:05d}", FIRMS[number % len(FIRMS)], client_name(number % CLIENT_COUNT),
+			day(number % 365), "10:00:00", appointment_statuses[number % len(appointment_statuses)])
+		for number in range(APPOINTMENT_COUNT)
+	])
+
+	insert_rows("CA Document", ["firm", "client", "document_name", "expiry_date"], [
+		(f"_T-IDX-DOC-{number:05d}", FIRMS[number % len(FIRMS)], client_name(number % CLIENT_COUNT),
+			f"Document {number}", day(number % 1095))
+		for number in range(DOCUMENT_COUNT)
+	])
+
+
+class TestQueryPlans(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		# Indexes come from the app's install/migrate hooks, not from the test
+		load_representative_rows()
+
+	def test_hot_queries_use_indexes(self):
+		for description, query, values, indexes in HOT_QUERIES:
+			with self.subTest(description):
+				plan = frappe.db.sql(f"EXPLAIN {query}", values, as_dict=True)
+
+				self.assertIn(plan[0].get("key"), indexes, f"{description} does not use any of {indexes}, plan: {plan}")
@@ -0,0 +1,8 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+from microsaas.microsaas.doctype.ca_invoice.ca_invoice import repair_invoice_balances
+
+
+def execute():
+	repair_invoice_balances()
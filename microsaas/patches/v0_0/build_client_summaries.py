@@ -0,0 +1,8 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+from microsaas.microsaas.services.client_summary import rebuild_client_summaries
+
+
+def execute():
+	rebuild_client_summaries()
@@ -0,0 +1,10 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+from microsaas.microsaas.services.reminder_schedule import rebuild_reminder_schedule
+from microsaas.microsaas.setup.indexes import ensure_indexes
+
+
+def execute():
+	ensure_indexes()
+	rebuild_reminder_schedule()
@@ -0,0 +1,9 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+from microsaas.microsaas.services.reminder_schedule import rebuild_reminder_schedule
+
+
+def execute():
+	# Pending rows are recreated with due-minute keys and an expiry
+	rebuild_reminder_schedule()
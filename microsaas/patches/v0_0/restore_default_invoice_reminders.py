@@ -0,0 +1,9 @@
+# Copyright (c) 2026, India100x pvt. ltd. and contributors
+# For license information, please see license.txt
+
+from microsaas.microsaas.services.reminder_schedule import rebuild_reminder_schedule
+
+
+def execute():
+	# Invoices on the default reminder text get their 7/14/30 day overdue rows back
+	rebuild_reminder_schedule(doctypes=("CA Invoice",))